@@ -0,0 +1,52 @@
+"""
+Admin API Routes
+Stored request and job profiles
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from loguru import logger
+
+from ..core.profiling import profiler
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+def require_profiling(token: Optional[str]):
+    # Profiling endpoints don't exist unless profiling is on and a token guards them
+    if not profiler.enabled or not profiler.token:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not profiler.token_valid(token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@router.get("/profiles")
+async def list_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    x_profile_token: Optional[str] = Header(None)
+):
+    """Most recent profiles, newest first"""
+    try:
+        require_profiling(x_profile_token)
+        return {"profiles": profiler.store.list(limit)}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing profiles: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to list profiles: {str(e)}")
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """One profile in collapsed-stack format, for flamegraph.pl or speedscope"""
+    try:
+        require_profiling(x_profile_token)
+        collapsed = profiler.store.get(profile_id)
+        if collapsed is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return PlainTextResponse(collapsed)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading profile {profile_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to read profile: {str(e)}")
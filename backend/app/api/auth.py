@@ -6,16 +6,18 @@ from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import RedirectResponse
 from typing import Dict, Any
 import secrets
-from datetime import datetime, timedelta
+from datetime import datetime
 from loguru import logger
 
 from ..services.spotify_service import spotify_oauth_service
+from ..services.rate_limiter import SpotifyRateLimitError
+from ..services.oauth_state import oauth_state_store
 from ..models.playlist import User
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
-# In-memory storage for OAuth states (in production, use Redis or database)
-oauth_states = {}
+# How long a user has to complete the Spotify consent screen
+OAUTH_STATE_TTL_SECONDS = 600
 
 @router.get("/login")
 async def spotify_login():
@@ -24,14 +26,8 @@ async def spotify_login():
         # Generate a random state parameter for security
         state = secrets.token_urlsafe(32)
         
-        # Store state temporarily (expires in 10 minutes)
-        oauth_states[state] = {
-            "created_at": datetime.now(),
-            "expires_at": datetime.now() + timedelta(minutes=10)
-        }
-        
-        # Clean up expired states
-        cleanup_expired_states()
+        # Store state temporarily (expires in 10 minutes); expired states are reaped by the store
+        await oauth_state_store.put(state, {"created_at": datetime.now()}, ttl=OAUTH_STATE_TTL_SECONDS)
         
         # Get authorization URL
         auth_url = spotify_oauth_service.get_authorization_url(state=state)
@@ -64,19 +60,11 @@ async def spotify_callback(code: str = None, state: str = None, error: str = Non
         if not state:
             raise HTTPException(status_code=400, detail="State parameter not provided")
         
-        # Validate state parameter
-        if state not in oauth_states:
+        # Validate and consume the state in one atomic step, so it can only be used once
+        state_data = await oauth_state_store.consume(state)
+        if state_data is None:
             raise HTTPException(status_code=400, detail="Invalid or expired state parameter")
         
-        # Check if state is expired
-        state_data = oauth_states[state]
-        if datetime.now() > state_data["expires_at"]:
-            del oauth_states[state]
-            raise HTTPException(status_code=400, detail="State parameter expired")
-        
-        # Clean up used state
-        del oauth_states[state]
-        
         # Exchange authorization code for tokens
         logger.info("Exchanging authorization code for access tokens")
         token_data = await spotify_oauth_service.exchange_code_for_tokens(code)
@@ -94,6 +82,9 @@ async def spotify_callback(code: str = None, state: str = None, error: str = Non
         # Store or update user in database
         user = await get_or_create_user(user_data, token_data)
         
+        # Prime the token -> user cache so the first API calls skip /me
+        spotify_oauth_service.remember_token(access_token, token_data.get("expires_in"), user_data)
+        
         logger.info(f"Successfully authenticated user: {user_data.get('id')}")
         
         # In a real app, you'd create a session or JWT token here
@@ -114,7 +105,7 @@ async def spotify_callback(code: str = None, state: str = None, error: str = Non
             }
         }
         
-    except HTTPException:
+    except (HTTPException, SpotifyRateLimitError):
         raise
     except Exception as e:
         logger.error(f"Error in Spotify callback: {e}")
@@ -129,12 +120,16 @@ async def refresh_token(refresh_token: str):
         if not token_data:
             raise HTTPException(status_code=400, detail="Failed to refresh access token")
         
+        spotify_oauth_service.remember_token(token_data.get("access_token"), token_data.get("expires_in"))
+        
         return {
             "access_token": token_data.get("access_token"),
             "expires_in": token_data.get("expires_in"),
             "token_type": token_data.get("token_type")
         }
         
+    except SpotifyRateLimitError:
+        raise
     except Exception as e:
         logger.error(f"Error refreshing token: {e}")
         raise HTTPException(status_code=500, detail="Failed to refresh access token")
@@ -150,6 +145,8 @@ async def get_user_info(access_token: str):
         
         return user_data
         
+    except SpotifyRateLimitError:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user info: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch user information")
@@ -167,6 +164,7 @@ async def get_or_create_user(spotify_user_data: Dict[str, Any], token_data: Dict
             # Update existing user
             user.display_name = spotify_user_data.get("display_name")
             user.email = email
+            user.spotify_refresh_token = token_data.get("refresh_token") or user.spotify_refresh_token
             user.updated_at = datetime.now()
             await user.save()
             logger.info(f"Updated existing user: {spotify_id}")
@@ -177,6 +175,7 @@ async def get_or_create_user(spotify_user_data: Dict[str, Any], token_data: Dict
                 email=email,
                 spotify_id=spotify_id,
                 display_name=spotify_user_data.get("display_name"),
+                spotify_refresh_token=token_data.get("refresh_token"),
                 created_at=datetime.now(),
                 updated_at=datetime.now()
             )
@@ -187,18 +186,4 @@ async def get_or_create_user(spotify_user_data: Dict[str, Any], token_data: Dict
         
     except Exception as e:
         logger.error(f"Error creating/updating user: {e}")
-        raise
-
-def cleanup_expired_states():
-    """Clean up expired OAuth states"""
-    current_time = datetime.now()
-    expired_states = [
-        state for state, data in oauth_states.items()
-        if current_time > data["expires_at"]
-    ]
-    
-    for state in expired_states:
-        del oauth_states[state]
-    
-    if expired_states:
-        logger.info(f"Cleaned up {len(expired_states)} expired OAuth states")
\ No newline at end of file
+        raise
\ No newline at end of file
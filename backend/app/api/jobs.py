@@ -0,0 +1,48 @@
+"""
+Job API Routes
+Status of queued background work
+"""
+from fastapi import APIRouter, HTTPException, Query
+from beanie import PydanticObjectId
+from loguru import logger
+
+from ..services.job_queue import job_response
+from ..models.job import Job
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Get the status of a background job"""
+    try:
+        if not PydanticObjectId.is_valid(job_id):
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        job = await Job.get(PydanticObjectId(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return job_response(job)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get job: {str(e)}")
+
+@router.get("")
+async def list_playlist_jobs(
+    playlist_id: str,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Most recent jobs for a playlist"""
+    try:
+        jobs = await Job.find(Job.playlist_id == playlist_id).sort("-created_at").limit(limit).to_list()
+        return {
+            "playlist_id": playlist_id,
+            "jobs": [job_response(job) for job in jobs]
+        }
+        
+    except Exception as e:
+        logger.error(f"Error listing jobs for playlist {playlist_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to list jobs: {str(e)}")
@@ -3,14 +3,35 @@
 Playlist API Routes
 Handles all playlist-related endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import List, Dict, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple, Union
 from loguru import logger
 import asyncio
 from datetime import datetime
 
 from ..services.spotify_service import spotify_oauth_service
-from ..models.playlist import Playlist, Track, AudioFeatures, PlaylistAnalysis, AnalysisStatus
+from ..services.rate_limiter import SpotifyRateLimitError
+from ..services.feature_cache import audio_features_cache
+from ..services.playlist_sync import sync_user_playlists
+from ..services.track_sync import refresh_playlist_tracks, refresh_changed_playlist
+from ..services import track_store
+from ..services.analysis import analyze_track_documents
+from ..services.taste_profile import apply_playlist_stats
+from ..services.job_queue import job_queue
+from ..services.compute_pool import compute_pool
+from ..services.collection_version import get_collection_version, bump_collection_version
+from ..core.etag import make_etag, etag_matches, not_modified, set_etag
+from ..core.responses import ModelResponse
+from ..models.job import JobPriority, JobType
+from ..models.playlist import Playlist, PlaylistSummary, Track, AudioFeatures, PlaylistAnalysis, AnalysisStatus
+from ..models.responses import (
+    PlaylistSummaryResponse,
+    PlaylistDetailsResponse,
+    PlaylistAnalysisResponse,
+    AnalysisNotReadyResponse
+)
 from ..core.auth import get_current_user  # We'll implement this later
 
 router = APIRouter(prefix="/api/playlists", tags=["playlists"])
@@ -18,45 +39,54 @@ router = APIRouter(prefix="/api/playlists", tags=["playlists"])
 # Mock user ID for development (replace with real auth later)
 MOCK_USER_ID = "dev_user_123"
 
-@router.get("/oauth")
+# Stored track fields the analysis engine reads
+ANALYSIS_TRACK_FIELDS = ["spotify_id", "duration_ms", "popularity", "artists.name", "audio_features"]
+
+# Playlist fields every single-playlist representation is derived from; read first to answer If-None-Match
+PLAYLIST_VERSION_FIELDS = {
+    "_id": 0,
+    "user_id": 1,
+    "snapshot_id": 1,
+    "tracks_snapshot_id": 1,
+    "tracks_fetched": 1,
+    "audio_features_fetched": 1,
+    "updated_at": 1,
+    "last_fetched_at": 1,
+    "last_analyzed_at": 1,
+    "analysis.status": 1
+}
+
+# Opt-in streaming format for track listings, one JSON object per line
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+@router.get("/oauth", response_model=List[PlaylistSummaryResponse])
 async def get_user_playlists_oauth(
     access_token: str,
-    refresh: bool = False
+    refresh: bool = False,
+    if_none_match: Optional[str] = Header(None)
 ):
     """Get all playlists for the current user using OAuth token"""
     try:
         logger.info(f"Fetching playlists with OAuth token")
         
-        # First, get user info to identify the user
-        user_data = await spotify_oauth_service.get_current_user(access_token)
+        # First, identify the user (cached per token, so the cached listing path needs no Spotify call)
+        user_data = await spotify_oauth_service.resolve_user(access_token)
         if not user_data:
             raise HTTPException(status_code=401, detail="Invalid access token")
         
         user_id = user_data.get("id")
         
         if not refresh:
+            # An unchanged listing version means the client's copy is current
+            etag = make_etag("playlists", user_id, await get_collection_version(user_id))
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            
             # Try to get cached playlists from database first
-            cached_playlists = await Playlist.find({"user_id": user_id}).to_list()
+            cached_playlists = await load_playlist_summaries(user_id)
             if cached_playlists:
                 logger.info(f"Returning {len(cached_playlists)} cached playlists for user {user_id}")
-                return [
-                    {
-                        "id": str(playlist.id),
-                        "spotify_id": playlist.spotify_id,
-                        "name": playlist.name,
-                        "description": playlist.description,
-                        "track_count": playlist.track_count,
-                        "images": playlist.images,
-                        "owner": playlist.owner.dict(),
-                        "public": playlist.public,
-                        "collaborative": playlist.collaborative,
-                        "tracks_fetched": playlist.tracks_fetched,
-                        "analysis_status": playlist.analysis.status if playlist.analysis else "pending",
-                        "created_at": playlist.created_at,
-                        "updated_at": playlist.updated_at
-                    }
-                    for playlist in cached_playlists
-                ]
+                return playlist_listing_response(cached_playlists, etag)
         
         # Fetch fresh data from Spotify using OAuth
         spotify_playlists = await spotify_oauth_service.get_user_playlists(access_token)
@@ -65,74 +95,39 @@ async def get_user_playlists_oauth(
             logger.warning("No playlists returned from Spotify API")
             return []
         
-        # Save or update playlists in database
-        saved_playlists = []
-        for spotify_playlist in spotify_playlists:
-            # Check if playlist already exists
-            existing_playlist = await Playlist.find_one({"spotify_id": spotify_playlist["spotify_id"]})
-            
-            if existing_playlist:
-                # Update existing playlist
-                existing_playlist.name = spotify_playlist["name"]
-                existing_playlist.description = spotify_playlist.get("description", "")
-                existing_playlist.track_count = spotify_playlist["track_count"]
-                existing_playlist.images = spotify_playlist.get("images") or []
-                existing_playlist.snapshot_id = spotify_playlist["snapshot_id"]
-                existing_playlist.updated_at = datetime.now()
-                
-                await existing_playlist.save()
-                saved_playlists.append(existing_playlist)
-            else:
-                # Create new playlist
-                new_playlist = Playlist(
-                    spotify_id=spotify_playlist["spotify_id"],
-                    name=spotify_playlist["name"],
-                    description=spotify_playlist.get("description", ""),
-                    track_count=spotify_playlist["track_count"],
-                    public=spotify_playlist.get("public", True),
-                    collaborative=spotify_playlist.get("collaborative", False),
-                    owner=spotify_playlist["owner"],
-                    user_id=user_id,
-                    images=spotify_playlist.get("images") or [],
-                    external_urls=spotify_playlist.get("external_urls", {}),
-                    snapshot_id=spotify_playlist["snapshot_id"]
-                )
-                
-                await new_playlist.save()
-                saved_playlists.append(new_playlist)
+        # Save or update playlists in database with a single bulk write
+        sync_result = await sync_user_playlists(user_id, spotify_playlists)
+        saved_playlists = await load_synced_playlists(sync_result.spotify_ids)
+        
+        # Only playlists with a new snapshot_id need their tracks diffed
+        snapshot_ids = {playlist["spotify_id"]: playlist.get("snapshot_id") for playlist in spotify_playlists}
+        for spotify_id in sync_result.tracks_to_refresh:
+            await job_queue.enqueue(
+                JobType.REFRESH_PLAYLIST_TRACKS,
+                spotify_id,
+                snapshot_ids.get(spotify_id),
+                priority=JobPriority.LOW,
+                # The handler mints its own token: a request's token may expire before a low-priority job runs
+                payload={"user_id": user_id}
+            )
         
         logger.info(f"Successfully processed {len(saved_playlists)} playlists for user {user_id}")
         
         # Return formatted playlists
-        return [
-            {
-                "id": str(playlist.id),
-                "spotify_id": playlist.spotify_id,
-                "name": playlist.name,
-                "description": playlist.description,
-                "track_count": playlist.track_count,
-                "images": playlist.images,
-                "owner": playlist.owner.dict(),
-                "public": playlist.public,
-                "collaborative": playlist.collaborative,
-                "tracks_fetched": playlist.tracks_fetched,
-                "analysis_status": playlist.analysis.status if playlist.analysis else "pending",
-                "created_at": playlist.created_at,
-                "updated_at": playlist.updated_at
-            }
-            for playlist in saved_playlists
-        ]
+        etag = make_etag("playlists", user_id, await get_collection_version(user_id))
+        return playlist_listing_response(saved_playlists, etag)
         
-    except HTTPException:
+    except (HTTPException, SpotifyRateLimitError):
         raise
     except Exception as e:
         logger.error(f"Error fetching OAuth playlists: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch playlists: {str(e)}")
 
-@router.get("/", response_model=List[Dict])
+@router.get("/", response_model=List[PlaylistSummaryResponse])
 async def get_user_playlists(
     user_id: str = MOCK_USER_ID,
-    refresh: bool = False
+    refresh: bool = False,
+    if_none_match: Optional[str] = Header(None)
 ):
     """Get all playlists for the current user"""
     try:
@@ -143,28 +138,16 @@ async def get_user_playlists(
         logger.info(f"Fetching playlists for user {user_id}")
         
         if not refresh:
+            # An unchanged listing version means the client's copy is current
+            etag = make_etag("playlists", user_id, await get_collection_version(user_id))
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            
             # Try to get cached playlists from database first
-            cached_playlists = await Playlist.find({"user_id": user_id}).to_list()
+            cached_playlists = await load_playlist_summaries(user_id)
             if cached_playlists:
                 logger.info(f"Returning {len(cached_playlists)} cached playlists")
-                return [
-                    {
-                        "id": str(playlist.id),
-                        "spotify_id": playlist.spotify_id,
-                        "name": playlist.name,
-                        "description": playlist.description,
-                        "track_count": playlist.track_count,
-                        "images": playlist.images,
-                        "owner": playlist.owner.dict(),
-                        "public": playlist.public,
-                        "collaborative": playlist.collaborative,
-                        "tracks_fetched": playlist.tracks_fetched,
-                        "analysis_status": playlist.analysis.status if playlist.analysis else "pending",
-                        "created_at": playlist.created_at,
-                        "updated_at": playlist.updated_at
-                    }
-                    for playlist in cached_playlists
-                ]
+                return playlist_listing_response(cached_playlists, etag)
         
         # Fetch fresh data from Spotify
         spotify_playlists = await spotify_oauth_service.get_user_playlists(mock_access_token, "me")
@@ -173,94 +156,274 @@ async def get_user_playlists(
             logger.warning("No playlists returned from Spotify API")
             return []
         
-        # Save or update playlists in database
-        saved_playlists = []
-        for spotify_playlist in spotify_playlists:
-            # Check if playlist already exists
-            existing_playlist = await Playlist.find_one({"spotify_id": spotify_playlist["spotify_id"]})
-            
-            if existing_playlist:
-                # Update existing playlist
-                existing_playlist.name = spotify_playlist["name"]
-                existing_playlist.description = spotify_playlist.get("description", "")
-                existing_playlist.track_count = spotify_playlist["track_count"]
-                existing_playlist.images = spotify_playlist.get("images") or []
-                existing_playlist.snapshot_id = spotify_playlist["snapshot_id"]
-                existing_playlist.update_timestamp()
-                
-                await existing_playlist.save()
-                saved_playlists.append(existing_playlist)
-            else:
-                # Create new playlist
-                new_playlist = Playlist(
-                    spotify_id=spotify_playlist["spotify_id"],
-                    name=spotify_playlist["name"],
-                    description=spotify_playlist.get("description", ""),
-                    track_count=spotify_playlist["track_count"],
-                    public=spotify_playlist.get("public", True),
-                    collaborative=spotify_playlist.get("collaborative", False),
-                    owner=spotify_playlist["owner"],
-                    user_id=user_id,
-                    images=spotify_playlist.get("images", []),
-                    external_urls=spotify_playlist.get("external_urls", {}),
-                    snapshot_id=spotify_playlist["snapshot_id"]
-                )
-                
-                await new_playlist.save()
-                saved_playlists.append(new_playlist)
+        # Save or update playlists in database with a single bulk write
+        sync_result = await sync_user_playlists(user_id, spotify_playlists)
+        saved_playlists = await load_synced_playlists(sync_result.spotify_ids)
         
         logger.info(f"Successfully processed {len(saved_playlists)} playlists")
         
         # Return formatted playlists
-        return [
-            {
-                "id": str(playlist.id),
-                "spotify_id": playlist.spotify_id,
-                "name": playlist.name,
-                "description": playlist.description,
-                "track_count": playlist.track_count,
-                "images": playlist.images,
-                "owner": playlist.owner.dict(),
-                "public": playlist.public,
-                "collaborative": playlist.collaborative,
-                "tracks_fetched": playlist.tracks_fetched,
-                "analysis_status": playlist.analysis.status if playlist.analysis else "pending",
-                "created_at": playlist.created_at,
-                "updated_at": playlist.updated_at
-            }
-            for playlist in saved_playlists
-        ]
+        etag = make_etag("playlists", user_id, await get_collection_version(user_id))
+        return playlist_listing_response(saved_playlists, etag)
         
+    except SpotifyRateLimitError:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user playlists: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch playlists: {str(e)}")
 
+async def load_playlist_summaries(user_id: str) -> List[PlaylistSummary]:
+    """Load a user's playlists as lightweight summaries (no tracks or analysis payload)"""
+    return await (
+        Playlist.find(Playlist.user_id == user_id)
+        .sort("+created_at")
+        .project(PlaylistSummary)
+        .to_list()
+    )
+
+async def load_synced_playlists(spotify_ids: List[str]) -> List[PlaylistSummary]:
+    """Load synced playlist summaries in one query, keeping Spotify's ordering"""
+    playlists = await Playlist.find({"spotify_id": {"$in": spotify_ids}}).project(PlaylistSummary).to_list()
+    by_spotify_id = {playlist.spotify_id: playlist for playlist in playlists}
+    return [by_spotify_id[spotify_id] for spotify_id in spotify_ids if spotify_id in by_spotify_id]
+
+def playlist_listing_response(playlists: List[PlaylistSummary], etag: str) -> ModelResponse:
+    """Serialize playlist summaries for listing responses"""
+    response = ModelResponse([PlaylistSummaryResponse.from_playlist(playlist) for playlist in playlists])
+    set_etag(response, etag)
+    return response
+
+async def load_playlist_version(playlist_id: str) -> Optional[Dict]:
+    """The small set of playlist fields ETags are derived from, without the analysis payload"""
+    return await Playlist.get_motor_collection().find_one({"spotify_id": playlist_id}, PLAYLIST_VERSION_FIELDS)
+
+def playlist_version(playlist: Playlist) -> Dict:
+    """The version fields of an already loaded playlist, shaped like load_playlist_version's projection"""
+    return {
+        "user_id": playlist.user_id,
+        "snapshot_id": playlist.snapshot_id,
+        "tracks_snapshot_id": playlist.tracks_snapshot_id,
+        "tracks_fetched": playlist.tracks_fetched,
+        "audio_features_fetched": playlist.audio_features_fetched,
+        "updated_at": playlist.updated_at,
+        "last_fetched_at": playlist.last_fetched_at,
+        "last_analyzed_at": playlist.last_analyzed_at,
+        "analysis": {"status": playlist.analysis.status} if playlist.analysis else None
+    }
+
+def stored_tracks_current(version: Dict) -> bool:
+    """Same rule as Playlist.needs_refresh, on a version projection"""
+    return bool(version.get("tracks_fetched")) and version.get("tracks_snapshot_id") == version.get("snapshot_id")
+
+def playlist_etag(playlist_id: str, version: Dict) -> str:
+    return make_etag(
+        "playlist",
+        playlist_id,
+        version.get("snapshot_id"),
+        version.get("tracks_snapshot_id"),
+        version.get("tracks_fetched"),
+        version.get("audio_features_fetched"),
+        version.get("updated_at"),
+        version.get("last_fetched_at"),
+        version.get("last_analyzed_at"),
+        (version.get("analysis") or {}).get("status")
+    )
+
+def tracks_etag(
+    playlist_id: str,
+    version: Dict,
+    offset: int,
+    after: Optional[int],
+    limit: Optional[int],
+    media_type: str
+) -> str:
+    # updated_at moves when audio features are attached to the stored tracks
+    return make_etag(
+        "tracks",
+        playlist_id,
+        version.get("tracks_snapshot_id"),
+        version.get("last_fetched_at"),
+        version.get("updated_at"),
+        offset,
+        after,
+        limit,
+        media_type
+    )
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+async def list_page(tracks: List[Track], after: Optional[int], offset: int, limit: Optional[int]) -> AsyncIterator[Tuple[int, Track]]:
+    """The same page iter_tracks would read, taken from tracks already in memory"""
+    start = (after + 1 if after is not None else 0) + offset
+    end = len(tracks) if limit is None else min(len(tracks), start + limit)
+    for position in range(start, end):
+        yield position, tracks[position]
+
+async def json_track_body(header: Dict[str, Any], page: AsyncIterator[Tuple[int, Track]], limit: Optional[int]) -> AsyncIterator[bytes]:
+    """
+    The regular JSON body, serialized one cursor batch per chunk. ``page``
+    must yield one track past ``limit`` when there is a next page; it is
+    used only to set ``next_cursor`` (the position to pass as ``after``).
+    """
+    yield to_json(header)[:-1] + b',"tracks":['
+    emitted = 0
+    next_cursor = None
+    last_position = None
+    batch: List[Track] = []
+    async for position, track in page:
+        if limit is not None and emitted == limit:
+            next_cursor = last_position
+            break
+        batch.append(track)
+        emitted += 1
+        last_position = position
+        if len(batch) == track_store.TRACK_CURSOR_BATCH_SIZE:
+            yield (b"," if emitted > len(batch) else b"") + to_json(batch, by_alias=False)[1:-1]
+            batch = []
+    if batch:
+        yield (b"," if emitted > len(batch) else b"") + to_json(batch, by_alias=False)[1:-1]
+    yield b'],"next_cursor":' + to_json(next_cursor) + b"}"
+
+async def ndjson_track_body(page: AsyncIterator[Tuple[int, Track]]) -> AsyncIterator[bytes]:
+    """One ``{"position": ..., "track": {...}}`` line per track; the last position is the next cursor"""
+    lines: List[Dict[str, Any]] = []
+    async for position, track in page:
+        lines.append({"position": position, "track": track})
+        if len(lines) == track_store.TRACK_CURSOR_BATCH_SIZE:
+            yield b"".join(to_json(line, by_alias=False) + b"\n" for line in lines)
+            lines = []
+    if lines:
+        yield b"".join(to_json(line, by_alias=False) + b"\n" for line in lines)
+
+async def prefetch_page(page: AsyncIterator[Tuple[int, Track]]) -> AsyncIterator[Tuple[int, Track]]:
+    """
+    Read the first track (and with it the cursor's first batch) now, so a
+    failing query raises inside the endpoint and becomes a 500 instead of
+    surfacing after the 200 headers are sent.
+    """
+    first = await anext(page, None)
+
+    async def resumed() -> AsyncIterator[Tuple[int, Track]]:
+        if first is None:
+            return
+        yield first
+        async for item in page:
+            yield item
+
+    return resumed()
+
+async def abort_on_error(body: AsyncIterator[bytes], playlist_id: str) -> AsyncIterator[bytes]:
+    """
+    Once the headers are out an error can't become a 500 any more; re-raising
+    makes the server drop the connection, so the client sees a truncated
+    transfer rather than a body that merely looks complete.
+    """
+    try:
+        async for chunk in body:
+            yield chunk
+    except Exception as e:
+        logger.error(f"Track listing for playlist {playlist_id} failed mid-stream, aborting response: {e}")
+        raise
+
+async def track_listing_response(
+    playlist_id: str,
+    page: AsyncIterator[Tuple[int, Track]],
+    total_tracks: int,
+    offset: int,
+    after: Optional[int],
+    limit: Optional[int],
+    fetched_at: Optional[datetime],
+    ndjson: bool,
+    etag: str
+) -> StreamingResponse:
+    """Stream a page of tracks so a response never holds the whole playlist in memory"""
+    page = await prefetch_page(page)
+    if ndjson:
+        body = ndjson_track_body(page)
+        media_type = NDJSON_MEDIA_TYPE
+    else:
+        header = {
+            "playlist_id": playlist_id,
+            "total_tracks": total_tracks,
+            "offset": offset,
+            "after": after,
+            "fetched_at": fetched_at
+        }
+        body = json_track_body(header, page, limit)
+        media_type = "application/json"
+    response = StreamingResponse(abort_on_error(body, playlist_id), media_type=media_type)
+    response.headers["X-Total-Count"] = str(total_tracks)
+    response.headers["Vary"] = "Accept"
+    set_etag(response, etag)
+    return response
+
+def analysis_etag(playlist_id: str, version: Dict) -> str:
+    return make_etag("analysis", playlist_id, version.get("last_analyzed_at"), (version.get("analysis") or {}).get("status"))
+
 @router.get("/{playlist_id}/tracks")
-async def get_playlist_tracks(playlist_id: str, force_refresh: bool = False):
-    """Get tracks for a specific playlist"""
+async def get_playlist_tracks(
+    playlist_id: str,
+    force_refresh: bool = False,
+    offset: int = Query(0, ge=0),
+    after: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get tracks for a specific playlist, optionally one page at a time.
+    Pages are addressed by cursor: pass the previous page's ``next_cursor``
+    as ``after``. Sending ``Accept: application/x-ndjson`` streams one track
+    per line instead of a single JSON document.
+    """
     try:
+        ndjson = wants_ndjson(accept)
+        media_type = NDJSON_MEDIA_TYPE if ndjson else "application/json"
+        
+        # Answer conditional requests for current tracks before loading anything heavy
+        if not force_refresh:
+            version = await load_playlist_version(playlist_id)
+            if version and stored_tracks_current(version):
+                etag = tracks_etag(playlist_id, version, offset, after, limit, media_type)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+        
         # Find playlist in database
         playlist = await Playlist.find_one({"spotify_id": playlist_id})
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        # Check if we need to fetch tracks
-        if not force_refresh and playlist.tracks_fetched and playlist.tracks:
-            logger.info(f"Returning {len(playlist.tracks)} cached tracks for playlist {playlist_id}")
-            return {
-                "playlist_id": playlist_id,
-                "tracks": [track.dict() for track in playlist.tracks],
-                "total_tracks": len(playlist.tracks),
-                "fetched_at": playlist.last_fetched_at
-            }
+        # Tracks are current as long as the playlist's snapshot_id has not changed
+        if not force_refresh and not playlist.needs_refresh:
+            total_tracks = await track_store.count_tracks(playlist_id)
+            logger.info(f"Streaming cached tracks of {total_tracks} for playlist {playlist_id}")
+            # One extra track is read in JSON mode to tell whether another page follows
+            page = track_store.iter_tracks(
+                playlist_id,
+                after=after,
+                skip=offset,
+                limit=limit + 1 if limit is not None and not ndjson else limit
+            )
+            return await track_listing_response(
+                playlist_id,
+                page,
+                total_tracks,
+                offset,
+                after,
+                limit,
+                playlist.last_fetched_at,
+                ndjson,
+                tracks_etag(playlist_id, playlist_version(playlist), offset, after, limit, media_type)
+            )
         
-        # Fetch tracks from Spotify
+        # Fetch tracks from Spotify, keeping audio features of tracks already stored
         mock_access_token = "mock_token"
         logger.info(f"Fetching tracks from Spotify for playlist {playlist_id}")
         
-        spotify_tracks = await spotify_oauth_service.get_playlist_tracks(playlist_id, mock_access_token)
+        diff = await refresh_playlist_tracks(playlist, mock_access_token)
         
-        if not spotify_tracks:
+        if not diff:
             logger.warning(f"No tracks returned for playlist {playlist_id}")
             return {
                 "playlist_id": playlist_id,
@@ -269,41 +432,29 @@ async def get_playlist_tracks(playlist_id: str, force_refresh: bool = False):
                 "fetched_at": datetime.now()
             }
         
-        # Convert to Track models
-        tracks = []
-        for spotify_track in spotify_tracks:
-            track = Track(
-                spotify_id=spotify_track["spotify_id"],
-                name=spotify_track["name"],
-                artists=spotify_track["artists"],
-                album=spotify_track["album"],
-                duration_ms=spotify_track["duration_ms"],
-                popularity=spotify_track["popularity"],
-                preview_url=spotify_track.get("preview_url"),
-                external_urls=spotify_track.get("external_urls", {})
-            )
-            tracks.append(track)
-        
-        # Update playlist with tracks
-        playlist.tracks = tracks
-        playlist.mark_tracks_fetched()
-        await playlist.save()
-        
-        logger.info(f"Successfully fetched and saved {len(tracks)} tracks for playlist {playlist_id}")
-        
-        return {
-            "playlist_id": playlist_id,
-            "tracks": [track.dict() for track in tracks],
-            "total_tracks": len(tracks),
-            "fetched_at": playlist.last_fetched_at
-        }
+        logger.info(f"Successfully fetched and saved {len(diff.tracks)} tracks for playlist {playlist_id}")
+        
+        page = list_page(diff.tracks, after, offset, limit + 1 if limit is not None and not ndjson else limit)
+        return await track_listing_response(
+            playlist_id,
+            page,
+            len(diff.tracks),
+            offset,
+            after,
+            limit,
+            playlist.last_fetched_at,
+            ndjson,
+            tracks_etag(playlist_id, playlist_version(playlist), offset, after, limit, media_type)
+        )
         
+    except (HTTPException, SpotifyRateLimitError):
+        raise
     except Exception as e:
         logger.error(f"Error fetching tracks for playlist {playlist_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch tracks: {str(e)}")
 
 @router.post("/{playlist_id}/fetch-audio-features")
-async def fetch_audio_features(playlist_id: str, background_tasks: BackgroundTasks):
+async def fetch_audio_features(playlist_id: str):
     """Fetch audio features for all tracks in a playlist"""
     try:
         # Find playlist
@@ -311,7 +462,8 @@ async def fetch_audio_features(playlist_id: str, background_tasks: BackgroundTas
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        if not playlist.tracks:
+        total_tracks = await track_store.count_tracks(playlist_id)
+        if not total_tracks:
             raise HTTPException(status_code=400, detail="Playlist has no tracks. Fetch tracks first.")
         
         # Check if audio features already fetched recently
@@ -319,178 +471,177 @@ async def fetch_audio_features(playlist_id: str, background_tasks: BackgroundTas
             return {
                 "message": "Audio features already fetched",
                 "playlist_id": playlist_id,
-                "tracks_with_features": len([t for t in playlist.tracks if t.audio_features])
+                "tracks_with_features": await track_store.count_tracks(playlist_id, with_features=True)
             }
         
-        # Add background task to fetch audio features
-        background_tasks.add_task(fetch_audio_features_task, playlist_id)
+        # Queue the fetch; repeated requests for the same snapshot share one job
+        job = await job_queue.enqueue(
+            JobType.FETCH_AUDIO_FEATURES,
+            playlist_id,
+            playlist.snapshot_id,
+            priority=JobPriority.HIGH
+        )
         
         return {
             "message": "Audio features fetching started in background",
             "playlist_id": playlist_id,
-            "total_tracks": len(playlist.tracks),
+            "total_tracks": total_tracks,
+            "job_id": str(job.id),
             "status": "processing"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error starting audio features fetch for playlist {playlist_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to start audio features fetch: {str(e)}")
 
-async def fetch_audio_features_task(playlist_id: str):
-    """Background task to fetch audio features"""
+async def fetch_audio_features_task(playlist_id: str) -> Optional[Dict]:
+    """Job handler to fetch audio features; raises so the queue can retry"""
     try:
         playlist = await Playlist.find_one({"spotify_id": playlist_id})
-        if not playlist or not playlist.tracks:
-            return
+        if not playlist or not playlist.tracks_fetched:
+            return None
         
         mock_access_token = "mock_token"
         
-        # Get track IDs
-        track_ids = [track.spotify_id for track in playlist.tracks if track.spotify_id]
+        # Only tracks without features need fetching; retained tracks keep theirs
+        track_ids = await track_store.track_ids_without_features(playlist_id)
         
+        # Jobs write only their own fields: a concurrent listing sync may have $set a newer snapshot_id
+        collection = Playlist.get_motor_collection()
         if not track_ids:
-            logger.warning(f"No valid track IDs found for playlist {playlist_id}")
-            return
+            logger.info(f"All tracks in playlist {playlist_id} already have audio features")
+            await collection.update_one({"_id": playlist.id}, {"$set": {"audio_features_fetched": True}})
+            await bump_collection_version(playlist.user_id)
+            return {"tracks_updated": 0}
         
-        # Fetch audio features from Spotify
+        # Fetch audio features, asking Spotify only for tracks not already cached
         logger.info(f"Fetching audio features for {len(track_ids)} tracks")
-        audio_features = await spotify_oauth_service.get_audio_features(track_ids, mock_access_token)
+        audio_features = await audio_features_cache.get_audio_features(track_ids, mock_access_token)
         
         # Create a lookup dictionary
-        features_lookup = {feature["spotify_id"]: feature for feature in audio_features}
+        features_lookup = {
+            feature["spotify_id"]: AudioFeatures(**feature).model_dump()
+            for feature in audio_features
+        }
         
-        # Update tracks with audio features
-        updated_count = 0
-        for track in playlist.tracks:
-            if track.spotify_id in features_lookup:
-                feature_data = features_lookup[track.spotify_id]
-                track.audio_features = AudioFeatures(**feature_data)
-                updated_count += 1
+        # Update stored tracks with audio features
+        updated_count = await track_store.set_audio_features(playlist_id, features_lookup)
         
-        # Mark as fetched and save
-        playlist.audio_features_fetched = True
-        playlist.update_timestamp()
-        await playlist.save()
+        # Mark as fetched
+        await collection.update_one(
+            {"_id": playlist.id},
+            {"$set": {"audio_features_fetched": True, "updated_at": datetime.now()}}
+        )
+        await bump_collection_version(playlist.user_id)
         
         logger.info(f"Successfully updated {updated_count} tracks with audio features for playlist {playlist_id}")
+        return {"tracks_updated": updated_count}
         
     except Exception as e:
         logger.error(f"Error in fetch_audio_features_task for playlist {playlist_id}: {e}")
+        raise
 
-@router.get("/{playlist_id}/analysis")
-async def get_playlist_analysis(playlist_id: str):
+@router.get("/{playlist_id}/analysis", response_model=Union[PlaylistAnalysisResponse, AnalysisNotReadyResponse])
+async def get_playlist_analysis(
+    playlist_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
     """Get analysis results for a playlist"""
     try:
+        # The analysis only changes when it is re-run, so answer revalidations from the version fields
+        version = await load_playlist_version(playlist_id)
+        if version:
+            etag = analysis_etag(playlist_id, version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        
         playlist = await Playlist.find_one({"spotify_id": playlist_id})
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
         if not playlist.analysis:
-            return {
-                "playlist_id": playlist_id,
-                "status": "not_analyzed",
-                "message": "Playlist has not been analyzed yet"
-            }
-        
-        return {
-            "playlist_id": playlist_id,
-            "analysis": playlist.analysis.dict(),
-            "summary": playlist.analysis_summary
-        }
+            response = ModelResponse(AnalysisNotReadyResponse(playlist_id=playlist_id))
+        else:
+            response = ModelResponse(
+                PlaylistAnalysisResponse.model_construct(
+                    playlist_id=playlist_id,
+                    analysis=playlist.analysis,
+                    summary=playlist.analysis_summary
+                ),
+                exclude={"analysis": {"running_stats"}}
+            )
+        set_etag(response, analysis_etag(playlist_id, playlist_version(playlist)))
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting analysis for playlist {playlist_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get analysis: {str(e)}")
 
 @router.post("/{playlist_id}/analyze")
-async def analyze_playlist(playlist_id: str, background_tasks: BackgroundTasks):
+async def analyze_playlist(playlist_id: str):
     """Start playlist analysis"""
     try:
         playlist = await Playlist.find_one({"spotify_id": playlist_id})
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        if not playlist.tracks:
+        if not playlist.tracks_fetched:
             raise HTTPException(status_code=400, detail="Playlist has no tracks. Fetch tracks first.")
         
         # Check if tracks have audio features
-        tracks_with_features = [t for t in playlist.tracks if t.audio_features]
-        if len(tracks_with_features) == 0:
+        tracks_with_features = await track_store.count_tracks(playlist_id, with_features=True)
+        if tracks_with_features == 0:
             raise HTTPException(status_code=400, detail="No audio features found. Fetch audio features first.")
         
-        # Start analysis in background
-        background_tasks.add_task(analyze_playlist_task, playlist_id)
+        # Queue the analysis; repeated requests for the same snapshot share one job
+        job = await job_queue.enqueue(
+            JobType.ANALYZE_PLAYLIST,
+            playlist_id,
+            playlist.snapshot_id,
+            priority=JobPriority.HIGH
+        )
         
         return {
             "message": "Playlist analysis started",
             "playlist_id": playlist_id,
-            "tracks_to_analyze": len(tracks_with_features),
+            "tracks_to_analyze": tracks_with_features,
+            "job_id": str(job.id),
             "status": "processing"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error starting analysis for playlist {playlist_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to start analysis: {str(e)}")
 
-async def analyze_playlist_task(playlist_id: str):
-    """Background task to analyze playlist"""
+async def analyze_playlist_task(playlist_id: str) -> Optional[Dict]:
+    """Job handler to analyze a playlist; raises so the queue can retry"""
     try:
         start_time = datetime.now()
         
         playlist = await Playlist.find_one({"spotify_id": playlist_id})
-        if not playlist or not playlist.tracks:
-            return
+        if not playlist:
+            return None
         
-        # Filter tracks with audio features
-        tracks_with_features = [t for t in playlist.tracks if t.audio_features]
+        tracks = await track_store.load_track_documents(playlist_id, fields=ANALYSIS_TRACK_FIELDS)
+        if not tracks:
+            return None
         
-        if not tracks_with_features:
-            logger.warning(f"No tracks with audio features for playlist {playlist_id}")
-            return
+        logger.info(f"Analyzing {len(tracks)} tracks for playlist {playlist_id}")
         
-        logger.info(f"Analyzing {len(tracks_with_features)} tracks for playlist {playlist_id}")
-        
-        # Calculate averages
-        total_tracks = len(tracks_with_features)
-        
-        # Audio feature averages
-        avg_acousticness = sum(t.audio_features.acousticness for t in tracks_with_features) / total_tracks
-        avg_danceability = sum(t.audio_features.danceability for t in tracks_with_features) / total_tracks
-        avg_energy = sum(t.audio_features.energy for t in tracks_with_features) / total_tracks
-        avg_instrumentalness = sum(t.audio_features.instrumentalness for t in tracks_with_features) / total_tracks
-        avg_liveness = sum(t.audio_features.liveness for t in tracks_with_features) / total_tracks
-        avg_loudness = sum(t.audio_features.loudness for t in tracks_with_features) / total_tracks
-        avg_speechiness = sum(t.audio_features.speechiness for t in tracks_with_features) / total_tracks
-        avg_valence = sum(t.audio_features.valence for t in tracks_with_features) / total_tracks
-        avg_tempo = sum(t.audio_features.tempo for t in tracks_with_features) / total_tracks
-        
-        # Other statistics
-        total_duration_ms = sum(t.duration_ms for t in playlist.tracks)
-        avg_popularity = sum(t.popularity for t in playlist.tracks) / len(playlist.tracks)
-        
-        # Find dominant characteristics
-        keys = [t.audio_features.key for t in tracks_with_features]
-        modes = [t.audio_features.mode for t in tracks_with_features]
-        time_signatures = [t.audio_features.time_signature for t in tracks_with_features]
-        
-        dominant_key = max(set(keys), key=keys.count) if keys else None
-        dominant_mode = max(set(modes), key=modes.count) if modes else None
-        dominant_time_signature = max(set(time_signatures), key=time_signatures.count) if time_signatures else None
-        
-        # Artist analysis
-        all_artists = []
-        for track in playlist.tracks:
-            for artist in track.artists:
-                all_artists.append(artist.name)
-        
-        artist_counts = {}
-        for artist in all_artists:
-            artist_counts[artist] = artist_counts.get(artist, 0) + 1
-        
-        top_artists = [
-            {"name": artist, "track_count": count}
-            for artist, count in sorted(artist_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        ]
+        # Packing the documents into arrays and the statistics are both CPU-bound; run them in a worker process
+        stats = await compute_pool.run(analyze_track_documents, tracks)
+        if stats is None:
+            logger.warning(f"No tracks with audio features for playlist {playlist_id}")
+            return None
+        avg_valence = stats["avg_valence"]
+        avg_energy = stats["avg_energy"]
+        avg_danceability = stats["avg_danceability"]
         
         # Generate mood description
         mood_description = generate_mood_description(avg_valence, avg_energy, avg_danceability)
@@ -500,38 +651,31 @@ async def analyze_playlist_task(playlist_id: str):
         # Create analysis result
         analysis = PlaylistAnalysis(
             status=AnalysisStatus.COMPLETED,
-            total_tracks=total_tracks,
-            total_duration_ms=total_duration_ms,
-            average_popularity=avg_popularity,
-            avg_acousticness=avg_acousticness,
-            avg_danceability=avg_danceability,
-            avg_energy=avg_energy,
-            avg_instrumentalness=avg_instrumentalness,
-            avg_liveness=avg_liveness,
-            avg_loudness=avg_loudness,
-            avg_speechiness=avg_speechiness,
-            avg_valence=avg_valence,
-            avg_tempo=avg_tempo,
-            dominant_key=dominant_key,
-            dominant_mode=dominant_mode,
-            dominant_time_signature=dominant_time_signature,
-            top_artists=top_artists,
-            unique_artists_count=len(artist_counts),
+            **stats,
             mood_description=mood_description,
             energy_level=energy_level,
             danceability_level=danceability_level,
-            recommendation_seed_tracks=[t.spotify_id for t in tracks_with_features[:5]],
             analysis_duration_seconds=(datetime.now() - start_time).total_seconds()
         )
         
         # Save analysis
+        previous_stats = playlist.analysis.running_stats if playlist.analysis else None
         playlist.mark_analysis_complete(analysis)
-        await playlist.save()
+        await Playlist.get_motor_collection().update_one(
+            {"_id": playlist.id},
+            {"$set": {"analysis": analysis.model_dump(), "last_analyzed_at": playlist.last_analyzed_at}}
+        )
+        await bump_collection_version(playlist.user_id)
+        
+        # Swap this playlist's contribution in the user's taste profile
+        await apply_playlist_stats(playlist.user_id, playlist_id, previous_stats, analysis.running_stats)
         
         logger.info(f"Successfully analyzed playlist {playlist_id} in {analysis.analysis_duration_seconds:.2f} seconds")
+        return {"tracks_analyzed": stats["total_tracks"]}
         
     except Exception as e:
         logger.error(f"Error in analyze_playlist_task for playlist {playlist_id}: {e}")
+        raise
 
 def generate_mood_description(valence: float, energy: float, danceability: float) -> str:
     """Generate a human-readable mood description"""
@@ -563,45 +707,57 @@ async def delete_playlist(playlist_id: str):
             raise HTTPException(status_code=404, detail="Playlist not found")
         
         await playlist.delete()
+        await track_store.delete_tracks(playlist_id)
+        await bump_collection_version(playlist.user_id)
+        await apply_playlist_stats(
+            playlist.user_id,
+            playlist_id,
+            playlist.analysis.running_stats if playlist.analysis else None,
+            None
+        )
         
         return {
             "message": "Playlist deleted successfully",
             "playlist_id": playlist_id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting playlist {playlist_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to delete playlist: {str(e)}")
 
-@router.get("/{playlist_id}")
-async def get_playlist_details(playlist_id: str):
+@router.get("/{playlist_id}", response_model=PlaylistDetailsResponse)
+async def get_playlist_details(
+    playlist_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
     """Get detailed information about a specific playlist"""
     try:
+        version = await load_playlist_version(playlist_id)
+        if version:
+            etag = playlist_etag(playlist_id, version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        
         playlist = await Playlist.find_one({"spotify_id": playlist_id})
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        return {
-            "id": str(playlist.id),
-            "spotify_id": playlist.spotify_id,
-            "name": playlist.name,
-            "description": playlist.description,
-            "track_count": playlist.track_count,
-            "images": playlist.images,
-            "owner": playlist.owner.dict(),
-            "public": playlist.public,
-            "collaborative": playlist.collaborative,
-            "tracks_fetched": playlist.tracks_fetched,
-            "audio_features_fetched": playlist.audio_features_fetched,
-            "analysis_status": playlist.analysis.status if playlist.analysis else "pending",
-            "analysis_summary": playlist.analysis_summary,
-            "created_at": playlist.created_at,
-            "updated_at": playlist.updated_at,
-            "last_fetched_at": playlist.last_fetched_at,
-            "last_analyzed_at": playlist.last_analyzed_at,
-            "needs_refresh": playlist.needs_refresh
-        }
+        response = ModelResponse(PlaylistDetailsResponse.from_playlist(playlist))
+        set_etag(response, playlist_etag(playlist_id, playlist_version(playlist)))
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting playlist details for {playlist_id}: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to get playlist details: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to get playlist details: {str(e)}")
+
+# Handlers for the durable job queue's worker pool
+job_queue.register(JobType.FETCH_AUDIO_FEATURES, lambda job: fetch_audio_features_task(job.playlist_id))
+job_queue.register(JobType.ANALYZE_PLAYLIST, lambda job: analyze_playlist_task(job.playlist_id))
+job_queue.register(
+    JobType.REFRESH_PLAYLIST_TRACKS,
+    lambda job: refresh_changed_playlist(job.playlist_id, job.payload.get("user_id"))
+)
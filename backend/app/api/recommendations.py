@@ -0,0 +1,108 @@
+"""
+Recommendation API Routes
+Nearest-neighbor track recommendations from the audio-feature similarity index
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List
+from loguru import logger
+import numpy as np
+
+from ..services.similarity import Neighbor, similarity_service
+from ..services.analysis import FEATURE_COLUMNS, normalize_features
+from ..services import track_store
+from ..models.playlist import Playlist
+
+router = APIRouter(prefix="/api/recommendations", tags=["recommendations"])
+
+async def recommendations_response(neighbors: List[Neighbor]) -> List[Dict]:
+    """Attach stored track details to search hits"""
+    summaries = await track_store.load_track_summaries([neighbor.track_id for neighbor in neighbors])
+    return [
+        {
+            "spotify_id": neighbor.track_id,
+            "distance": neighbor.distance,
+            **summaries.get(neighbor.track_id, {})
+        }
+        for neighbor in neighbors
+    ]
+
+def require_index():
+    if similarity_service.index is None:
+        detail = "Similarity index is being built" if similarity_service.building else "Similarity index is not available"
+        raise HTTPException(status_code=503, detail=detail)
+
+@router.get("/playlists/{playlist_id}")
+async def recommend_for_playlist(
+    playlist_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    exact: bool = Query(True, description="KD-tree search; false uses the faster approximate IVF search")
+):
+    """Tracks closest to a playlist's audio-feature centroid, excluding its own tracks"""
+    try:
+        require_index()
+        
+        playlist = await Playlist.find_one({"spotify_id": playlist_id})
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist not found")
+        
+        if not playlist.analysis or not playlist.analysis.total_tracks:
+            raise HTTPException(status_code=400, detail="Playlist has not been analyzed yet. Analyze it first.")
+        
+        # The analysis averages are the centroid; normalization commutes with the mean except for clipped outliers
+        centroid = np.array([getattr(playlist.analysis, f"avg_{name}") for name in FEATURE_COLUMNS], dtype=np.float32)
+        exclude = set(await track_store.load_track_ids(playlist_id))
+        neighbors = similarity_service.nearest(normalize_features(centroid), k=limit, exclude=exclude, exact=exact)
+        
+        return {
+            "playlist_id": playlist_id,
+            "exact": exact,
+            "recommendations": await recommendations_response(neighbors)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting recommendations for playlist {playlist_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get recommendations: {str(e)}")
+
+@router.get("/tracks/{track_id}")
+async def recommend_for_track(
+    track_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    exact: bool = Query(True, description="KD-tree search; false uses the faster approximate IVF search")
+):
+    """Tracks that sound most like a seed track"""
+    try:
+        require_index()
+        
+        vector = await similarity_service.vector_for_track(track_id)
+        if vector is None:
+            raise HTTPException(status_code=404, detail="No audio features stored for this track")
+        
+        neighbors = similarity_service.nearest(vector, k=limit, exclude={track_id}, exact=exact)
+        
+        return {
+            "track_id": track_id,
+            "exact": exact,
+            "recommendations": await recommendations_response(neighbors)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting recommendations for track {track_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get recommendations: {str(e)}")
+
+@router.get("/index")
+async def get_index_status():
+    """Size and freshness of the similarity index"""
+    return similarity_service.get_stats()
+
+@router.post("/index/rebuild")
+async def rebuild_index():
+    """Rebuild the similarity index from all stored audio features in the background"""
+    started = similarity_service.schedule_rebuild()
+    return {
+        "message": "Similarity index rebuild started" if started else "Similarity index rebuild already running",
+        "status": "processing"
+    }
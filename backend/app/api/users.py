@@ -0,0 +1,29 @@
+"""
+User API Routes
+User-level views merged across playlists
+"""
+from fastapi import APIRouter, HTTPException, Query
+from loguru import logger
+
+from ..services.taste_profile import get_taste_profile, taste_profile_response
+
+router = APIRouter(prefix="/api/users", tags=["users"])
+
+@router.get("/{user_id}/taste-profile")
+async def get_user_taste_profile(
+    user_id: str,
+    rebuild: bool = Query(False, description="Re-merge from every analyzed playlist instead of the stored profile")
+):
+    """Get a user's taste profile merged from their analyzed playlists"""
+    try:
+        profile = await get_taste_profile(user_id, rebuild=rebuild)
+        if not profile.playlist_ids:
+            raise HTTPException(status_code=404, detail="No analyzed playlists for this user")
+        
+        return taste_profile_response(profile)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting taste profile for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get taste profile: {str(e)}")
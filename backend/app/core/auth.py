@@ -1,15 +1,25 @@
 import os
-from typing import Optional
+import re
+import time
+import asyncio
+from typing import Any, Dict, Optional
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
-import requests
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
+from loguru import logger
+import httpx
 
 # Auth0 configuration
 AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN')
 AUTH0_AUDIENCE = os.getenv('AUTH0_AUDIENCE', f'https://{AUTH0_DOMAIN}/api/v2/')
 ALGORITHMS = ['RS256']
 
+# JWKS cache configuration
+JWKS_CACHE_TTL = float(os.getenv('JWKS_CACHE_TTL', '3600'))
+JWKS_REFRESH_MARGIN = float(os.getenv('JWKS_REFRESH_MARGIN', '300'))
+JWKS_MIN_REFETCH_INTERVAL = float(os.getenv('JWKS_MIN_REFETCH_INTERVAL', '30'))
+
 security = HTTPBearer()
 
 class Auth0User:
@@ -18,36 +28,133 @@ class Auth0User:
         self.email = email
         self.name = name
 
-def get_auth0_public_key():
-    """Fetch Auth0 public key for token verification"""
-    try:
-        url = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
-        response = requests.get(url)
-        jwks = response.json()
-        return jwks
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unable to fetch Auth0 public key: {str(e)}")
+class JWKSCache:
+    """
+    Auth0 signing keys keyed by kid, parsed once into jose Key objects so
+    token verification is pure CPU work. Keys are refreshed in the background
+    before the TTL runs out; a token with an unknown kid (key rotation)
+    triggers at most one refetch per JWKS_MIN_REFETCH_INTERVAL, and
+    concurrent fetches are collapsed into one.
+    """
+    
+    def __init__(self, ttl: float = JWKS_CACHE_TTL, refresh_margin: float = JWKS_REFRESH_MARGIN,
+                 min_refetch_interval: float = JWKS_MIN_REFETCH_INTERVAL):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_refetch_interval = min_refetch_interval
+        self._keys: Dict[str, Key] = {}
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._last_fetch = float('-inf')
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.transport: Optional[httpx.AsyncBaseTransport] = None  # in-process JWKS for benchmarks
+        self.fetches = 0
+        self.fetch_errors = 0
+    
+    @property
+    def url(self) -> str:
+        return f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
+    
+    async def get_key(self, kid: str) -> Optional[Key]:
+        """Parsed signing key for a kid; only awaits the network when the cache is empty, expired or missing the kid"""
+        now = time.monotonic()
+        if not self._keys or now >= self._expires_at:
+            await self.refresh()
+        elif now >= self._refresh_at:
+            self._schedule_refresh()
+        
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._last_fetch >= self.min_refetch_interval:
+            # Possibly a freshly rotated key; refetch once, rate-limited
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+    
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+    
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f'Background JWKS refresh failed: {e}')
+    
+    async def refresh(self):
+        """Fetch and parse the JWKS; callers that queue behind an in-flight fetch reuse its result"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        requested_at = time.monotonic()
+        async with self._lock:
+            if self._last_fetch >= requested_at:
+                return
+            self.fetches += 1
+            try:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=10.0, transport=self.transport)
+                response = await self._client.get(self.url)
+                response.raise_for_status()
+                jwks = response.json()
+            except Exception as e:
+                self.fetch_errors += 1
+                if not self._keys:
+                    raise
+                # Keep serving the keys we have; try again after the minimum interval
+                logger.warning(f'JWKS fetch failed, keeping {len(self._keys)} cached keys: {e}')
+                self._expires_at = max(self._expires_at, time.monotonic() + self.min_refetch_interval)
+                self._refresh_at = time.monotonic() + self.min_refetch_interval
+                return
+            finally:
+                # Stamped on completion so callers that queued behind this fetch reuse it
+                self._last_fetch = time.monotonic()
+            
+            keys = {}
+            for key in jwks.get('keys', []):
+                if key.get('kty') != 'RSA' or key.get('use', 'sig') != 'sig' or 'kid' not in key:
+                    continue
+                keys[key['kid']] = jwk.construct(key, algorithm=key.get('alg', ALGORITHMS[0]))
+            self._keys = keys
+            ttl = max(self._max_age(response), self.min_refetch_interval)
+            self._expires_at = time.monotonic() + ttl
+            self._refresh_at = self._expires_at - min(self.refresh_margin, ttl / 2)
+    
+    def _max_age(self, response: httpx.Response) -> float:
+        """Honour the JWKS endpoint's Cache-Control max-age, falling back to the configured TTL"""
+        match = re.search(r'max-age=(\d+)', response.headers.get('cache-control', ''))
+        return float(match.group(1)) if match else self.ttl
+    
+    def start(self):
+        """Warm the cache in the background so the first request doesn't wait on Auth0"""
+        if AUTH0_DOMAIN:
+            self._schedule_refresh()
+    
+    async def close(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'keys': len(self._keys),
+            'expires_in_seconds': max(0.0, self._expires_at - time.monotonic()) if self._keys else 0.0,
+            'fetches': self.fetches,
+            'fetch_errors': self.fetch_errors
+        }
+
+jwks_cache = JWKSCache()
 
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Auth0User:
     """Verify and decode Auth0 JWT token"""
     try:
-        # Get public key
-        jwks = get_auth0_public_key()
-        
         # Decode token header to get key ID
         unverified_header = jwt.get_unverified_header(credentials.credentials)
         
-        # Find the right key
-        rsa_key = {}
-        for key in jwks['keys']:
-            if key['kid'] == unverified_header['kid']:
-                rsa_key = {
-                    'kty': key['kty'],
-                    'kid': key['kid'],
-                    'use': key['use'],
-                    'n': key['n'],
-                    'e': key['e']
-                }
+        # Find the right key in the cached key set
+        rsa_key = await jwks_cache.get_key(unverified_header.get('kid'))
         
         if not rsa_key:
             raise HTTPException(status_code=401, detail='Unable to find appropriate key')
@@ -68,6 +175,8 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         
         return Auth0User(user_id=user_id, email=email, name=name)
         
+    except HTTPException:
+        raise
     except JWTError as e:
         raise HTTPException(status_code=401, detail=f'Token verification failed: {str(e)}')
     except Exception as e:
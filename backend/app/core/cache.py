@@ -0,0 +1,145 @@
+"""
+In-Process Caches
+Small bounded caches shared by the service layer
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+class LRUCache:
+    """Bounded least-recently-used cache with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Return cached values for the keys present, counting hits and misses"""
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def put_many(self, items: Dict[Hashable, Any]):
+        for key, value in items.items():
+            self.put(key, value)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class TTLCache(LRUCache):
+    """Bounded LRU cache whose entries also expire, each with its own TTL"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        super().__init__(maxsize=maxsize)
+        self.ttl = ttl
+        self.clock = clock
+        self.expirations = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > self.clock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is not None and entry[0] <= self.clock():
+            del self._data[key]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value for ``ttl`` seconds (the cache default when omitted); a non-positive TTL stores nothing"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+        super().put(key, (self.clock() + ttl, value))
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "ttl": self.ttl, "expirations": self.expirations}
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one in-flight call whose
+    result (or exception) every caller shares. A caller being cancelled does
+    not cancel the shared call for the others.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._in_flight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: "asyncio.Future[Any]"):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled():
+            future.exception()  # Mark retrieved even if every caller was cancelled
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._in_flight), "calls": self.calls, "shared": self.shared}
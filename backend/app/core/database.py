@@ -7,7 +7,11 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from loguru import logger
 
-from ..models.playlist import Playlist, User
+from ..models.playlist import Playlist, PlaylistTrack, User, TrackFeatures, UserTasteProfile, OAuthState, CollectionVersion
+from ..models.job import Job
+from .metrics import MongoCommandMetrics
+
+DOCUMENT_MODELS = [Playlist, PlaylistTrack, User, TrackFeatures, UserTasteProfile, OAuthState, CollectionVersion, Job]
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -23,11 +27,11 @@ async def connect_to_mongo():
         
         logger.info(f"Connecting to MongoDB...")
         
-        # Create connection
-        db.client = AsyncIOMotorClient(mongodb_url)
+        # Create connection; the listener times every command for /metrics
+        db.client = AsyncIOMotorClient(mongodb_url, event_listeners=[MongoCommandMetrics()])
         
         # Get database
-        db.database = db.client.get_database("spotify_analyzer")
+        db.database = db.client.get_database(os.getenv("MONGODB_DATABASE", "spotify_analyzer"))
         
         # Test connection
         await db.client.admin.command('ping')
@@ -36,7 +40,7 @@ async def connect_to_mongo():
         # Initialize Beanie with document models
         await init_beanie(
             database=db.database,
-            document_models=[Playlist, User]
+            document_models=DOCUMENT_MODELS
         )
         logger.info("✅ Beanie initialized with document models")
         
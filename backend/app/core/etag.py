@@ -0,0 +1,43 @@
+"""
+HTTP Conditional Requests
+Strong ETags and If-None-Match handling for cacheable GET endpoints
+"""
+import hashlib
+from datetime import datetime
+from enum import Enum
+from typing import Any, Optional
+
+from fastapi import Response
+
+# Clients must revalidate every time, but a matching ETag costs only a 304
+CACHE_CONTROL = "private, no-cache"
+
+def _etag_part(part: Any) -> str:
+    # Enums hash by value and datetimes at BSON's millisecond precision, so a model
+    # field and its value read back from Mongo give the same tag
+    if isinstance(part, Enum):
+        part = part.value
+    elif isinstance(part, datetime):
+        part = part.replace(microsecond=part.microsecond // 1000 * 1000)
+    return str(part)
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from the values a representation is derived from"""
+    digest = hashlib.sha1("\x1f".join(_etag_part(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for this header)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
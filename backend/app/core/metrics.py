@@ -0,0 +1,242 @@
+"""
+Metrics
+In-process counters, gauges and latency histograms exposed in the Prometheus text format
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from loguru import logger
+from pymongo import monitoring
+
+# Seconds; spans cache hits through slow Spotify pages and full analyses
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric(ABC):
+    """
+    Base for a metric family keyed by label values. Updates take a lock
+    because some are recorded from pymongo's monitoring threads; the lock
+    only guards a few list/dict updates so it is uncontended in practice.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        # Per label set; the value layout is up to each metric type
+        self._values: Dict[LabelValues, Any] = {}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for every label set"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in values]
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+class Histogram(Metric):
+    """Cumulative-bucket latency histogram; observe() costs one bisect and a few increments"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Values per label set: ([count per bucket (last is +Inf)], [sum])
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[label_values] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts), total[0]) for labels, (counts, total) in self._values.items()]
+        lines = []
+        bucket_names = self.label_names + ("le",)
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """All metric families, plus async collectors that refresh gauges at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]):
+        self._collectors.append(collector)
+
+    async def render(self) -> str:
+        # A failing collector (e.g. Mongo down) only leaves its gauges stale; everything else still renders
+        for collector in self._collectors:
+            try:
+                await collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {getattr(collector, '__qualname__', collector)} failed: {e}")
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+# Create singleton instance
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route template, method and status",
+    ("method", "route", "status")
+))
+SPOTIFY_REQUEST_DURATION = registry.register(Histogram(
+    "spotify_request_duration_seconds",
+    "Spotify Web API call latency (on the wire, after rate limiting) by endpoint, method and status",
+    ("endpoint", "method", "status")
+))
+MONGO_COMMAND_DURATION = registry.register(Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by command and outcome",
+    ("command", "outcome")
+))
+JOB_DURATION = registry.register(Histogram(
+    "job_duration_seconds",
+    "Background job run time by job type and outcome",
+    ("job_type", "outcome")
+))
+JOB_QUEUE_DEPTH = registry.register(Gauge(
+    "job_queue_depth",
+    "Active jobs by job type and status",
+    ("job_type", "status")
+))
+SPOTIFY_SCHEDULER_QUEUE_DEPTH = registry.register(Gauge(
+    "spotify_scheduler_queue_depth",
+    "Spotify requests waiting for a rate-limit token"
+))
+SPOTIFY_SCHEDULER_QUEUED_USERS = registry.register(Gauge(
+    "spotify_scheduler_queued_users",
+    "Users with Spotify requests waiting in the scheduler"
+))
+SPOTIFY_SCHEDULER_WAIT = registry.register(Gauge(
+    "spotify_scheduler_wait_seconds",
+    "Time Spotify requests waited for a rate-limit token since startup, average and maximum",
+    ("stat",)
+))
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request, including streamed
+    bodies. Requests are labelled by route template (``/api/playlists/{playlist_id}``)
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            )
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener; pymongo measures the duration itself"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, "ok")
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, "error")
+
+# Path segments following these are IDs (/v1/playlists/{id}/tracks, /v1/users/{id}/playlists)
+_SPOTIFY_COLLECTIONS = {"playlists", "users", "tracks", "albums", "artists", "audio-features", "audio-analysis"}
+
+def spotify_endpoint(path: str) -> str:
+    """Spotify URL path with IDs replaced, for use as a bounded label"""
+    segments = path.strip("/").split("/")
+    for index in range(1, len(segments)):
+        if segments[index - 1] in _SPOTIFY_COLLECTIONS:
+            segments[index] = "{id}"
+    return "/" + "/".join(segments)
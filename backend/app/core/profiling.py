@@ -0,0 +1,322 @@
+"""
+Profiling
+Opt-in sampling profiler for selected requests and background jobs, stored as collapsed stacks
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_DIR = os.getenv("PROFILING_DIR", "data/profiles")
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "200"))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+# Requests sending X-Profile-Token with this value are profiled; also required by the admin endpoints
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+# Profile every request and keep those slower than this; 0 disables
+PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", "0"))
+# Job types to profile, comma-separated, or * for all
+PROFILING_JOB_TYPES = {name.strip() for name in os.getenv("PROFILING_JOB_TYPES", "").split(",") if name.strip()}
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_ID_PATTERN = re.compile(r"^[\w.-]+$")
+# Reading stored profiles is never itself profiled
+ADMIN_PROFILES_PATH = "/api/admin/profiles"
+
+_ASYNCIO_EVENTS = os.path.join("asyncio", "events.py")
+_labels: Dict[CodeType, str] = {}
+
+def _frame_label(code: CodeType) -> str:
+    """``qualname (path:line)``, cached per code object since the sampler sees the same ones repeatedly"""
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if "site-packages" + os.sep in filename:
+            filename = filename.split("site-packages" + os.sep, 1)[1]
+        elif filename.startswith(os.getcwd() + os.sep):
+            filename = os.path.relpath(filename)
+        label = f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+def _running_stack(frame: Optional[FrameType]) -> List[str]:
+    """Stack of the task stepping on the loop thread, trimmed below the event loop's Handle._run"""
+    labels = []
+    while frame is not None and not frame.f_code.co_filename.endswith(_ASYNCIO_EVENTS):
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+def _awaiting_stack(task: asyncio.Task) -> List[str]:
+    """Where a suspended task is parked, following its chain of awaited coroutines"""
+    labels = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        labels.append(_frame_label(frame.f_code))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) or getattr(awaitable, "ag_await", None)
+    labels.append(f"[awaiting {type(awaitable).__name__}]" if awaitable is not None else "[awaiting]")
+    return labels
+
+class Profile:
+    """
+    Samples of one request or job. Each tick records one stack: the
+    running stack when one of the profile's tasks is on the CPU, otherwise
+    where its latest task is waiting, so the result is a wall-clock profile
+    in which time spent on Mongo or Spotify shows up as ``[awaiting ...]``.
+    """
+
+    def __init__(self, kind: str, name: str, trigger: str):
+        self.kind = kind
+        self.name = name
+        self.trigger = trigger
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        # The request's own task, plus tasks that send on its behalf (streamed bodies run in a child task)
+        self.tasks: List[asyncio.Task] = [asyncio.current_task()]
+        self.stacks: Dict[str, int] = defaultdict(int)
+        self.samples = 0
+        self.meta: Dict[str, Any] = {}
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def track(self, task: Optional[asyncio.Task]):
+        if task is not None and task is not self.tasks[-1] and task not in self.tasks:
+            self.tasks.append(task)
+
+    def sample(self, current_tasks: Dict[asyncio.AbstractEventLoop, asyncio.Task]):
+        """Called from the sampler thread with asyncio's loop -> running task map"""
+        running = current_tasks.get(self.loop)
+        if running is not None and running in self.tasks:
+            stack = _running_stack(sys._current_frames().get(self.thread_id))
+        else:
+            waiting = next((task for task in reversed(self.tasks) if not task.done()), None)
+            if waiting is None:
+                return
+            stack = _awaiting_stack(waiting)
+        if stack:
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format, readable by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+class Sampler:
+    """
+    One daemon thread sampling every active profile each interval. It is
+    started by the first profile and sleeps on an event while none are
+    active, so a process that never profiles never pays for it.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: List[Profile] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, profile: Profile):
+        # Taking the lock means no sample of this profile is in progress afterwards
+        with self._lock:
+            self._profiles.remove(profile)
+
+    def _run(self):
+        # Private to asyncio (shared by its C and Python tasks), so only needed once something is profiled
+        try:
+            from asyncio.tasks import _current_tasks
+        except ImportError:
+            logger.warning("Profiling sampling unavailable on this runtime: asyncio.tasks._current_tasks is missing")
+            return
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._profiles:
+                    self._wake.clear()
+                    continue
+                for profile in self._profiles:
+                    try:
+                        profile.sample(_current_tasks)
+                    except Exception:
+                        # Frames and tasks change under us; a torn read just loses one sample
+                        pass
+            time.sleep(self.interval)
+
+class ProfileStore:
+    """Profiles as ``<id>.collapsed`` plus ``<id>.json`` metadata, keeping the newest max_profiles"""
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profile_id: str, collapsed: str, meta: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile_id}.collapsed").write_text(collapsed)
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(meta, default=str))
+        self.rotate()
+
+    def rotate(self):
+        # IDs start with a timestamp, so name order is age order
+        for path in sorted(self.directory.glob("*.json"))[:-self.max_profiles or None]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".collapsed").unlink(missing_ok=True)
+
+    def list(self, limit: int) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in sorted(self.directory.glob("*.json"), reverse=True)[:limit]:
+            try:
+                profiles.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[str]:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.collapsed"
+        return path.read_text() if path.exists() else None
+
+class Profiler:
+    """Decides what to profile and hands finished profiles to the store"""
+
+    def __init__(self):
+        self.enabled = PROFILING_ENABLED
+        self.token = PROFILING_TOKEN
+        self.sample_rate = PROFILING_SAMPLE_RATE
+        self.slow_ms = PROFILING_SLOW_MS
+        self.job_types = PROFILING_JOB_TYPES
+        self.sampler = Sampler(PROFILING_INTERVAL_MS / 1000)
+        self.store = ProfileStore(PROFILING_DIR, PROFILING_MAX_PROFILES)
+
+    def token_valid(self, value: Optional[str]) -> bool:
+        return bool(self.token) and value is not None and hmac.compare_digest(value, self.token)
+
+    def select_request(self, headers) -> Optional[str]:
+        """Why a request should be profiled (header, sample or slow), or None"""
+        if self.token:
+            for name, value in headers:
+                if name == PROFILE_TOKEN_HEADER and self.token_valid(value.decode("latin-1")):
+                    return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        if self.slow_ms:
+            return "slow"
+        return None
+
+    def begin(self, kind: str, name: str, trigger: str) -> Profile:
+        profile = Profile(kind, name, trigger)
+        self.sampler.add(profile)
+        return profile
+
+    def finish(self, profile: Profile, keep: bool = True):
+        """Stop sampling; a kept profile is written from the default executor, off the event loop"""
+        self.sampler.remove(profile)
+        profile.duration = time.perf_counter() - profile.start
+        # An explicitly requested profile is kept even when the request finished between samples
+        if not keep or (not profile.samples and profile.trigger != "header"):
+            return
+        slug = re.sub(r"[^\w]+", "_", profile.name).strip("_")[:60] or "root"
+        profile_id = f"{profile.started_at:%Y%m%dT%H%M%S%f}-{profile.kind}-{slug}-{secrets.token_hex(3)}"
+        meta = {
+            "profile_id": profile_id,
+            "kind": profile.kind,
+            "name": profile.name,
+            "trigger": profile.trigger,
+            "started_at": profile.started_at.isoformat(),
+            "duration_ms": round(profile.duration * 1000, 2),
+            "samples": profile.samples,
+            "interval_ms": self.sampler.interval * 1000,
+            **profile.meta
+        }
+        future = profile.loop.run_in_executor(None, self.store.save, profile_id, profile.collapsed(), meta)
+        future.add_done_callback(_log_save_error)
+
+    def profile_job(self, job_type: str, **meta):
+        """Context manager profiling a job handler; a no-op unless the job type is selected"""
+        if not self.enabled or not (job_type in self.job_types or "*" in self.job_types):
+            return nullcontext()
+        return self._profiled("job", job_type, meta)
+
+    @asynccontextmanager
+    async def _profiled(self, kind: str, name: str, meta: Dict[str, Any]):
+        profile = self.begin(kind, name, kind)
+        profile.meta.update(meta)
+        try:
+            yield profile
+        finally:
+            self.finish(profile)
+
+def _log_save_error(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"Failed to save profile: {future.exception()}")
+
+# Create singleton instance
+profiler = Profiler()
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests selected by the X-Profile-Token
+    header, PROFILING_SAMPLE_RATE or PROFILING_SLOW_MS. With profiling
+    disabled (the default) it costs one attribute check per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not profiler.enabled or scope["type"] != "http" or scope["path"].startswith(ADMIN_PROFILES_PATH):
+            await self.app(scope, receive, send)
+            return
+
+        trigger = profiler.select_request(scope["headers"])
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.begin("request", scope["path"], trigger)
+        status = 500
+
+        async def send_profiled(message):
+            nonlocal status
+            profile.track(asyncio.current_task())
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            profile.name = f"{scope['method']} {route or scope['path']}"
+            profile.meta.update({"method": scope["method"], "path": scope["path"], "route": route, "status": status})
+            elapsed_ms = (time.perf_counter() - profile.start) * 1000
+            profiler.finish(profile, keep=trigger != "slow" or elapsed_ms >= profiler.slow_ms)
@@ -0,0 +1,32 @@
+"""
+Fast JSON Responses
+Response class that serializes Pydantic models straight to JSON bytes
+"""
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+from pydantic_core import to_json
+
+class ModelResponse(Response):
+    """
+    Renders its content (a model, a list of models, or plain data) with
+    pydantic-core in one pass, without the dict copies and re-validation of
+    FastAPI's default jsonable_encoder path. Endpoints return it directly
+    and declare the schema with ``response_model`` for the OpenAPI docs.
+    Field names are used rather than Mongo aliases, as ``.dict()`` did.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        exclude: Optional[Dict[str, Any]] = None
+    ):
+        self.exclude = exclude
+        super().__init__(content, status_code=status_code, headers=headers)
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content, by_alias=False, exclude=self.exclude)
@@ -2,17 +2,33 @@
 Spotify Playlist Analyzer - FastAPI Backend
 Main application entry point with OAuth support
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
+import math
 from datetime import datetime
 from contextlib import asynccontextmanager
 from loguru import logger
 
 from .core.database import connect_to_mongo, close_mongo_connection
+from .core.auth import jwks_cache
+from .core.metrics import MetricsMiddleware, registry as metrics_registry
+from .core.profiling import ProfilingMiddleware
 from .api.playlists import router as playlist_router
 from .api.auth import router as auth_router
+from .api.users import router as users_router
+from .api.recommendations import router as recommendations_router
+from .api.jobs import router as jobs_router
+from .api.admin import router as admin_router
+from .services.spotify_service import spotify_oauth_service
+from .services.rate_limiter import SpotifyRateLimitError
+from .services.feature_cache import audio_features_cache
+from .services.similarity import similarity_service
+from .services.job_queue import job_queue
+from .services.compute_pool import compute_pool
+from .services.oauth_state import oauth_state_store
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -20,9 +36,19 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Spotify Playlist Analyzer API...")
     await connect_to_mongo()
+    await spotify_oauth_service.start()
+    await compute_pool.start()
+    await similarity_service.start()
+    await job_queue.start()
+    jwks_cache.start()
     yield
     # Shutdown
     logger.info("🛑 Shutting down Spotify Playlist Analyzer API...")
+    await job_queue.close()
+    await jwks_cache.close()
+    await similarity_service.close()
+    await compute_pool.close()
+    await spotify_oauth_service.close()
     await close_mongo_connection()
 
 # Create FastAPI app
@@ -44,9 +70,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (track listings, analyses) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1000")))
+
+# Samples selected requests when PROFILING_ENABLED is set; a pass-through otherwise
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so request latency includes compression and CORS handling
+app.add_middleware(MetricsMiddleware)
+
+# Gauges read from shared state when /metrics is scraped
+metrics_registry.add_collector(job_queue.collect_metrics)
+metrics_registry.add_collector(spotify_oauth_service.scheduler.collect_metrics)
+
+@app.exception_handler(SpotifyRateLimitError)
+async def spotify_rate_limit_handler(request: Request, exc: SpotifyRateLimitError):
+    """Surface exhausted Spotify rate limits as 429 instead of empty results"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Spotify API rate limit exceeded, please retry later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
 # Include routers
 app.include_router(playlist_router)
 app.include_router(auth_router)  # Add OAuth routes
+app.include_router(users_router)
+app.include_router(recommendations_router)
+app.include_router(jobs_router)
+app.include_router(admin_router)
 
 @app.get("/")
 async def root():
@@ -90,6 +142,15 @@ async def health_check():
                 "database": db_status,
                 "spotify_oauth": spotify_status
             },
+            "spotify_http_pool": spotify_oauth_service.get_pool_stats(),
+            "spotify_scheduler": spotify_oauth_service.scheduler.get_stats(),
+            "spotify_user_cache": spotify_oauth_service.get_user_cache_stats(),
+            "audio_features_cache": audio_features_cache.get_stats(),
+            "similarity_index": similarity_service.get_stats(),
+            "job_queue": await job_queue.get_stats(),
+            "compute_pool": compute_pool.get_stats(),
+            "jwks_cache": jwks_cache.get_stats(),
+            "oauth_state_store": oauth_state_store.get_stats(),
             "oauth_ready": db_status == "connected" and spotify_status == "configured"
         }
     except Exception as e:
@@ -99,6 +160,11 @@ async def health_check():
             "error": str(e)
         }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint: API, Spotify, MongoDB and job queue metrics"""
+    return PlainTextResponse(await metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/test")
 async def test_endpoint():
     """Test endpoint to verify API is working"""
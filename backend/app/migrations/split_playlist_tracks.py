@@ -0,0 +1,58 @@
+"""
+Migration: Split Playlist Tracks
+Moves tracks embedded in playlist documents into the playlist_tracks collection
+
+Run with: python -m app.migrations.split_playlist_tracks
+"""
+import asyncio
+
+from loguru import logger
+
+from ..core.database import connect_to_mongo, close_mongo_connection
+from ..models.playlist import Playlist, Track
+from ..services.track_store import replace_tracks
+
+async def split_playlist_tracks() -> int:
+    """Move embedded tracks out of every playlist document; safe to re-run"""
+    collection = Playlist.get_motor_collection()
+    cursor = collection.find(
+        {"tracks": {"$exists": True}},
+        {"_id": 1, "spotify_id": 1, "snapshot_id": 1, "tracks_snapshot_id": 1, "tracks": 1}
+    )
+
+    migrated = 0
+    async for doc in cursor:
+        spotify_id = doc["spotify_id"]
+        embedded = doc.get("tracks") or []
+
+        tracks = []
+        for raw_track in embedded:
+            try:
+                tracks.append(Track(**raw_track))
+            except ValueError as e:
+                logger.warning(f"Skipping invalid track in playlist {spotify_id}: {e}")
+
+        if tracks:
+            await replace_tracks(spotify_id, tracks)
+
+        update = {"$unset": {"tracks": ""}}
+        # Embedded tracks predate tracks_snapshot_id; mark the copied ones current so they aren't all re-fetched
+        if tracks and not doc.get("tracks_snapshot_id"):
+            update["$set"] = {"tracks_snapshot_id": doc.get("snapshot_id")}
+        await collection.update_one({"_id": doc["_id"]}, update)
+
+        migrated += 1
+        logger.info(f"Migrated {len(tracks)} tracks for playlist {spotify_id}")
+
+    logger.info(f"✅ Split tracks out of {migrated} playlists")
+    return migrated
+
+async def main():
+    await connect_to_mongo()
+    try:
+        await split_playlist_tracks()
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Job Data Models
+MongoDB models for the durable background job queue
+"""
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from typing import Dict, Optional, Any
+from datetime import datetime
+from enum import Enum
+
+class JobType(str, Enum):
+    """Kinds of background work run by the worker pool"""
+    FETCH_AUDIO_FEATURES = "fetch_audio_features"
+    ANALYZE_PLAYLIST = "analyze_playlist"
+    REFRESH_PLAYLIST_TRACKS = "refresh_playlist_tracks"
+
+class JobStatus(str, Enum):
+    """Lifecycle of a job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class JobPriority:
+    """Higher runs first"""
+    LOW = 0  # Background maintenance, e.g. snapshot-driven track refreshes
+    NORMAL = 5
+    HIGH = 10  # Work a user is waiting on
+
+class Job(Document):
+    """A unit of background work; at most one active job exists per idempotency key"""
+
+    job_type: JobType
+    playlist_id: str
+    snapshot_id: Optional[str] = None
+    idempotency_key: Optional[str] = None  # job_type:playlist_id:snapshot_id, removed once the job finishes
+    active: bool = True  # queued or running
+    status: JobStatus = JobStatus.QUEUED
+    priority: int = JobPriority.NORMAL
+    payload: Dict[str, Any] = {}
+    result: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+    max_attempts: int = 3
+    last_error: Optional[str] = None
+    run_after: datetime = Field(default_factory=datetime.now)
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "jobs"
+        indexes = [
+            IndexModel(
+                [("idempotency_key", ASCENDING)],
+                unique=True,
+                sparse=True
+            ),
+            IndexModel([("active", ASCENDING), ("priority", DESCENDING), ("run_after", ASCENDING)]),
+            IndexModel([("playlist_id", ASCENDING), ("created_at", DESCENDING)])
+        ]
+
+    @staticmethod
+    def make_idempotency_key(job_type: JobType, playlist_id: str, snapshot_id: Optional[str]) -> str:
+        return f"{job_type.value}:{playlist_id}:{snapshot_id or ''}"
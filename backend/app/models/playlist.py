@@ -2,8 +2,9 @@
 Playlist Data Models
 MongoDB models for storing playlist and track data
 """
-from beanie import Document, Indexed
+from beanie import Document, Indexed, PydanticObjectId
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 from enum import Enum
@@ -59,6 +60,28 @@ class AnalysisStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class FeatureMoments(BaseModel):
+    """Count, sum and Welford M2 (sum of squared deviations) for one audio feature"""
+    count: int = 0
+    sum: float = 0.0
+    m2: float = 0.0
+
+class ArtistCount(BaseModel):
+    """Number of tracks an artist appears on"""
+    name: str
+    track_count: int
+
+class RunningStats(BaseModel):
+    """Mergeable sufficient statistics for a set of tracks"""
+    total_tracks: int = 0
+    total_duration_ms: int = 0
+    popularity_sum: float = 0.0
+    features: Dict[str, FeatureMoments] = {}
+    key_histogram: List[int] = []  # index 0 is key -1 (no key detected), then keys 0-11
+    mode_histogram: List[int] = []
+    time_signature_histogram: List[int] = []
+    artist_counts: List[ArtistCount] = []
+
 class PlaylistAnalysis(BaseModel):
     """Results of playlist analysis"""
     status: AnalysisStatus = AnalysisStatus.PENDING
@@ -68,11 +91,25 @@ class PlaylistAnalysis(BaseModel):
     avg_acousticness: float = 0.0
     avg_danceability: float = 0.0
     avg_energy: float = 0.0
+    avg_instrumentalness: float = 0.0
+    avg_liveness: float = 0.0
+    avg_loudness: float = 0.0
+    avg_speechiness: float = 0.0
     avg_valence: float = 0.0
     avg_tempo: float = 0.0
+    dominant_key: Optional[int] = None
+    dominant_mode: Optional[int] = None
+    dominant_time_signature: Optional[int] = None
     mood_description: str = ""
     energy_level: str = ""
+    danceability_level: str = ""
     top_artists: List[Dict[str, Any]] = []
+    unique_artists_count: int = 0
+    feature_stats: Dict[str, Dict[str, float]] = {}  # mean/variance/std/min/max/percentiles per feature
+    feature_histograms: Dict[str, List[int]] = {}
+    recommendation_seed_tracks: List[str] = []
+    running_stats: Optional[RunningStats] = None
+    analysis_duration_seconds: float = 0.0
     analyzed_at: datetime = Field(default_factory=datetime.now)
 
 class Playlist(Document):
@@ -97,9 +134,12 @@ class Playlist(Document):
     # Spotify metadata
     snapshot_id: str
     
-    # Track data
-    tracks: List[Track] = []
+    # Track data (tracks themselves live in the playlist_tracks collection)
+    # Deprecated: tracks still embedded in documents app.migrations.split_playlist_tracks
+    # has not reached yet. Kept so save() (a full replace) can't drop them; remove once migrated.
+    tracks: Optional[List[Track]] = None
     tracks_fetched: bool = False
+    tracks_snapshot_id: Optional[str] = None  # snapshot_id the stored tracks were fetched at
     audio_features_fetched: bool = False
     
     # Analysis results
@@ -113,24 +153,146 @@ class Playlist(Document):
     
     class Settings:
         name = "playlists"
+        indexes = [
+            # Serves the per-user listing query and its sort
+            IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)])
+        ]
     
     def mark_tracks_fetched(self):
         """Mark that tracks have been successfully fetched"""
         self.tracks_fetched = True
+        self.tracks_snapshot_id = self.snapshot_id
         self.last_fetched_at = datetime.now()
     
+    def update_timestamp(self):
+        """Record that the playlist document was modified"""
+        self.updated_at = datetime.now()
+    
     def mark_analysis_complete(self, analysis_result: PlaylistAnalysis):
         """Mark analysis as complete and store results"""
         self.analysis = analysis_result
         self.last_analyzed_at = datetime.now()
     
+    @property
+    def analysis_summary(self) -> Optional[Dict[str, Any]]:
+        """Short human-readable summary of the analysis, if there is one"""
+        if not self.analysis:
+            return None
+        return {
+            "mood": self.analysis.mood_description,
+            "energy_level": self.analysis.energy_level,
+            "danceability_level": self.analysis.danceability_level,
+            "total_tracks": self.analysis.total_tracks,
+            "top_artist": self.analysis.top_artists[0]["name"] if self.analysis.top_artists else None
+        }
+    
     @property
     def needs_refresh(self) -> bool:
-        """Check if playlist data needs to be refreshed from Spotify"""
-        if not self.last_fetched_at:
+        """Check if stored tracks are out of date with the playlist's current snapshot"""
+        if not self.tracks_fetched:
             return True
-        age = datetime.now() - self.last_fetched_at
-        return age.total_seconds() > 3600
+        return self.tracks_snapshot_id != self.snapshot_id
+
+class PlaylistAnalysisState(BaseModel):
+    """Just the status of a playlist's analysis"""
+    status: AnalysisStatus = AnalysisStatus.PENDING
+
+class PlaylistSummary(BaseModel):
+    """Projection of a playlist holding only the fields listing endpoints return"""
+    id: PydanticObjectId = Field(alias="_id")
+    spotify_id: str
+    name: str
+    description: str = ""
+    track_count: int = 0
+    images: List[Dict[str, Any]] = []
+    owner: PlaylistOwner
+    public: bool = True
+    collaborative: bool = False
+    tracks_fetched: bool = False
+    analysis: Optional[PlaylistAnalysisState] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Settings:
+        projection = {
+            "_id": 1,
+            "spotify_id": 1,
+            "name": 1,
+            "description": 1,
+            "track_count": 1,
+            "images": 1,
+            "owner": 1,
+            "public": 1,
+            "collaborative": 1,
+            "tracks_fetched": 1,
+            "analysis.status": 1,
+            "created_at": 1,
+            "updated_at": 1
+        }
+    
+    @property
+    def analysis_status(self) -> str:
+        """Analysis status, or "pending" if the playlist was never analyzed"""
+        return self.analysis.status if self.analysis else "pending"
+
+class PlaylistTrack(Document):
+    """A track at a given position in a playlist, stored outside the playlist document"""
+    
+    playlist_id: str  # Spotify playlist ID
+    position: int
+    track_id: str  # Spotify track ID
+    track: Track
+    
+    class Settings:
+        name = "playlist_tracks"
+        indexes = [
+            IndexModel([("playlist_id", ASCENDING), ("position", ASCENDING)], unique=True),
+            IndexModel([("track_id", ASCENDING)])
+        ]
+
+class TrackFeatures(Document):
+    """Audio features for a single track, shared across all playlists and users"""
+    
+    track_id: Indexed(str, unique=True)  # Spotify track ID
+    features: AudioFeatures
+    fetched_at: datetime = Field(default_factory=datetime.now)
+    
+    class Settings:
+        name = "track_features"
+
+class UserTasteProfile(Document):
+    """User-level taste profile merged from the running statistics of analyzed playlists"""
+    
+    user_id: Indexed(str, unique=True)
+    playlist_ids: List[str] = []
+    stats: RunningStats = Field(default_factory=RunningStats)
+    updated_at: datetime = Field(default_factory=datetime.now)
+    
+    class Settings:
+        name = "user_taste_profiles"
+        use_revision = True
+
+class CollectionVersion(Document):
+    """Per-user counter bumped whenever anything shown in the user's playlist listing changes"""
+    
+    user_id: Indexed(str, unique=True)
+    version: int = 0
+    
+    class Settings:
+        name = "collection_versions"
+
+class OAuthState(Document):
+    """Pending OAuth state, shared by every API worker; removed by a TTL index once expired"""
+    
+    state: Indexed(str, unique=True)
+    data: Dict[str, Any] = {}
+    expires_at: datetime  # UTC, as the TTL monitor compares against UTC
+    
+    class Settings:
+        name = "oauth_states"
+        indexes = [
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        ]
 
 class User(Document):
     """User document for storing user preferences and history"""
@@ -143,6 +305,9 @@ class User(Document):
     # Profile
     display_name: Optional[str] = None
     
+    # Lets background jobs mint fresh access tokens for this user; never returned by the API
+    spotify_refresh_token: Optional[str] = None
+    
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
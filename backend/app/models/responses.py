@@ -0,0 +1,79 @@
+"""
+API Response Models
+Typed response schemas for the playlist endpoints, serialized by ModelResponse
+"""
+from pydantic import BaseModel
+from typing import List, Dict, Optional, Any, Union
+from datetime import datetime
+
+from .playlist import Playlist, PlaylistSummary, PlaylistOwner, PlaylistAnalysis, AnalysisStatus
+
+class PlaylistSummaryResponse(BaseModel):
+    """The playlist block shared by listing and detail responses"""
+    id: str
+    spotify_id: str
+    name: str
+    description: str = ""
+    track_count: int = 0
+    images: List[Dict[str, Any]] = []
+    owner: PlaylistOwner
+    public: bool = True
+    collaborative: bool = False
+    tracks_fetched: bool = False
+    analysis_status: AnalysisStatus = AnalysisStatus.PENDING
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def summary_fields(cls, playlist: Union[Playlist, PlaylistSummary]) -> Dict[str, Any]:
+        return {
+            "id": str(playlist.id),
+            "spotify_id": playlist.spotify_id,
+            "name": playlist.name,
+            "description": playlist.description,
+            "track_count": playlist.track_count,
+            "images": playlist.images,
+            "owner": playlist.owner,
+            "public": playlist.public,
+            "collaborative": playlist.collaborative,
+            "tracks_fetched": playlist.tracks_fetched,
+            "analysis_status": playlist.analysis.status if playlist.analysis else AnalysisStatus.PENDING,
+            "created_at": playlist.created_at,
+            "updated_at": playlist.updated_at
+        }
+
+    @classmethod
+    def from_playlist(cls, playlist: Union[Playlist, PlaylistSummary]) -> "PlaylistSummaryResponse":
+        # The values come from already-validated models, so skip validating them again
+        return cls.model_construct(**cls.summary_fields(playlist))
+
+class PlaylistDetailsResponse(PlaylistSummaryResponse):
+    """A single playlist with its fetch and analysis state"""
+    audio_features_fetched: bool = False
+    analysis_summary: Optional[Dict[str, Any]] = None
+    last_fetched_at: Optional[datetime] = None
+    last_analyzed_at: Optional[datetime] = None
+    needs_refresh: bool = True
+
+    @classmethod
+    def from_playlist(cls, playlist: Playlist) -> "PlaylistDetailsResponse":
+        return cls.model_construct(
+            **cls.summary_fields(playlist),
+            audio_features_fetched=playlist.audio_features_fetched,
+            analysis_summary=playlist.analysis_summary,
+            last_fetched_at=playlist.last_fetched_at,
+            last_analyzed_at=playlist.last_analyzed_at,
+            needs_refresh=playlist.needs_refresh
+        )
+
+class PlaylistAnalysisResponse(BaseModel):
+    """Analysis results; serialize without analysis.running_stats, which is internal"""
+    playlist_id: str
+    analysis: PlaylistAnalysis
+    summary: Optional[Dict[str, Any]] = None
+
+class AnalysisNotReadyResponse(BaseModel):
+    """Returned instead of results for a playlist that was never analyzed"""
+    playlist_id: str
+    status: str = "not_analyzed"
+    message: str = "Playlist has not been analyzed yet"
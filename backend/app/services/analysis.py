@@ -0,0 +1,329 @@
+"""
+Playlist Analysis Engine
+Vectorized NumPy statistics over a playlist's audio features
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.playlist import ArtistCount, FeatureMoments, RunningStats
+
+# Continuous audio features, in matrix column order
+FEATURE_COLUMNS = (
+    "acousticness",
+    "danceability",
+    "energy",
+    "instrumentalness",
+    "liveness",
+    "loudness",
+    "speechiness",
+    "valence",
+    "tempo"
+)
+
+# Discrete audio features used for dominant (modal) values
+MODAL_COLUMNS = ("key", "mode", "time_signature")
+
+# Fixed histogram ranges so histograms from different playlists line up
+HISTOGRAM_BINS = 10
+HISTOGRAM_RANGES = {name: (0.0, 1.0) for name in FEATURE_COLUMNS}
+HISTOGRAM_RANGES["loudness"] = (-60.0, 0.0)
+HISTOGRAM_RANGES["tempo"] = (0.0, 250.0)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Per-column offset and scale mapping every feature onto [0, 1] over its histogram range
+_RANGE_LOW = np.array([HISTOGRAM_RANGES[name][0] for name in FEATURE_COLUMNS], dtype=np.float32)
+_RANGE_SCALE = np.array([HISTOGRAM_RANGES[name][1] - HISTOGRAM_RANGES[name][0] for name in FEATURE_COLUMNS], dtype=np.float32)
+
+SEED_TRACK_COUNT = 5
+
+# Histogram sizes for discrete features (key is shifted by one so -1 lands in bin 0)
+KEY_BINS = 13
+MODE_BINS = 2
+TIME_SIGNATURE_BINS = 8
+
+@dataclass
+class TrackColumns:
+    """Column-oriented view of a playlist's tracks, ready for vectorized analysis"""
+    features: np.ndarray  # float32 (tracks with features, len(FEATURE_COLUMNS))
+    modal: np.ndarray  # int16 (tracks with features, len(MODAL_COLUMNS))
+    duration_ms: np.ndarray  # int64 (all tracks,)
+    popularity: np.ndarray  # int16 (all tracks,)
+    artist_codes: np.ndarray  # int32, one entry per track artist, indexing artist_vocabulary
+    artist_vocabulary: List[str] = field(default_factory=list)  # distinct artist names in first-seen order
+    feature_track_ids: List[str] = field(default_factory=list)  # IDs of tracks with features, in order
+
+    @property
+    def total_tracks(self) -> int:
+        return len(self.duration_ms)
+
+    @property
+    def tracks_with_features(self) -> int:
+        return self.features.shape[0]
+
+def build_track_columns(tracks: Iterable[Dict[str, Any]]) -> TrackColumns:
+    """
+    Pack stored track documents (``Track`` layout) into contiguous arrays in a
+    single pass. Audio features go into one float32 matrix and artist names
+    are interned into integer codes, so the result pickles as a few buffers.
+    """
+    get_features = itemgetter(*FEATURE_COLUMNS)
+    get_modal = itemgetter(*MODAL_COLUMNS)
+    feature_rows = []
+    modal_rows = []
+    durations = []
+    popularity = []
+    artist_codes = []
+    artist_lookup: Dict[str, int] = {}
+    feature_track_ids = []
+
+    for track in tracks:
+        durations.append(track.get("duration_ms", 0))
+        popularity.append(track.get("popularity", 0))
+        for artist in track.get("artists", []):
+            artist_codes.append(artist_lookup.setdefault(artist["name"], len(artist_lookup)))
+
+        features = track.get("audio_features")
+        if features:
+            feature_rows.append(get_features(features))
+            modal_rows.append(get_modal(features))
+            feature_track_ids.append(track.get("spotify_id"))
+
+    return TrackColumns(
+        features=np.array(feature_rows, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS)),
+        modal=np.array(modal_rows, dtype=np.int16).reshape(-1, len(MODAL_COLUMNS)),
+        duration_ms=np.array(durations, dtype=np.int64),
+        popularity=np.array(popularity, dtype=np.int16),
+        artist_codes=np.array(artist_codes, dtype=np.int32),
+        artist_vocabulary=list(artist_lookup),
+        feature_track_ids=feature_track_ids
+    )
+
+def modal_value(values: np.ndarray) -> Optional[int]:
+    """
+    Most frequent value of a small non-negative-or-(-1) integer column.
+    Ties resolve to the smallest non-negative value, with -1 (Spotify's
+    "no key detected") last, matching the previous set-based implementation.
+    """
+    if values.size == 0:
+        return None
+    shifted = np.where(values < 0, values.max(initial=0) + 1, values).astype(np.int64)
+    winner = int(np.bincount(shifted).argmax())
+    return -1 if winner > values.max() else winner
+
+def normalize_features(features: np.ndarray) -> np.ndarray:
+    """
+    Scale feature rows (or a single row) onto [0, 1] using the fixed feature
+    ranges, so loudness and tempo don't dominate distances. Values outside
+    the ranges (tempo above 250 BPM, say) are clipped, so the scaling is only
+    affine inside them: the normalized mean equals the mean of normalized
+    rows only when no row needed clipping.
+    """
+    return np.clip((features - _RANGE_LOW) / _RANGE_SCALE, 0.0, 1.0).astype(np.float32)
+
+def representative_track_ids(columns: TrackColumns, count: int = SEED_TRACK_COUNT) -> List[str]:
+    """Track IDs closest to the playlist's normalized feature centroid"""
+    if columns.tracks_with_features == 0:
+        return []
+    normalized = normalize_features(columns.features)
+    distances = np.square(normalized - normalized.mean(axis=0)).sum(axis=1)
+    count = min(count, len(distances))
+    nearest = np.argpartition(distances, count - 1)[:count]
+    nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+    return [columns.feature_track_ids[i] for i in nearest]
+
+def compute_feature_stats(features: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """Means, variances and percentiles for every continuous feature column"""
+    if features.shape[0] == 0:
+        return {}
+    means = features.mean(axis=0, dtype=np.float64)
+    variances = features.var(axis=0, dtype=np.float64)
+    percentiles = np.percentile(features, PERCENTILES, axis=0)
+    minimums = features.min(axis=0)
+    maximums = features.max(axis=0)
+
+    stats = {}
+    for column, name in enumerate(FEATURE_COLUMNS):
+        stats[name] = {
+            "mean": float(means[column]),
+            "variance": float(variances[column]),
+            "std": float(np.sqrt(variances[column])),
+            "min": float(minimums[column]),
+            "max": float(maximums[column]),
+            **{f"p{p}": float(percentiles[i, column]) for i, p in enumerate(PERCENTILES)}
+        }
+    return stats
+
+def compute_feature_histograms(features: np.ndarray) -> Dict[str, List[int]]:
+    """Fixed-range histograms for every continuous feature column"""
+    histograms = {}
+    for column, name in enumerate(FEATURE_COLUMNS):
+        counts, _ = np.histogram(features[:, column], bins=HISTOGRAM_BINS, range=HISTOGRAM_RANGES[name])
+        histograms[name] = counts.tolist()
+    return histograms
+
+def artist_track_counts(columns: TrackColumns) -> List[Tuple[str, int]]:
+    """(artist, track count) by descending count; ties keep first-seen order like Counter.most_common"""
+    counts = np.bincount(columns.artist_codes, minlength=len(columns.artist_vocabulary))
+    order = np.argsort(-counts, kind="stable")
+    return [(columns.artist_vocabulary[code], int(counts[code])) for code in order]
+
+def analyze_columns(columns: TrackColumns, top_artists_limit: int = 10) -> Dict[str, Any]:
+    """Compute PlaylistAnalysis fields from packed track columns"""
+    features = columns.features
+    means = features.mean(axis=0, dtype=np.float64)
+    averages = {f"avg_{name}": float(means[column]) for column, name in enumerate(FEATURE_COLUMNS)}
+
+    artist_counts = artist_track_counts(columns)
+    top_artists = [
+        {"name": artist, "track_count": count}
+        for artist, count in artist_counts[:top_artists_limit]
+    ]
+
+    return {
+        "total_tracks": columns.tracks_with_features,
+        "total_duration_ms": int(columns.duration_ms.sum()),
+        "average_popularity": float(columns.popularity.mean(dtype=np.float64)) if columns.total_tracks else 0.0,
+        **averages,
+        "dominant_key": modal_value(columns.modal[:, 0]),
+        "dominant_mode": modal_value(columns.modal[:, 1]),
+        "dominant_time_signature": modal_value(columns.modal[:, 2]),
+        "top_artists": top_artists,
+        "unique_artists_count": len(artist_counts),
+        "feature_stats": compute_feature_stats(features),
+        "feature_histograms": compute_feature_histograms(features),
+        "recommendation_seed_tracks": representative_track_ids(columns),
+        "running_stats": compute_running_stats(columns)
+    }
+
+def analyze_track_documents(tracks: List[Dict[str, Any]], top_artists_limit: int = 10) -> Optional[Dict[str, Any]]:
+    """
+    Pack stored track documents and analyze them, or None when no track has
+    audio features. Meant for the compute pool: packing is a per-track Python
+    pass, the costliest step for large playlists, so it belongs off the event
+    loop along with the statistics.
+    """
+    columns = build_track_columns(tracks)
+    if not columns.tracks_with_features:
+        return None
+    return analyze_columns(columns, top_artists_limit)
+
+def compute_running_stats(columns: TrackColumns) -> RunningStats:
+    """Sufficient statistics for a playlist that can later be merged with others"""
+    features = columns.features
+    count = features.shape[0]
+    sums = features.sum(axis=0, dtype=np.float64)
+    m2 = features.var(axis=0, dtype=np.float64) * count if count else np.zeros(len(FEATURE_COLUMNS))
+
+    return RunningStats(
+        total_tracks=columns.total_tracks,
+        total_duration_ms=int(columns.duration_ms.sum()),
+        popularity_sum=float(columns.popularity.sum(dtype=np.float64)),
+        features={
+            name: FeatureMoments(count=count, sum=float(sums[column]), m2=float(m2[column]))
+            for column, name in enumerate(FEATURE_COLUMNS)
+        },
+        key_histogram=np.bincount(columns.modal[:, 0] + 1, minlength=KEY_BINS).tolist(),
+        mode_histogram=np.bincount(columns.modal[:, 1], minlength=MODE_BINS).tolist(),
+        time_signature_histogram=np.bincount(columns.modal[:, 2], minlength=TIME_SIGNATURE_BINS).tolist(),
+        artist_counts=_artist_counts(dict(artist_track_counts(columns)))
+    )
+
+def _artist_counts(counts: Dict[str, int]) -> List[ArtistCount]:
+    """Artists by descending track count, ties by name, so merge order never changes the result"""
+    ordered = sorted((item for item in counts.items() if item[1] > 0), key=lambda item: (-item[1], item[0]))
+    return [ArtistCount(name=name, track_count=track_count) for name, track_count in ordered]
+
+def _combine_moments(a: FeatureMoments, b: FeatureMoments, sign: int) -> FeatureMoments:
+    """Chan et al. parallel combination of moments; sign=-1 removes b from a"""
+    count = a.count + sign * b.count
+    if count <= 0:
+        return FeatureMoments()
+    if b.count == 0:
+        return a.model_copy()
+    if a.count == 0 and sign > 0:
+        return b.model_copy()
+
+    total_sum = a.sum + sign * b.sum
+    if sign > 0:
+        delta = b.sum / b.count - a.sum / a.count
+        m2 = a.m2 + b.m2 + delta * delta * a.count * b.count / count
+    else:
+        # a is the merged set; recover the remainder r such that merge(r, b) == a
+        delta = b.sum / b.count - total_sum / count
+        m2 = a.m2 - b.m2 - delta * delta * count * b.count / a.count
+    return FeatureMoments(count=count, sum=total_sum, m2=max(0.0, m2))
+
+def _combine_histograms(a: List[int], b: List[int], sign: int) -> List[int]:
+    size = max(len(a), len(b))
+    a = a + [0] * (size - len(a))
+    b = b + [0] * (size - len(b))
+    return [max(0, x + sign * y) for x, y in zip(a, b)]
+
+def _combine_running_stats(a: RunningStats, b: RunningStats, sign: int) -> RunningStats:
+    artist_counts = Counter({artist.name: artist.track_count for artist in a.artist_counts})
+    for artist in b.artist_counts:
+        artist_counts[artist.name] += sign * artist.track_count
+
+    return RunningStats(
+        total_tracks=max(0, a.total_tracks + sign * b.total_tracks),
+        total_duration_ms=max(0, a.total_duration_ms + sign * b.total_duration_ms),
+        popularity_sum=max(0.0, a.popularity_sum + sign * b.popularity_sum),
+        features={
+            name: _combine_moments(
+                a.features.get(name, FeatureMoments()),
+                b.features.get(name, FeatureMoments()),
+                sign
+            )
+            for name in FEATURE_COLUMNS
+        },
+        key_histogram=_combine_histograms(a.key_histogram, b.key_histogram, sign),
+        mode_histogram=_combine_histograms(a.mode_histogram, b.mode_histogram, sign),
+        time_signature_histogram=_combine_histograms(a.time_signature_histogram, b.time_signature_histogram, sign),
+        artist_counts=_artist_counts(artist_counts)
+    )
+
+def merge_running_stats(a: RunningStats, b: RunningStats) -> RunningStats:
+    """Statistics of the union of two disjoint track sets"""
+    return _combine_running_stats(a, b, 1)
+
+def remove_running_stats(total: RunningStats, part: RunningStats) -> RunningStats:
+    """Statistics of ``total`` with a previously merged ``part`` taken back out"""
+    return _combine_running_stats(total, part, -1)
+
+def _dominant_from_histogram(histogram: List[int], offset: int = 0) -> Optional[int]:
+    if not histogram or not any(histogram):
+        return None
+    return int(np.argmax(histogram)) - offset
+
+def summarize_running_stats(stats: RunningStats, top_artists_limit: int = 10) -> Dict[str, Any]:
+    """Turn merged running statistics into a taste profile"""
+    features = {}
+    for name in FEATURE_COLUMNS:
+        moments = stats.features.get(name, FeatureMoments())
+        if moments.count:
+            variance = moments.m2 / moments.count
+            features[name] = {"mean": moments.sum / moments.count, "variance": variance, "std": float(np.sqrt(variance))}
+
+    # Key ties go to the smallest detected key, with -1 (no key) last
+    key_histogram = stats.key_histogram[1:] + stats.key_histogram[:1]
+    dominant_key = _dominant_from_histogram(key_histogram)
+    if dominant_key == len(key_histogram) - 1:
+        dominant_key = -1
+
+    return {
+        "total_tracks": stats.total_tracks,
+        "tracks_with_features": stats.features.get(FEATURE_COLUMNS[0], FeatureMoments()).count,
+        "total_duration_ms": stats.total_duration_ms,
+        "average_popularity": stats.popularity_sum / stats.total_tracks if stats.total_tracks else 0.0,
+        "features": features,
+        "dominant_key": dominant_key,
+        "dominant_mode": _dominant_from_histogram(stats.mode_histogram),
+        "dominant_time_signature": _dominant_from_histogram(stats.time_signature_histogram),
+        "top_artists": [artist.model_dump() for artist in stats.artist_counts[:top_artists_limit]],
+        "unique_artists_count": len(stats.artist_counts)
+    }
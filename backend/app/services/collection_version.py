@@ -0,0 +1,21 @@
+"""
+Collection Version Service
+Per-user version counters that let listing endpoints answer conditional GETs
+"""
+from ..models.playlist import CollectionVersion
+
+async def get_collection_version(user_id: str) -> int:
+    """Current version of a user's playlist listing (0 if it never changed)"""
+    doc = await CollectionVersion.get_motor_collection().find_one(
+        {"user_id": user_id},
+        {"_id": 0, "version": 1}
+    )
+    return doc["version"] if doc else 0
+
+async def bump_collection_version(user_id: str):
+    """Invalidate listing ETags after a change to any field the listing shows"""
+    await CollectionVersion.get_motor_collection().update_one(
+        {"user_id": user_id},
+        {"$inc": {"version": 1}},
+        upsert=True
+    )
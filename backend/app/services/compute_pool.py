@@ -0,0 +1,98 @@
+"""
+Compute Pool
+Process pool for CPU-bound analysis so it never blocks the event loop
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+class ComputeTimeoutError(Exception):
+    """A pooled computation ran past its timeout"""
+    pass
+
+class ComputePool:
+    """
+    Wraps a ``ProcessPoolExecutor`` using the spawn start method, which is
+    safe alongside the event loop and the Mongo client threads, unlike fork.
+    Callables must be module-level functions, and arguments should be
+    compact (NumPy arrays rather than Pydantic models) since they are pickled
+    to the worker. Until the pool is started (scripts, benchmarks) work runs
+    in a thread instead.
+    """
+
+    def __init__(self):
+        self.workers = int(os.getenv("COMPUTE_POOL_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+        self.timeout = float(os.getenv("COMPUTE_TASK_TIMEOUT", "120"))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.in_flight = 0
+        self.completed_total = 0
+        self.failed_total = 0
+        self.timeouts_total = 0
+
+    async def start(self):
+        if self._executor is not None:
+            return
+        self._executor = self._create_executor()
+        # Spawn every worker now so the first analysis doesn't pay interpreter start-up
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, os.getpid) for _ in range(self.workers)))
+        logger.info(f"✅ Started compute pool with {self.workers} worker processes")
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run ``fn(*args)`` in a worker process. On timeout the caller gets
+        ComputeTimeoutError; the worker finishes its current task in the
+        background, because a running process task can't be interrupted.
+        """
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        else:
+            future = loop.run_in_executor(self._executor, fn, *args)
+
+        self.in_flight += 1
+        try:
+            result = await asyncio.wait_for(future, timeout=timeout or self.timeout)
+            self.completed_total += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts_total += 1
+            raise ComputeTimeoutError(f"{getattr(fn, '__name__', fn)} exceeded {timeout or self.timeout}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool so later calls work
+            self.failed_total += 1
+            logger.error("Compute pool broke, restarting worker processes")
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+            raise
+        except Exception:
+            self.failed_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers if self._executor is not None else 0,
+            "in_flight": self.in_flight,
+            "completed_total": self.completed_total,
+            "failed_total": self.failed_total,
+            "timeouts_total": self.timeouts_total
+        }
+
+# Create singleton instance
+compute_pool = ComputePool()
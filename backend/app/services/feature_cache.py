@@ -0,0 +1,107 @@
+"""
+Audio Features Cache
+Read-through cache for immutable per-track audio features
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+
+from loguru import logger
+from pymongo import UpdateOne
+
+from ..core.cache import LRUCache
+from ..models.playlist import TrackFeatures
+from .spotify_service import spotify_oauth_service
+
+class AudioFeaturesCache:
+    """
+    Serves audio features from an in-process LRU, then the shared
+    ``track_features`` collection, and only asks Spotify for the rest.
+    Newly fetched features are written back to Mongo in one bulk upsert.
+    """
+
+    def __init__(self, maxsize: int = 50000):
+        self.lru = LRUCache(maxsize=maxsize)
+        self.db_hits = 0
+        self.spotify_fetches = 0
+        self.spotify_misses = 0
+
+    async def get_audio_features(self, track_ids: List[str], access_token: str) -> List[Dict[str, Any]]:
+        """Return features shaped like SpotifyOAuthService.get_audio_features, fetching only cache misses"""
+        unique_ids = list(dict.fromkeys(track_id for track_id in track_ids if track_id))
+        if not unique_ids:
+            return []
+
+        # 1. In-process LRU
+        found = self.lru.get_many(unique_ids)
+        missing_ids = [track_id for track_id in unique_ids if track_id not in found]
+
+        # 2. Shared Mongo collection, one $in query
+        if missing_ids:
+            collection = TrackFeatures.get_motor_collection()
+            cursor = collection.find(
+                {"track_id": {"$in": missing_ids}},
+                {"_id": 0, "track_id": 1, "features": 1}
+            )
+            from_db = {doc["track_id"]: doc["features"] async for doc in cursor}
+            self.db_hits += len(from_db)
+            self.lru.put_many(from_db)
+            found.update(from_db)
+            missing_ids = [track_id for track_id in missing_ids if track_id not in from_db]
+
+        # 3. Spotify for whatever is left, written back in bulk
+        if missing_ids:
+            fetched = await spotify_oauth_service.get_audio_features(missing_ids, access_token)
+            self.spotify_fetches += len(fetched)
+            self.spotify_misses += len(missing_ids) - len(fetched)
+
+            new_features = {}
+            for feature in fetched:
+                track_id = feature["spotify_id"]
+                new_features[track_id] = {key: value for key, value in feature.items() if key != "spotify_id"}
+
+            if new_features:
+                await self._store(new_features)
+                self.lru.put_many(new_features)
+                found.update(new_features)
+
+        logger.info(
+            f"Audio features for {len(unique_ids)} tracks: {len(found)} resolved, "
+            f"{len(missing_ids)} requested from Spotify"
+        )
+        return [
+            {"spotify_id": track_id, **found[track_id]}
+            for track_id in unique_ids
+            if track_id in found
+        ]
+
+    async def _store(self, features: Dict[str, Dict[str, Any]]):
+        """Upsert fetched features into the shared collection in one unordered bulk write"""
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {"track_id": track_id},
+                {"$set": {"features": feature, "fetched_at": now}},
+                upsert=True
+            )
+            for track_id, feature in features.items()
+        ]
+        try:
+            await TrackFeatures.get_motor_collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            # The features are still returned; they will simply be fetched again next time
+            logger.error(f"Failed to store {len(operations)} audio features: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for measuring how many Spotify calls the cache saves"""
+        lookups = self.lru.hits + self.lru.misses
+        return {
+            "lru": self.lru.get_stats(),
+            "db_hits": self.db_hits,
+            "spotify_fetches": self.spotify_fetches,
+            "spotify_misses": self.spotify_misses,
+            "overall_hit_ratio": round((self.lru.hits + self.db_hits) / lookups, 4) if lookups else 0.0
+        }
+
+# Create singleton instance
+audio_features_cache = AudioFeaturesCache(maxsize=int(os.getenv("AUDIO_FEATURES_LRU_SIZE", "50000")))
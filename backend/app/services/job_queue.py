@@ -0,0 +1,292 @@
+"""
+Job Queue
+Mongo-backed durable job queue with an async worker pool
+"""
+import asyncio
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..core.metrics import JOB_DURATION, JOB_QUEUE_DEPTH
+from ..core.profiling import profiler
+from ..models.job import Job, JobPriority, JobStatus, JobType
+from .rate_limiter import SpotifyRateLimitError
+
+JobHandler = Callable[[Job], Awaitable[Optional[Dict[str, Any]]]]
+
+class JobQueue:
+    """
+    Jobs live in the ``jobs`` collection, so they survive restarts and are
+    shared by every API process. A sparse unique index on the idempotency
+    key, which is removed when a job finishes, keeps one active job per key.
+    Workers claim the highest-priority runnable job with one atomic
+    find_one_and_update and hold it under a lease that is renewed while the
+    handler runs; a job whose worker died is picked up again once its lease
+    expires. Failed attempts are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self):
+        self.concurrency = int(os.getenv("JOB_WORKERS", "4"))
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.lease_seconds = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+        self.max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.retry_backoff = float(os.getenv("JOB_RETRY_BACKOFF", "5.0"))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.handlers: Dict[JobType, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.running = 0
+        self.completed_total = 0
+        self.failed_total = 0
+        self.retried_total = 0
+
+    def register(self, job_type: JobType, handler: JobHandler):
+        """Set the coroutine that runs jobs of a type; it must raise on failure"""
+        self.handlers[job_type] = handler
+
+    async def start(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"✅ Started {self.concurrency} job workers ({self.worker_id})")
+
+    async def close(self):
+        """Stop the workers; jobs they were running go back to the queue"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enqueue(
+        self,
+        job_type: JobType,
+        playlist_id: str,
+        snapshot_id: Optional[str] = None,
+        priority: int = JobPriority.NORMAL,
+        payload: Optional[Dict[str, Any]] = None
+    ) -> Job:
+        """Queue a job, or return the active job that already has the same idempotency key"""
+        key = Job.make_idempotency_key(job_type, playlist_id, snapshot_id)
+        for _ in range(2):
+            existing = await Job.find_one({"idempotency_key": key, "active": True})
+            if existing:
+                return existing
+
+            job = Job(
+                job_type=job_type,
+                playlist_id=playlist_id,
+                snapshot_id=snapshot_id,
+                idempotency_key=key,
+                priority=priority,
+                payload=payload or {},
+                max_attempts=self.max_attempts
+            )
+            try:
+                await job.insert()
+            except DuplicateKeyError:
+                # Another request queued the same job between our read and insert
+                continue
+
+            if self._wakeup:
+                self._wakeup.set()
+            logger.info(f"Queued {job_type.value} job {job.id} for playlist {playlist_id}")
+            return job
+
+        raise RuntimeError(f"Could not queue job {key}")
+
+    async def _claim(self) -> Optional[Job]:
+        """Atomically take the highest-priority runnable job, including ones with an expired lease"""
+        now = datetime.now()
+        doc = await Job.get_motor_collection().find_one_and_update(
+            {
+                "active": True,
+                "$or": [
+                    {"status": JobStatus.QUEUED.value, "run_after": {"$lte": now}},
+                    {"status": JobStatus.RUNNING.value, "locked_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": JobStatus.RUNNING.value,
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", -1), ("run_after", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        return Job.model_validate(doc) if doc else None
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error claiming job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        handler = self.handlers.get(job.job_type)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        self.running += 1
+        started = datetime.now()
+        outcome = "error"
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job type {job.job_type.value}")
+            async with profiler.profile_job(job.job_type.value, job_id=str(job.id), playlist_id=job.playlist_id):
+                result = await handler(job)
+            outcome = "completed"
+            await self._finish(job, {"status": JobStatus.COMPLETED.value, "result": result})
+            self.completed_total += 1
+            logger.info(
+                f"Completed {job.job_type.value} job {job.id} in "
+                f"{(datetime.now() - started).total_seconds():.2f}s"
+            )
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            await asyncio.shield(self._release(job))
+            raise
+        except Exception as e:
+            await self._fail(job, e)
+        finally:
+            self.running -= 1
+            heartbeat.cancel()
+            JOB_DURATION.observe((datetime.now() - started).total_seconds(), job.job_type.value, outcome)
+
+    async def _heartbeat(self, job: Job):
+        """
+        Extend the lease while the handler runs so long jobs aren't claimed
+        twice. A failed renewal is logged and retried on the next beat (two
+        more fit in the lease); a lease already taken over by another worker
+        is logged and no longer renewed.
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await Job.get_motor_collection().update_one(
+                    {"_id": job.id, "locked_by": self.worker_id},
+                    {"$set": {"locked_until": datetime.now() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                logger.error(f"Error renewing lease of {job.job_type.value} job {job.id}: {e}")
+                continue
+            if not result.matched_count:
+                logger.error(f"Lost lease of {job.job_type.value} job {job.id}; another worker may run it again")
+                return
+
+    async def _finish(self, job: Job, fields: Dict[str, Any]):
+        """Close out a job; its payload is dropped"""
+        await Job.get_motor_collection().update_one(
+            {"_id": job.id, "locked_by": self.worker_id},
+            {
+                "$set": {**fields, "active": False, "finished_at": datetime.now(), "locked_until": None},
+                "$unset": {"payload": "", "idempotency_key": ""}
+            }
+        )
+
+    async def _fail(self, job: Job, error: Exception):
+        if job.attempts >= job.max_attempts:
+            self.failed_total += 1
+            logger.error(f"{job.job_type.value} job {job.id} failed after {job.attempts} attempts: {error}")
+            await self._finish(job, {"status": JobStatus.FAILED.value, "last_error": str(error)})
+            return
+
+        if isinstance(error, SpotifyRateLimitError):
+            delay = error.retry_after
+        else:
+            delay = self.retry_backoff * (2 ** (job.attempts - 1)) * random.uniform(0.5, 1.5)
+        self.retried_total += 1
+        logger.warning(f"{job.job_type.value} job {job.id} attempt {job.attempts} failed, retrying in {delay:.1f}s: {error}")
+        await Job.get_motor_collection().update_one(
+            {"_id": job.id, "locked_by": self.worker_id},
+            {"$set": {
+                "status": JobStatus.QUEUED.value,
+                "run_after": datetime.now() + timedelta(seconds=delay),
+                "last_error": str(error),
+                "locked_by": None,
+                "locked_until": None
+            }}
+        )
+
+    async def _release(self, job: Job):
+        """Hand an interrupted job back to the queue without charging it an attempt"""
+        try:
+            await Job.get_motor_collection().update_one(
+                {"_id": job.id, "locked_by": self.worker_id},
+                {
+                    "$set": {"status": JobStatus.QUEUED.value, "locked_by": None, "locked_until": None},
+                    "$inc": {"attempts": -1}
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error releasing job {job.id}: {e}")
+
+    async def collect_metrics(self):
+        """Refresh the queue depth gauge from the jobs collection (run at scrape time)"""
+        pipeline = [
+            {"$match": {"active": True}},
+            {"$group": {"_id": {"job_type": "$job_type", "status": "$status"}, "count": {"$sum": 1}}}
+        ]
+        depths = await Job.get_motor_collection().aggregate(pipeline).to_list(None)
+        JOB_QUEUE_DEPTH.clear()
+        for job_type in JobType:
+            for status in (JobStatus.QUEUED, JobStatus.RUNNING):
+                JOB_QUEUE_DEPTH.set(0, job_type.value, status.value)
+        for depth in depths:
+            JOB_QUEUE_DEPTH.set(depth["count"], depth["_id"]["job_type"], depth["_id"]["status"])
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        collection = Job.get_motor_collection()
+        return {
+            "workers": len(self._workers),
+            "running": self.running,
+            "queued": await collection.count_documents({"active": True, "status": JobStatus.QUEUED.value}),
+            "completed_total": self.completed_total,
+            "failed_total": self.failed_total,
+            "retried_total": self.retried_total
+        }
+
+def job_response(job: Job) -> Dict[str, Any]:
+    """API representation of a job; the payload is never exposed"""
+    return {
+        "job_id": str(job.id),
+        "job_type": job.job_type,
+        "playlist_id": job.playlist_id,
+        "snapshot_id": job.snapshot_id,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+        "result": job.result,
+        "run_after": job.run_after,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+# Create singleton instance
+job_queue = JobQueue()
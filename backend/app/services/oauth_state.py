@@ -0,0 +1,103 @@
+"""
+OAuth State Store
+Pluggable storage for pending OAuth state parameters
+"""
+import heapq
+from abc import ABC, abstractmethod
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from ..models.playlist import OAuthState
+
+class OAuthStateStore(ABC):
+    """Stores a state with a TTL and hands it back exactly once"""
+
+    # Name reported in stats; set by each implementation
+    backend: str
+
+    @abstractmethod
+    async def put(self, state: str, data: Dict[str, Any], ttl: float):
+        """Store a state's data for ``ttl`` seconds"""
+
+    @abstractmethod
+    async def consume(self, state: str) -> Optional[Dict[str, Any]]:
+        """Remove and return a state's data; None if it is unknown, already used or expired"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend}
+
+class MemoryOAuthStateStore(OAuthStateStore):
+    """
+    Single-process store. Expiry is driven by a min-heap of deadlines, so
+    each put/consume only pops entries that have actually expired instead
+    of scanning every pending state.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._states: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._deadlines: List[Tuple[float, str]] = []
+        self.expired_total = 0
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            expires_at, state = heapq.heappop(self._deadlines)
+            entry = self._states.get(state)
+            # The heap can hold deadlines of states that were consumed or re-put
+            if entry is not None and entry[0] == expires_at:
+                del self._states[state]
+                self.expired_total += 1
+
+    async def put(self, state: str, data: Dict[str, Any], ttl: float):
+        self._expire()
+        expires_at = time.monotonic() + ttl
+        self._states[state] = (expires_at, data)
+        heapq.heappush(self._deadlines, (expires_at, state))
+
+    async def consume(self, state: str) -> Optional[Dict[str, Any]]:
+        self._expire()
+        entry = self._states.pop(state, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "pending": len(self._states), "expired_total": self.expired_total}
+
+class MongoOAuthStateStore(OAuthStateStore):
+    """
+    Store shared by every worker via the ``oauth_states`` collection. A TTL
+    index reaps expired states in the background; consume is one atomic
+    find_one_and_delete that also checks the deadline, since the TTL monitor
+    only runs about once a minute.
+    """
+
+    backend = "mongo"
+
+    async def put(self, state: str, data: Dict[str, Any], ttl: float):
+        await OAuthState(state=state, data=data, expires_at=datetime.utcnow() + timedelta(seconds=ttl)).insert()
+
+    async def consume(self, state: str) -> Optional[Dict[str, Any]]:
+        doc = await OAuthState.get_motor_collection().find_one_and_delete(
+            {"state": state, "expires_at": {"$gt": datetime.utcnow()}},
+            projection={"_id": 0, "data": 1}
+        )
+        return doc["data"] if doc else None
+
+def create_oauth_state_store(backend: Optional[str] = None) -> OAuthStateStore:
+    """Store selected by OAUTH_STATE_BACKEND: "mongo" (default, multi-worker safe) or "memory" """
+    backend = (backend or os.getenv("OAUTH_STATE_BACKEND", "mongo")).lower()
+    if backend == "memory":
+        return MemoryOAuthStateStore()
+    if backend != "mongo":
+        logger.warning(f"Unknown OAUTH_STATE_BACKEND '{backend}', using mongo")
+    return MongoOAuthStateStore()
+
+# Create singleton instance
+oauth_state_store = create_oauth_state_store()
@@ -0,0 +1,89 @@
+"""
+Pagination Helpers
+Concurrent fan-out over Spotify offset-paged endpoints
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List
+from loguru import logger
+
+from .rate_limiter import SpotifyRateLimitError
+
+# Fetches one page at the given offset and returns the raw Spotify paging object
+PageFetcher = Callable[[int], Awaitable[Dict[str, Any]]]
+
+class IncompleteListingError(Exception):
+    """Raised when some pages of a listing could not be fetched and a partial result must not be used"""
+
+@dataclass
+class PageFetchResult:
+    """Items collected from a paged endpoint, in their original order"""
+    items: List[Any] = field(default_factory=list)
+    total: int = 0
+    failed_offsets: List[int] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        """True when every page was fetched successfully and together they cover ``total``"""
+        return not self.failed_offsets and len(self.items) >= self.total
+
+async def fetch_all_pages(
+    fetch_page: PageFetcher,
+    page_size: int,
+    max_concurrency: int = 8,
+    retries: int = 1
+) -> PageFetchResult:
+    """
+    Fetch every page of an offset-paged endpoint.
+
+    The first page is fetched on its own to learn ``total`` and the page size
+    the server actually applied (it may clamp ``page_size``); the remaining
+    offsets are then requested concurrently under a bounded semaphore. Pages
+    are reassembled in offset order, and a page that still fails after
+    ``retries`` attempts is skipped and reported in ``failed_offsets``.
+    Errors on the first page propagate to the caller, as does
+    SpotifyRateLimitError on any page: the scheduler has already waited out
+    Retry-After, so retrying or truncating the listing would be wrong.
+    """
+    first_page = await fetch_page(0)
+    total = first_page.get("total") or 0
+    result = PageFetchResult(items=list(first_page.get("items") or []), total=total)
+
+    # Step by what the server returned, not what was asked for, or a clamped limit skips whole ranges
+    step = min(page_size, first_page.get("limit") or page_size, len(result.items) or page_size)
+    remaining_offsets = list(range(step, total, step))
+    if not remaining_offsets:
+        return result
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def fetch_with_retry(offset: int) -> List[Any]:
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    page = await fetch_page(offset)
+                    return list(page.get("items") or [])
+                except SpotifyRateLimitError:
+                    raise
+                except Exception as e:
+                    if attempt >= retries:
+                        raise
+                    logger.warning(f"Retrying page at offset {offset} after error: {e}")
+
+    pages = await asyncio.gather(
+        *(fetch_with_retry(offset) for offset in remaining_offsets),
+        return_exceptions=True
+    )
+
+    rate_limited = [page for page in pages if isinstance(page, SpotifyRateLimitError)]
+    if rate_limited:
+        raise max(rate_limited, key=lambda error: error.retry_after)
+
+    for offset, page in zip(remaining_offsets, pages):
+        if isinstance(page, BaseException):
+            logger.error(f"Failed to fetch page at offset {offset}: {page}")
+            result.failed_offsets.append(offset)
+            continue
+        result.items.extend(page)
+
+    return result
@@ -0,0 +1,110 @@
+"""
+Playlist Sync Service
+Bulk synchronization of Spotify playlist metadata into MongoDB
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List
+
+from loguru import logger
+from pymongo import UpdateOne
+
+from ..models.playlist import Playlist
+from .collection_version import bump_collection_version
+
+# Metadata fields copied from the Spotify listing onto the stored playlist
+SYNCED_FIELDS = (
+    "name",
+    "description",
+    "track_count",
+    "public",
+    "collaborative",
+    "owner",
+    "images",
+    "external_urls",
+    "snapshot_id"
+)
+
+@dataclass
+class PlaylistSyncResult:
+    """Outcome of syncing one user's playlist listing"""
+    spotify_ids: List[str] = field(default_factory=list)
+    # Playlists with stored tracks whose snapshot_id changed, needing a track-level diff
+    tracks_to_refresh: List[str] = field(default_factory=list)
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+def _incoming_fields(spotify_playlist: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a formatted Spotify playlist into the stored field layout"""
+    owner = spotify_playlist["owner"]
+    return {
+        "name": spotify_playlist["name"],
+        "description": spotify_playlist.get("description") or "",
+        "track_count": spotify_playlist["track_count"],
+        "public": spotify_playlist.get("public", True),
+        "collaborative": spotify_playlist.get("collaborative", False),
+        "owner": {"id": owner["id"], "display_name": owner.get("display_name")},
+        "images": spotify_playlist.get("images") or [],
+        "external_urls": spotify_playlist.get("external_urls") or {},
+        "snapshot_id": spotify_playlist["snapshot_id"]
+    }
+
+async def sync_user_playlists(user_id: str, spotify_playlists: List[Dict[str, Any]]) -> PlaylistSyncResult:
+    """
+    Upsert a user's Spotify playlists with one $in read and one bulk write.
+
+    Existing documents are loaded (metadata fields only) in a single query;
+    new playlists are inserted and existing ones are updated only when a
+    synced field actually changed. Playlists whose snapshot_id is unchanged
+    keep their tracks and features untouched; those with a new snapshot and
+    previously fetched tracks are listed in ``tracks_to_refresh``.
+    """
+    result = PlaylistSyncResult()
+    incoming: Dict[str, Dict[str, Any]] = {}
+    for spotify_playlist in spotify_playlists:
+        incoming[spotify_playlist["spotify_id"]] = _incoming_fields(spotify_playlist)
+    result.spotify_ids = list(incoming)
+
+    if not incoming:
+        return result
+
+    collection = Playlist.get_motor_collection()
+    projection = {"_id": 0, "spotify_id": 1, "tracks_fetched": 1, **{name: 1 for name in SYNCED_FIELDS}}
+    cursor = collection.find({"spotify_id": {"$in": result.spotify_ids}}, projection)
+    existing = {doc["spotify_id"]: doc async for doc in cursor}
+
+    now = datetime.now()
+    operations = []
+    for spotify_id, fields in incoming.items():
+        stored = existing.get(spotify_id)
+
+        if stored is None:
+            new_playlist = Playlist(spotify_id=spotify_id, user_id=user_id, **fields)
+            document = new_playlist.model_dump(by_alias=True, exclude={"id", "revision_id"})
+            operations.append(UpdateOne({"spotify_id": spotify_id}, {"$setOnInsert": document}, upsert=True))
+            result.inserted += 1
+            continue
+
+        changes = {name: value for name, value in fields.items() if stored.get(name) != value}
+        if not changes:
+            result.unchanged += 1
+            continue
+
+        if "snapshot_id" in changes and stored.get("tracks_fetched"):
+            result.tracks_to_refresh.append(spotify_id)
+
+        changes["updated_at"] = now
+        operations.append(UpdateOne({"spotify_id": spotify_id}, {"$set": changes}))
+        result.updated += 1
+
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        await bump_collection_version(user_id)
+
+    logger.info(
+        f"Synced playlists for user {user_id}: {result.inserted} inserted, "
+        f"{result.updated} updated, {result.unchanged} unchanged, "
+        f"{len(result.tracks_to_refresh)} queued for track refresh"
+    )
+    return result
@@ -0,0 +1,303 @@
+"""
+Spotify Request Scheduler
+Token-bucket rate limiting, fair queueing and 429-aware retries for Spotify API calls
+"""
+import asyncio
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from ..core.metrics import SPOTIFY_SCHEDULER_QUEUE_DEPTH, SPOTIFY_SCHEDULER_QUEUED_USERS, SPOTIFY_SCHEDULER_WAIT
+
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+class SpotifyRateLimitError(Exception):
+    """Raised when Spotify keeps answering 429 after all retries"""
+
+    def __init__(self, retry_after: float, message: str = "Spotify API rate limit exceeded"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def time_until_available(self, now: float) -> float:
+        """Seconds until one token can be taken (0 if available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+class _Ticket:
+    """A queued request waiting for permission to be sent"""
+    __slots__ = ("future", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, enqueued_at: float):
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+class RequestScheduler:
+    """
+    Shared scheduler every outbound Spotify call goes through.
+
+    Each request must take a token from the bucket of its client credential
+    and from the bucket of its user. Waiting requests are queued per user and
+    granted round-robin, so one user's fan-out cannot starve everyone else.
+    A 429 pauses the whole credential for ``Retry-After`` seconds; 429s,
+    5xx responses and transport errors are retried with jittered backoff.
+    """
+
+    def __init__(
+        self,
+        credential_rate: float,
+        credential_burst: float,
+        user_rate: float,
+        user_burst: float,
+        max_retries: int = 3,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        self.credential_rate = credential_rate
+        self.credential_burst = credential_burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._reset_queues()
+
+        # Metrics
+        self._granted_total = 0
+        self._throttled_total = 0
+        self._retries_total = 0
+        self._rate_limit_errors = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._peak_queue_depth = 0
+
+    def _reset_queues(self):
+        self._queues: Dict[tuple, Deque[_Ticket]] = {}
+        self._ring: Deque[tuple] = deque()
+        self._queue_depth = 0
+        self._credential_buckets: Dict[str, TokenBucket] = {}
+        self._user_buckets: Dict[str, TokenBucket] = {}
+        self._blocked_until: Dict[str, float] = {}
+
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # New event loop (e.g. app restart in tests): drop state bound to the old one
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._dispatcher = None
+            self._reset_queues()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _credential_bucket(self, credential_key: str, now: float) -> TokenBucket:
+        bucket = self._credential_buckets.get(credential_key)
+        if bucket is None:
+            bucket = TokenBucket(self.credential_rate, self.credential_burst, now)
+            self._credential_buckets[credential_key] = bucket
+        return bucket
+
+    def _user_bucket(self, user_key: str, now: float) -> TokenBucket:
+        bucket = self._user_buckets.get(user_key)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst, now)
+            self._user_buckets[user_key] = bucket
+        return bucket
+
+    async def _acquire(self, credential_key: str, user_key: str):
+        """Wait until the dispatcher grants this request a slot"""
+        self._ensure_dispatcher()
+        ticket = _Ticket(self._loop.create_future(), self._loop.time())
+
+        queue_key = (credential_key, user_key)
+        queue = self._queues.get(queue_key)
+        if queue is None:
+            queue = deque()
+            self._queues[queue_key] = queue
+            self._ring.append(queue_key)
+        queue.append(ticket)
+
+        self._queue_depth += 1
+        self._peak_queue_depth = max(self._peak_queue_depth, self._queue_depth)
+        self._wakeup.set()
+
+        try:
+            await ticket.future
+        finally:
+            if not ticket.future.done() or ticket.future.cancelled():
+                # Cancelled while queued; the dispatcher will discard the ticket
+                self._queue_depth -= 1
+
+    async def _dispatch(self):
+        """Grant queued requests round-robin across users as buckets allow"""
+        while True:
+            if not self._ring:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = self._loop.time()
+            next_wait = None
+
+            for _ in range(len(self._ring)):
+                queue_key = self._ring.popleft()
+                credential_key, user_key = queue_key
+                queue = self._queues[queue_key]
+
+                while queue and queue[0].future.done():
+                    queue.popleft()
+                if not queue:
+                    del self._queues[queue_key]
+                    continue
+
+                credential_bucket = self._credential_bucket(credential_key, now)
+                user_bucket = self._user_bucket(user_key, now)
+                wait = max(
+                    self._blocked_until.get(credential_key, 0.0) - now,
+                    credential_bucket.time_until_available(now),
+                    user_bucket.time_until_available(now)
+                )
+                if wait > 0:
+                    self._ring.append(queue_key)
+                    next_wait = wait if next_wait is None else min(next_wait, wait)
+                    continue
+
+                credential_bucket.consume(now)
+                user_bucket.consume(now)
+                ticket = queue.popleft()
+                ticket.future.set_result(None)
+
+                waited = now - ticket.enqueued_at
+                self._queue_depth -= 1
+                self._granted_total += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+
+                if queue:
+                    self._ring.append(queue_key)
+                else:
+                    del self._queues[queue_key]
+                next_wait = 0
+                break
+
+            if next_wait:
+                await asyncio.sleep(next_wait)
+            elif next_wait is None:
+                await asyncio.sleep(0)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    @staticmethod
+    def _parse_retry_after(response: httpx.Response) -> float:
+        try:
+            return max(0.0, float(response.headers.get("Retry-After", "1")))
+        except ValueError:
+            return 1.0
+
+    async def execute(
+        self,
+        credential_key: str,
+        user_key: str,
+        send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        """Send a request once the rate limits allow it, retrying throttled and failed attempts"""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(credential_key, user_key)
+
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                self._retries_total += 1
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Spotify request failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code == 429:
+                self._throttled_total += 1
+                retry_after = self._parse_retry_after(response)
+                if attempt >= self.max_retries:
+                    self._rate_limit_errors += 1
+                    raise SpotifyRateLimitError(retry_after)
+
+                # Pause every request on this credential, then retry with a little jitter
+                self._blocked_until[credential_key] = max(
+                    self._blocked_until.get(credential_key, 0.0),
+                    self._loop.time() + retry_after
+                )
+                self._retries_total += 1
+                logger.warning(f"Spotify rate limit hit, backing off for {retry_after:.1f}s")
+                await asyncio.sleep(retry_after + self._backoff_delay(0))
+                continue
+
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                self._retries_total += 1
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Spotify returned {response.status_code}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            return response
+
+    async def close(self):
+        """Stop the dispatcher task"""
+        if self._dispatcher is not None and not self._dispatcher.done():
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        self._dispatcher = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report queue depth, wait times and throttling counters"""
+        return {
+            "queue_depth": self._queue_depth,
+            "peak_queue_depth": self._peak_queue_depth,
+            "queued_users": len(self._queues),
+            "granted_total": self._granted_total,
+            "throttled_total": self._throttled_total,
+            "retries_total": self._retries_total,
+            "rate_limit_errors": self._rate_limit_errors,
+            "avg_wait_seconds": round(self._wait_time_total / self._granted_total, 6) if self._granted_total else 0.0,
+            "max_wait_seconds": round(self._wait_time_max, 6)
+        }
+
+    async def collect_metrics(self):
+        """Refresh the scheduler gauges (run at scrape time)"""
+        stats = self.get_stats()
+        SPOTIFY_SCHEDULER_QUEUE_DEPTH.set(stats["queue_depth"])
+        SPOTIFY_SCHEDULER_QUEUED_USERS.set(stats["queued_users"])
+        SPOTIFY_SCHEDULER_WAIT.set(stats["avg_wait_seconds"], "avg")
+        SPOTIFY_SCHEDULER_WAIT.set(stats["max_wait_seconds"], "max")
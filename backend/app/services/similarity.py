@@ -0,0 +1,428 @@
+"""
+Similarity Index
+Nearest-neighbor search over normalized audio-feature vectors
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from loguru import logger
+from scipy.spatial import cKDTree
+
+from ..models.playlist import TrackFeatures
+from .analysis import FEATURE_COLUMNS, normalize_features
+from .compute_pool import compute_pool
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process build lock on Windows, where the app runs as a single worker anyway
+    fcntl = None
+
+# Spotify track IDs are 22 characters; fixed-width so the ID array can be memory-mapped
+TRACK_ID_DTYPE = "<U32"
+
+# Distance-matrix budget (elements) per chunk when assigning rows to cells
+_ASSIGN_CHUNK_ELEMENTS = 1 << 24
+
+@dataclass
+class Neighbor:
+    """A search hit: track ID and Euclidean distance in normalized feature space"""
+    track_id: str
+    distance: float
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for every row, in bounded-memory chunks"""
+    centroid_norms = np.square(centroids).sum(axis=1)
+    chunk = max(1, _ASSIGN_CHUNK_ELEMENTS // len(centroids))
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        rows = np.asarray(vectors[start:start + chunk])
+        distances = centroid_norms - 2.0 * rows @ centroids.T
+        assignments[start:start + chunk] = distances.argmin(axis=1)
+    return assignments
+
+def _kmeans(vectors: np.ndarray, n_cells: int, iterations: int, sample_size: int, seed: int) -> np.ndarray:
+    """Lloyd's k-means on a random sample; empty cells keep their previous centroid"""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), size=sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_cells, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        counts = np.bincount(assignments, minlength=n_cells)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        np.add.at(sums, assignments, sample)
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+    return centroids
+
+class SimilarityIndex:
+    """
+    Immutable index over normalized feature vectors. Rows are stored grouped
+    by inverted-file (IVF) cell, so approximate search reads a few contiguous
+    slices of the memory-mapped matrix; a KD-tree over the same rows serves
+    exact search.
+    """
+
+    ARRAYS = ("vectors", "track_ids", "centroids", "offsets", "id_order")
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        track_ids: np.ndarray,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        id_order: np.ndarray
+    ):
+        self.vectors = vectors  # float32 (tracks, len(FEATURE_COLUMNS)), grouped by cell
+        self.track_ids = track_ids  # track ID of every row
+        self.centroids = centroids  # float32 (cells, len(FEATURE_COLUMNS))
+        self.offsets = offsets  # rows of cell c are offsets[c]:offsets[c + 1]
+        self.id_order = id_order  # row positions sorted by track ID, for lookups
+        self._tree: Optional[cKDTree] = None
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    @property
+    def tree(self) -> cKDTree:
+        """KD-tree for exact search, built on first use"""
+        if self._tree is None:
+            self._tree = cKDTree(self.vectors)
+        return self._tree
+
+    @classmethod
+    def build(
+        cls,
+        track_ids: Sequence[str],
+        features: np.ndarray,
+        n_cells: Optional[int] = None,
+        iterations: int = 10,
+        sample_size: int = 65536,
+        seed: int = 0
+    ) -> "SimilarityIndex":
+        """Normalize raw feature rows (``FEATURE_COLUMNS`` order) and cluster them into cells"""
+        vectors = normalize_features(np.asarray(features, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS)))
+        ids = np.asarray(track_ids, dtype=TRACK_ID_DTYPE)
+        if len(ids) == 0:
+            raise ValueError("Cannot build a similarity index without tracks")
+
+        n_cells = min(len(ids), n_cells or max(1, int(np.sqrt(len(ids)))))
+        centroids = _kmeans(vectors, n_cells, iterations, sample_size, seed)
+        assignments = _assign(vectors, centroids)
+
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_cells)
+        ids = ids[order]
+        return cls(
+            vectors=np.ascontiguousarray(vectors[order]),
+            track_ids=ids,
+            centroids=centroids,
+            offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            id_order=np.argsort(ids, kind="stable").astype(np.int64)
+        )
+
+    def save(self, directory: str):
+        """
+        Write every array as .npy into a fresh version directory next to
+        ``directory``, then atomically repoint ``directory`` (a symlink) at
+        it. Each writer stages into its own directory, so concurrent
+        rebuilds from several workers never touch each other's files, and
+        readers always see either the old or the new version.
+        """
+        directory = os.path.abspath(directory)
+        parent, name = os.path.split(directory)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f"{name}.", dir=parent)
+        try:
+            for array in self.ARRAYS:
+                np.save(os.path.join(staging, f"{array}.npy"), getattr(self, array))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        previous = os.path.realpath(directory) if os.path.islink(directory) else None
+        if os.path.isdir(directory) and previous is None:
+            # Index saved by an older version as a plain directory: move it aside once so the link can replace it
+            previous = tempfile.mkdtemp(prefix=f"{name}.", dir=parent)
+            os.replace(directory, previous)
+
+        link = f"{staging}.link"
+        os.symlink(os.path.basename(staging), link)
+        os.replace(link, directory)
+        # Processes that still have the old version memory-mapped keep reading it until they reopen
+        if previous is not None and previous != staging:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "SimilarityIndex":
+        """Open a saved index; with ``mmap`` the arrays are paged in from disk on demand"""
+        mode = "r" if mmap else None
+        # Resolve the link once, so a concurrent save can't mix arrays from two versions
+        directory = os.path.realpath(directory)
+        return cls(**{
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+            for name in cls.ARRAYS
+        })
+
+    def position_of(self, track_id: str) -> Optional[int]:
+        """Row of a track ID, by binary search over the sorted ID order"""
+        i = int(np.searchsorted(self.track_ids, track_id, sorter=self.id_order))
+        if i < len(self.id_order) and self.track_ids[self.id_order[i]] == track_id:
+            return int(self.id_order[i])
+        return None
+
+    def vector_of(self, track_id: str) -> Optional[np.ndarray]:
+        position = self.position_of(track_id)
+        return None if position is None else np.asarray(self.vectors[position])
+
+    def search(
+        self,
+        vector: np.ndarray,
+        k: int = 20,
+        exclude: Optional[Set[str]] = None,
+        exact: bool = True,
+        n_probe: int = 8
+    ) -> List[Neighbor]:
+        """k nearest tracks to a normalized vector, skipping excluded track IDs"""
+        exclude = exclude or set()
+        query = np.asarray(vector, dtype=np.float32).reshape(len(FEATURE_COLUMNS))
+        fetch = min(len(self), k + len(exclude))
+        if fetch <= 0:
+            return []
+
+        if exact:
+            distances, positions = self.tree.query(query, k=fetch)
+            distances, positions = np.atleast_1d(distances), np.atleast_1d(positions)
+        else:
+            distances, positions = self._search_cells(query, fetch, n_probe)
+
+        neighbors = []
+        for distance, position in zip(distances, positions):
+            track_id = str(self.track_ids[position])
+            if track_id in exclude:
+                continue
+            neighbors.append(Neighbor(track_id=track_id, distance=float(distance)))
+            if len(neighbors) == k:
+                break
+        return neighbors
+
+    def _search_cells(self, query: np.ndarray, fetch: int, n_probe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute force over the ``n_probe`` nearest cells, widening until enough rows are covered"""
+        cell_order = np.argsort(np.square(self.centroids - query).sum(axis=1))
+        sizes = np.diff(self.offsets)[cell_order]
+        n_probe = max(n_probe, int(np.searchsorted(np.cumsum(sizes), fetch)) + 1)
+        cells = cell_order[:n_probe]
+
+        positions = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+        candidates = np.concatenate([self.vectors[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+        distances = np.sqrt(np.square(candidates - query).sum(axis=1))
+
+        fetch = min(fetch, len(distances))
+        nearest = np.argpartition(distances, fetch - 1)[:fetch]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return distances[nearest], positions[nearest]
+
+@contextmanager
+def _exclusive_lock(path: str) -> Iterator[bool]:
+    """Non-blocking lock shared by every worker process; yields False while another process holds it"""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+def build_index(track_ids: np.ndarray, features: np.ndarray, directory: str) -> int:
+    """Build and save an index; module-level so it can run in the compute pool"""
+    SimilarityIndex.build(track_ids, features).save(directory)
+    return len(track_ids)
+
+class SimilarityService:
+    """
+    Owns the process-wide similarity index: loading, rebuilding from
+    track_features and querying. Every uvicorn worker has its own service;
+    builds are serialized by a lock file next to the index, and each worker
+    polls the index symlink and reopens it when another worker swaps in a
+    new version.
+    """
+
+    def __init__(self):
+        self.index_dir = os.getenv("SIMILARITY_INDEX_DIR", "data/similarity_index")
+        self.n_probe = int(os.getenv("SIMILARITY_N_PROBE", "8"))
+        self.build_timeout = float(os.getenv("SIMILARITY_BUILD_TIMEOUT", "3600"))
+        self.reload_interval = float(os.getenv("SIMILARITY_RELOAD_INTERVAL", "10"))
+        self.index: Optional[SimilarityIndex] = None
+        # Resolved version directory the open index was loaded from
+        self.version: Optional[str] = None
+        self.built_at: Optional[datetime] = None
+        self._build_task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @property
+    def lock_path(self) -> str:
+        return f"{os.path.abspath(self.index_dir)}.lock"
+
+    async def start(self):
+        """Open the saved index, or build one in the background if no worker has yet"""
+        try:
+            loaded = await self.reload_if_changed()
+        except Exception as e:
+            logger.error(f"Failed to load similarity index from {self.index_dir}: {e}")
+            loaded = False
+        if not loaded:
+            self.schedule_rebuild(only_if_missing=True)
+        self._watch_task = asyncio.create_task(self._watch())
+
+    async def close(self):
+        for task in (self._build_task, self._watch_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._build_task = None
+        self._watch_task = None
+
+    async def reload_if_changed(self) -> bool:
+        """Open the index the symlink points at if it is not the one already open"""
+        if not os.path.isdir(self.index_dir):
+            return False
+        version = os.path.realpath(self.index_dir)
+        if version == self.version:
+            return False
+        self.index = await asyncio.to_thread(self._open, version)
+        self.version = version
+        self.built_at = datetime.fromtimestamp(os.path.getmtime(version))
+        logger.info(f"✅ Loaded similarity index with {len(self.index)} tracks")
+        return True
+
+    async def _watch(self):
+        """Pick up indexes rebuilt by other workers"""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload_if_changed()
+            except Exception as e:
+                # A version removed mid-open by a newer save is simply retried next interval
+                logger.warning(f"Failed to reload similarity index: {e}")
+
+    @property
+    def building(self) -> bool:
+        return self._build_task is not None and not self._build_task.done()
+
+    def schedule_rebuild(self, only_if_missing: bool = False) -> bool:
+        """Start a background rebuild unless one is already running in this worker"""
+        if self.building:
+            return False
+        self._build_task = asyncio.create_task(self._rebuild_logged(only_if_missing))
+        return True
+
+    async def _rebuild_logged(self, only_if_missing: bool):
+        try:
+            await self.rebuild(only_if_missing)
+        except Exception as e:
+            logger.error(f"Error rebuilding similarity index: {e}")
+
+    async def rebuild(self, only_if_missing: bool = False) -> int:
+        """
+        Build a fresh index from every stored track's features; returns the
+        indexed track count, or 0 when another worker holds the build lock
+        (this worker then picks up that worker's index when it lands).
+        """
+        with _exclusive_lock(self.lock_path) as acquired:
+            if not acquired:
+                logger.info("Similarity index is being built by another worker")
+                return 0
+            # Another worker may have finished a build while this one waited to start
+            if only_if_missing and os.path.isdir(self.index_dir):
+                await self.reload_if_changed()
+                return 0
+
+            track_ids, features = await self._load_features()
+            if not len(track_ids):
+                logger.warning("No stored audio features, similarity index not built")
+                return 0
+
+            # k-means and the IVF layout run in a worker process; only the memory-mapped open happens here
+            await compute_pool.run(build_index, track_ids, features, self.index_dir, timeout=self.build_timeout)
+        await self.reload_if_changed()
+        logger.info(f"✅ Built similarity index with {len(track_ids)} tracks")
+        return len(track_ids)
+
+    async def _load_features(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Stream track IDs and feature rows out of track_features with a narrow projection"""
+        get_features = itemgetter(*FEATURE_COLUMNS)
+        projection = {"_id": 0, "track_id": 1, **{f"features.{name}": 1 for name in FEATURE_COLUMNS}}
+        cursor = TrackFeatures.get_motor_collection().find({}, projection, batch_size=10000)
+
+        track_ids = []
+        rows = []
+        async for doc in cursor:
+            try:
+                rows.append(get_features(doc["features"]))
+            except KeyError:
+                continue
+            track_ids.append(doc["track_id"])
+        return (
+            np.array(track_ids, dtype=TRACK_ID_DTYPE),
+            np.array(rows, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS))
+        )
+
+    @staticmethod
+    def _open(directory: str) -> SimilarityIndex:
+        index = SimilarityIndex.load(directory)
+        index.tree  # Build the KD-tree off the event loop so the first exact query is fast
+        return index
+
+    async def vector_for_track(self, track_id: str) -> Optional[np.ndarray]:
+        """Normalized vector of a track, from the index or its stored features"""
+        if self.index is not None:
+            vector = self.index.vector_of(track_id)
+            if vector is not None:
+                return vector
+        doc = await TrackFeatures.get_motor_collection().find_one({"track_id": track_id}, {"_id": 0, "features": 1})
+        if not doc:
+            return None
+        return normalize_features(np.array(itemgetter(*FEATURE_COLUMNS)(doc["features"]), dtype=np.float32))
+
+    def nearest(
+        self,
+        vector: np.ndarray,
+        k: int = 20,
+        exclude: Optional[Set[str]] = None,
+        exact: bool = True
+    ) -> List[Neighbor]:
+        if self.index is None:
+            return []
+        return self.index.search(vector, k=k, exclude=exclude, exact=exact, n_probe=self.n_probe)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tracks": len(self.index) if self.index is not None else 0,
+            "cells": len(self.index.centroids) if self.index is not None else 0,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "building": self.building
+        }
+
+# Create singleton instance
+similarity_service = SimilarityService()
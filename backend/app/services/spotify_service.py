@@ -3,14 +3,42 @@ Spotify OAuth Service
 Handles Spotify Web API authentication and data fetching
 """
 import httpx
+import asyncio
 import base64
+import hashlib
 import json
+import time
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
 import os
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
 from loguru import logger
 
+from .pagination import fetch_all_pages, IncompleteListingError, PageFetchResult
+from .rate_limiter import RequestScheduler, SpotifyRateLimitError
+from ..models.playlist import AudioFeatures, User
+from ..core.cache import SingleFlight, TTLCache
+from ..core.metrics import SPOTIFY_REQUEST_DURATION, spotify_endpoint
+
+# Only request the track fields we store, which keeps item pages small
+PLAYLIST_TRACK_FIELDS = (
+    "total,limit,items(track(id,type,is_local,name,duration_ms,popularity,preview_url,external_urls,"
+    "artists(id,name),album(id,name,release_date)))"
+)
+AUDIO_FEATURES_BATCH_SIZE = 100
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 support in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Access tokens cached for background jobs are dropped this long before Spotify expires them
+USER_TOKEN_EXPIRY_MARGIN = 60
+
+class SpotifyAuthorizationError(Exception):
+    """Raised when no valid access token can be obtained for a user"""
+
 class SpotifyOAuthService:
     """Service for Spotify OAuth and API interactions"""
     
@@ -18,13 +46,180 @@ class SpotifyOAuthService:
         self.client_id = os.getenv("SPOTIFY_CLIENT_ID")
         self.client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
         self.redirect_uri = os.getenv("SPOTIFY_REDIRECT_URI", "http://localhost:3000/callback")
-        self.base_url = "https://api.spotify.com/v1"
-        self.auth_url = "https://accounts.spotify.com/api/token"
-        self.authorize_url = "https://accounts.spotify.com/authorize"
+        # Overridable so a local simulator (tools/spotify_simulator.py) can stand in for Spotify
+        self.base_url = os.getenv("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1").rstrip("/")
+        accounts_url = os.getenv("SPOTIFY_ACCOUNTS_BASE_URL", "https://accounts.spotify.com").rstrip("/")
+        self.auth_url = f"{accounts_url}/api/token"
+        self.authorize_url = f"{accounts_url}/authorize"
+        
+        # Connection pool configuration for the shared HTTP client
+        self.max_connections = int(os.getenv("SPOTIFY_HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = int(os.getenv("SPOTIFY_HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("SPOTIFY_HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.max_connections_per_host = int(os.getenv("SPOTIFY_HTTP_MAX_PER_HOST", "50"))
+        self.request_timeout = float(os.getenv("SPOTIFY_HTTP_TIMEOUT", "15"))
+        self.http2 = os.getenv("SPOTIFY_HTTP2", "true").lower() == "true"
+        self.max_concurrent_pages = int(os.getenv("SPOTIFY_MAX_CONCURRENT_PAGES", "8"))
+        # Set before start() to serve requests in-process, e.g. from the simulator in benchmarks
+        self.transport: Optional[httpx.AsyncBaseTransport] = None
+        
+        # Shared rate-limit scheduler for every outbound Spotify call
+        self.scheduler = RequestScheduler(
+            credential_rate=float(os.getenv("SPOTIFY_RATE_LIMIT_PER_SECOND", "20")),
+            credential_burst=float(os.getenv("SPOTIFY_RATE_LIMIT_BURST", "40")),
+            user_rate=float(os.getenv("SPOTIFY_USER_RATE_LIMIT_PER_SECOND", "10")),
+            user_burst=float(os.getenv("SPOTIFY_USER_RATE_LIMIT_BURST", "20")),
+            max_retries=int(os.getenv("SPOTIFY_MAX_RETRIES", "3"))
+        )
+        
+        # Access token -> /me profile, so repeat requests don't need a round trip to learn the user
+        self.user_cache = TTLCache(
+            maxsize=int(os.getenv("SPOTIFY_USER_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("SPOTIFY_USER_CACHE_TTL", "300"))
+        )
+        self.token_expiry = TTLCache(maxsize=self.user_cache.maxsize, ttl=3600)
+        # Spotify user ID -> live access token, for jobs that act on a user's behalf
+        self.user_tokens = TTLCache(maxsize=self.user_cache.maxsize, ttl=3600)
+        self._user_lookups = SingleFlight()
+        
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._requests_total = 0
+        self._peak_in_flight = 0
         
         if not self.client_id or not self.client_secret:
             logger.warning("Spotify credentials not found in environment variables")
     
+    async def start(self):
+        """Create the shared pooled HTTP client (called from the app lifespan)"""
+        if self._client is not None:
+            return
+        
+        http2 = self.http2 and HTTP2_AVAILABLE
+        if self.http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+        
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=httpx.Timeout(self.request_timeout),
+            transport=self.transport
+        )
+        logger.info(
+            f"Spotify HTTP client started (http2={http2}, max_connections={self.max_connections}, "
+            f"max_keepalive={self.max_keepalive_connections}, per_host={self.max_connections_per_host})"
+        )
+    
+    async def close(self):
+        """Close the shared HTTP client and release pooled connections"""
+        await self.scheduler.close()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._host_semaphores = {}
+            logger.info("Spotify HTTP client closed")
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it lazily outside the app lifespan"""
+        if self._client is None:
+            await self.start()
+        return self._client
+    
+    @staticmethod
+    def _user_key(headers: Optional[Dict[str, str]]) -> str:
+        """Rate-limit key for the caller: a hash of the bearer token, or the app itself"""
+        authorization = (headers or {}).get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            return hashlib.sha256(authorization[7:].encode()).hexdigest()[:16]
+        return "client"
+    
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the scheduler and the shared client, capping concurrent requests per host"""
+        client = await self._get_client()
+        parts = urlsplit(url)
+        host = parts.netloc
+        endpoint = spotify_endpoint(parts.path)
+        
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_semaphores[host] = semaphore
+        
+        async def send() -> httpx.Response:
+            async with semaphore:
+                self._requests_total += 1
+                self._in_flight[host] = self._in_flight.get(host, 0) + 1
+                self._peak_in_flight = max(self._peak_in_flight, sum(self._in_flight.values()))
+                status = "error"
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    status = str(response.status_code)
+                    return response
+                finally:
+                    self._in_flight[host] -= 1
+                    SPOTIFY_REQUEST_DURATION.observe(time.perf_counter() - started, endpoint, method, status)
+        
+        return await self.scheduler.execute(
+            self.client_id or "default",
+            self._user_key(kwargs.get("headers")),
+            send
+        )
+    
+    async def _paginate(
+        self,
+        url: str,
+        access_token: str,
+        page_size: int,
+        params: Optional[Dict[str, Any]] = None
+    ) -> PageFetchResult:
+        """Fetch all pages of an offset-paged endpoint concurrently, preserving order"""
+        headers = {"Authorization": f"Bearer {access_token}"}
+        
+        async def fetch_page(offset: int) -> Dict[str, Any]:
+            page_params = {**(params or {}), "limit": page_size, "offset": offset}
+            response = await self._request("GET", url, headers=headers, params=page_params)
+            response.raise_for_status()
+            return response.json()
+        
+        return await fetch_all_pages(fetch_page, page_size, max_concurrency=self.max_concurrent_pages)
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Report connection pool utilization for the shared client"""
+        stats = {
+            "started": self._client is not None,
+            "http2": bool(self._client is not None and self.http2 and HTTP2_AVAILABLE),
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "max_connections_per_host": self.max_connections_per_host,
+            "requests_total": self._requests_total,
+            "in_flight": sum(self._in_flight.values()),
+            "in_flight_per_host": dict(self._in_flight),
+            "peak_in_flight": self._peak_in_flight,
+            "open_connections": 0,
+            "idle_connections": 0,
+            "active_connections": 0,
+            "utilization": 0.0
+        }
+        
+        if self._client is None:
+            return stats
+        
+        # httpx does not expose its pool publicly, so read it defensively
+        pool = getattr(self._client._transport, "_pool", None)
+        connections = getattr(pool, "connections", None) or []
+        stats["open_connections"] = len(connections)
+        stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+        stats["active_connections"] = stats["open_connections"] - stats["idle_connections"]
+        stats["utilization"] = round(stats["open_connections"] / self.max_connections, 3) if self.max_connections else 0.0
+        return stats
+    
     def get_authorization_url(self, state: str = None) -> str:
         """Generate Spotify authorization URL for OAuth flow"""
         params = {
@@ -57,14 +252,15 @@ class SpotifyOAuthService:
                 "redirect_uri": self.redirect_uri
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(self.auth_url, headers=headers, data=data)
-                response.raise_for_status()
-                
-                token_data = response.json()
-                logger.info("Successfully exchanged authorization code for tokens")
-                return token_data
+            response = await self._request("POST", self.auth_url, headers=headers, data=data)
+            response.raise_for_status()
+            
+            token_data = response.json()
+            logger.info("Successfully exchanged authorization code for tokens")
+            return token_data
                 
+        except SpotifyRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Failed to exchange authorization code for tokens: {e}")
             return None
@@ -85,14 +281,15 @@ class SpotifyOAuthService:
                 "refresh_token": refresh_token
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(self.auth_url, headers=headers, data=data)
-                response.raise_for_status()
-                
-                token_data = response.json()
-                logger.info("Successfully refreshed access token")
-                return token_data
+            response = await self._request("POST", self.auth_url, headers=headers, data=data)
+            response.raise_for_status()
+            
+            token_data = response.json()
+            logger.info("Successfully refreshed access token")
+            return token_data
                 
+        except SpotifyRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Failed to refresh access token: {e}")
             return None
@@ -102,71 +299,247 @@ class SpotifyOAuthService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                url = f"{self.base_url}/me"
-                response = await client.get(url, headers=headers)
-                response.raise_for_status()
-                
-                user_data = response.json()
-                logger.info(f"Successfully fetched user profile for {user_data.get('id')}")
-                return user_data
+            url = f"{self.base_url}/me"
+            response = await self._request("GET", url, headers=headers)
+            response.raise_for_status()
+            
+            user_data = response.json()
+            logger.info(f"Successfully fetched user profile for {user_data.get('id')}")
+            return user_data
                 
+        except SpotifyRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Failed to fetch user profile: {e}")
             return None
     
+    @staticmethod
+    def _token_hash(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode()).hexdigest()
+    
+    def remember_token(self, access_token: str, expires_in: Optional[int], user_data: Optional[Dict[str, Any]] = None):
+        """Record when a token we issued expires (and its user, if known) so cached lookups never outlive it"""
+        if not access_token or not expires_in:
+            return
+        key = self._token_hash(access_token)
+        self.token_expiry.put(key, time.monotonic() + expires_in, ttl=expires_in)
+        if user_data:
+            self.user_cache.put(key, user_data, ttl=self._user_ttl(key))
+            if expires_in > USER_TOKEN_EXPIRY_MARGIN and user_data.get("id"):
+                self.user_tokens.put(user_data["id"], access_token, ttl=expires_in - USER_TOKEN_EXPIRY_MARGIN)
+    
+    def _user_ttl(self, key: str) -> float:
+        """Cache TTL for a token's user: the configured TTL, cut short at the token's expiry when known"""
+        expires_at = self.token_expiry.get(key)
+        if expires_at is None:
+            return self.user_cache.ttl
+        return min(self.user_cache.ttl, expires_at - time.monotonic())
+    
+    async def resolve_user(self, access_token: str) -> Optional[Dict[str, Any]]:
+        """
+        User profile for an access token from the TTL cache; on a miss one
+        /me call is made no matter how many requests arrive with the token.
+        Invalid tokens are not cached.
+        """
+        key = self._token_hash(access_token)
+        user_data = self.user_cache.get(key)
+        if user_data is not None:
+            return user_data
+        
+        async def fetch() -> Optional[Dict[str, Any]]:
+            fetched = await self.get_current_user(access_token)
+            if fetched:
+                self.user_cache.put(key, fetched, ttl=self._user_ttl(key))
+            return fetched
+        
+        return await self._user_lookups.do(key, fetch)
+    
+    async def get_user_access_token(self, spotify_user_id: str) -> str:
+        """
+        A live access token for a user, for jobs that run after the request
+        that queued them: the one seen at login while it is still valid,
+        otherwise a fresh one minted from the user's stored refresh token.
+        """
+        access_token = self.user_tokens.get(spotify_user_id)
+        if access_token is not None:
+            return access_token
+        
+        async def mint() -> str:
+            user = await User.find_one({"spotify_id": spotify_user_id})
+            if not user or not user.spotify_refresh_token:
+                raise SpotifyAuthorizationError(f"No Spotify refresh token stored for user {spotify_user_id}")
+            token_data = await self.refresh_access_token(user.spotify_refresh_token)
+            if not token_data or not token_data.get("access_token"):
+                raise SpotifyAuthorizationError(f"Failed to refresh the Spotify access token of user {spotify_user_id}")
+            # Spotify may rotate the refresh token
+            if token_data.get("refresh_token") and token_data["refresh_token"] != user.spotify_refresh_token:
+                await User.get_motor_collection().update_one(
+                    {"_id": user.id},
+                    {"$set": {"spotify_refresh_token": token_data["refresh_token"]}}
+                )
+            expires_in = token_data.get("expires_in") or 3600
+            self.user_tokens.put(
+                spotify_user_id,
+                token_data["access_token"],
+                ttl=max(1, expires_in - USER_TOKEN_EXPIRY_MARGIN)
+            )
+            return token_data["access_token"]
+        
+        return await self._user_lookups.do(f"token:{spotify_user_id}", mint)
+    
+    def get_user_cache_stats(self) -> Dict[str, Any]:
+        return {**self.user_cache.get_stats(), "single_flight": self._user_lookups.get_stats()}
+    
     async def get_user_playlists(self, access_token: str) -> List[Dict[str, Any]]:
         """Fetch user's playlists from Spotify API"""
         try:
-            headers = {"Authorization": f"Bearer {access_token}"}
+            url = f"{self.base_url}/me/playlists"
+            result = await self._paginate(url, access_token, page_size=50)
+            
+            if not result.complete:
+                logger.warning(f"Playlist listing incomplete, failed offsets: {result.failed_offsets}")
+            
+            # Format playlist data
             all_playlists = []
-            offset = 0
-            limit = 50
-            
-            async with httpx.AsyncClient() as client:
-                while True:
-                    url = f"{self.base_url}/me/playlists"
-                    params = {"limit": limit, "offset": offset}
-                    
-                    response = await client.get(url, headers=headers, params=params)
-                    response.raise_for_status()
-                    
-                    data = response.json()
-                    playlists = data.get("items", [])
-                    
-                    if not playlists:
-                        break
-                    
-                    # Format playlist data
-                    for playlist in playlists:
-                        if playlist and playlist.get("tracks", {}).get("total", 0) > 0:
-                            formatted_playlist = {
-                                "spotify_id": playlist["id"],
-                                "name": playlist["name"],
-                                "description": playlist.get("description", ""),
-                                "track_count": playlist["tracks"]["total"],
-                                "public": playlist.get("public", False),
-                                "collaborative": playlist.get("collaborative", False),
-                                "owner": {
-                                    "id": playlist["owner"]["id"],
-                                    "display_name": playlist["owner"].get("display_name")
-                                },
-                                "images": playlist.get("images", []),
-                                "external_urls": playlist.get("external_urls", {}),
-                                "snapshot_id": playlist["snapshot_id"]
-                            }
-                            all_playlists.append(formatted_playlist)
-                    
-                    offset += limit
-                    if len(playlists) < limit:
-                        break
+            for playlist in result.items:
+                if playlist and playlist.get("tracks", {}).get("total", 0) > 0:
+                    formatted_playlist = {
+                        "spotify_id": playlist["id"],
+                        "name": playlist["name"],
+                        "description": playlist.get("description", ""),
+                        "track_count": playlist["tracks"]["total"],
+                        "public": playlist.get("public", False),
+                        "collaborative": playlist.get("collaborative", False),
+                        "owner": {
+                            "id": playlist["owner"]["id"],
+                            "display_name": playlist["owner"].get("display_name")
+                        },
+                        "images": playlist.get("images", []),
+                        "external_urls": playlist.get("external_urls", {}),
+                        "snapshot_id": playlist["snapshot_id"]
+                    }
+                    all_playlists.append(formatted_playlist)
             
             logger.info(f"Successfully fetched {len(all_playlists)} playlists")
             return all_playlists
             
+        except SpotifyRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Failed to fetch user playlists: {e}")
             return []
 
+    async def get_playlist_tracks(self, playlist_id: str, access_token: str) -> List[Dict[str, Any]]:
+        """
+        Fetch all tracks of a playlist, shaped for the Track model. Raises
+        (IncompleteListingError when pages are missing) instead of returning a
+        partial or empty list, since the caller stores the result as the
+        playlist's complete track list for its snapshot.
+        """
+        try:
+            url = f"{self.base_url}/playlists/{playlist_id}/tracks"
+            result = await self._paginate(
+                url, access_token, page_size=100, params={"fields": PLAYLIST_TRACK_FIELDS}
+            )
+            
+            if not result.complete:
+                raise IncompleteListingError(
+                    f"got {len(result.items)} of {result.total} items, failed offsets: {result.failed_offsets}"
+                )
+            
+            tracks = []
+            for item in result.items:
+                track = (item or {}).get("track")
+                # Skip removed tracks, local files and podcast episodes
+                if not track or not track.get("id") or track.get("is_local") or track.get("type", "track") != "track":
+                    continue
+                
+                album = track.get("album") or {}
+                tracks.append({
+                    "spotify_id": track["id"],
+                    "name": track.get("name", ""),
+                    "artists": [
+                        {"id": artist.get("id") or "", "name": artist.get("name", "")}
+                        for artist in track.get("artists", [])
+                    ],
+                    "album": {
+                        "id": album.get("id") or "",
+                        "name": album.get("name", ""),
+                        "release_date": album.get("release_date")
+                    },
+                    "duration_ms": track.get("duration_ms", 0),
+                    "popularity": track.get("popularity", 0),
+                    "preview_url": track.get("preview_url"),
+                    "external_urls": track.get("external_urls", {})
+                })
+            
+            logger.info(f"Successfully fetched {len(tracks)} tracks for playlist {playlist_id}")
+            return tracks
+            
+        except Exception as e:
+            logger.error(f"Failed to fetch tracks for playlist {playlist_id}: {e}")
+            raise
+    
+    async def get_audio_features(self, track_ids: List[str], access_token: str) -> List[Dict[str, Any]]:
+        """
+        Fetch audio features in parallel batches of 100 IDs, shaped for the
+        AudioFeatures model. Raises if any batch fails (SpotifyRateLimitError
+        as is), so the job fetching them is retried rather than completed
+        with tracks silently missing.
+        """
+        try:
+            # Deduplicate while keeping the original order
+            unique_ids = list(dict.fromkeys(track_id for track_id in track_ids if track_id))
+            if not unique_ids:
+                return []
+            
+            batches = [
+                unique_ids[i:i + AUDIO_FEATURES_BATCH_SIZE]
+                for i in range(0, len(unique_ids), AUDIO_FEATURES_BATCH_SIZE)
+            ]
+            headers = {"Authorization": f"Bearer {access_token}"}
+            semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+            
+            async def fetch_batch(batch: List[str]) -> List[Optional[Dict[str, Any]]]:
+                async with semaphore:
+                    url = f"{self.base_url}/audio-features"
+                    response = await self._request("GET", url, headers=headers, params={"ids": ",".join(batch)})
+                    response.raise_for_status()
+                    return response.json().get("audio_features") or []
+            
+            results = await asyncio.gather(*(fetch_batch(batch) for batch in batches), return_exceptions=True)
+            
+            failures = [
+                (batch, result) for batch, result in zip(batches, results)
+                if isinstance(result, BaseException)
+            ]
+            for batch, error in failures:
+                logger.error(f"Failed to fetch audio features batch of {len(batch)} tracks: {error}")
+            if failures:
+                rate_limited = [error for _, error in failures if isinstance(error, SpotifyRateLimitError)]
+                if rate_limited:
+                    raise max(rate_limited, key=lambda error: error.retry_after)
+                raise failures[0][1]
+            
+            audio_features = []
+            for result in results:
+                for feature in result:
+                    # Spotify returns null for tracks without analysis
+                    if not feature or not feature.get("id"):
+                        continue
+                    try:
+                        validated = AudioFeatures(**feature)
+                    except ValueError as e:
+                        logger.debug(f"Skipping invalid audio features for track {feature.get('id')}: {e}")
+                        continue
+                    audio_features.append({"spotify_id": feature["id"], **validated.model_dump()})
+            
+            logger.info(f"Successfully fetched audio features for {len(audio_features)} of {len(unique_ids)} tracks")
+            return audio_features
+            
+        except Exception as e:
+            logger.error(f"Failed to fetch audio features: {e}")
+            raise
+
 # Create singleton instance
 spotify_oauth_service = SpotifyOAuthService()
\ No newline at end of file
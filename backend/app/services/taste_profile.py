@@ -0,0 +1,89 @@
+"""
+Taste Profile Service
+User-level taste profiles merged from per-playlist running statistics
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from beanie.exceptions import RevisionIdWasChanged
+from loguru import logger
+
+from ..models.playlist import Playlist, RunningStats, UserTasteProfile
+from .analysis import merge_running_stats, remove_running_stats, summarize_running_stats
+
+async def rebuild_taste_profile(user_id: str) -> UserTasteProfile:
+    """Merge the running statistics of every analyzed playlist; O(playlists), no track reads"""
+    cursor = Playlist.get_motor_collection().find(
+        {"user_id": user_id, "analysis.running_stats": {"$ne": None}},
+        {"_id": 0, "spotify_id": 1, "analysis.running_stats": 1}
+    )
+
+    stats = RunningStats()
+    playlist_ids = []
+    async for doc in cursor:
+        stats = merge_running_stats(stats, RunningStats(**doc["analysis"]["running_stats"]))
+        playlist_ids.append(doc["spotify_id"])
+
+    profile = await UserTasteProfile.find_one(UserTasteProfile.user_id == user_id)
+    if profile is None:
+        profile = UserTasteProfile(user_id=user_id)
+    profile.stats = stats
+    profile.playlist_ids = playlist_ids
+    profile.updated_at = datetime.now()
+    await profile.save()
+
+    logger.info(f"Rebuilt taste profile for user {user_id} from {len(playlist_ids)} playlists")
+    return profile
+
+async def get_taste_profile(user_id: str, rebuild: bool = False) -> UserTasteProfile:
+    """Stored taste profile, built on first use or when a rebuild is requested"""
+    profile = None if rebuild else await UserTasteProfile.find_one(UserTasteProfile.user_id == user_id)
+    if profile is None:
+        profile = await rebuild_taste_profile(user_id)
+    return profile
+
+async def apply_playlist_stats(
+    user_id: str,
+    playlist_id: str,
+    previous: Optional[RunningStats],
+    current: Optional[RunningStats]
+):
+    """
+    Swap one playlist's contribution in the stored profile: its previous
+    statistics are taken out and the current ones merged in. A missing
+    profile is left to be built on the next read; a profile that can't be
+    updated consistently is dropped so the next read rebuilds it.
+    """
+    profile = await UserTasteProfile.find_one(UserTasteProfile.user_id == user_id)
+    if profile is None:
+        return
+
+    stats = profile.stats
+    if playlist_id in profile.playlist_ids:
+        if previous is None:
+            await profile.delete()
+            return
+        stats = remove_running_stats(stats, previous)
+        profile.playlist_ids.remove(playlist_id)
+
+    if current is not None:
+        stats = merge_running_stats(stats, current)
+        profile.playlist_ids.append(playlist_id)
+
+    profile.stats = stats
+    profile.updated_at = datetime.now()
+    try:
+        await profile.save()
+    except RevisionIdWasChanged:
+        # A concurrent update won the race; drop the profile rather than lose either change
+        logger.warning(f"Concurrent taste profile update for user {user_id}, scheduling rebuild")
+        await UserTasteProfile.find(UserTasteProfile.user_id == user_id).delete()
+
+def taste_profile_response(profile: UserTasteProfile) -> Dict[str, Any]:
+    """API representation of a stored taste profile"""
+    return {
+        "user_id": profile.user_id,
+        "playlist_count": len(profile.playlist_ids),
+        "updated_at": profile.updated_at,
+        **summarize_running_stats(profile.stats)
+    }
@@ -0,0 +1,125 @@
+"""
+Track Store
+Reads and writes playlist tracks in the playlist_tracks collection
+"""
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import DeleteMany, ReplaceOne, UpdateMany
+
+from ..models.playlist import PlaylistTrack, Track
+
+# Documents per Mongo round trip when streaming tracks; bounds memory per request
+TRACK_CURSOR_BATCH_SIZE = int(os.getenv("TRACK_CURSOR_BATCH_SIZE", "500"))
+
+def _track_document(playlist_id: str, position: int, track: Track) -> Dict[str, Any]:
+    entry = PlaylistTrack(playlist_id=playlist_id, position=position, track_id=track.spotify_id, track=track)
+    return entry.model_dump(by_alias=True, exclude={"id", "revision_id"})
+
+async def load_tracks(playlist_id: str, skip: int = 0, limit: Optional[int] = None) -> List[Track]:
+    """Load a page of a playlist's tracks in playlist order"""
+    query = PlaylistTrack.find(PlaylistTrack.playlist_id == playlist_id).sort("+position").skip(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return [entry.track for entry in await query.to_list()]
+
+async def iter_tracks(
+    playlist_id: str,
+    after: Optional[int] = None,
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> AsyncIterator[Tuple[int, Track]]:
+    """
+    Yield ``(position, track)`` in playlist order straight off a Mongo
+    cursor, starting after the ``after`` position, so only one batch is held
+    in memory however long the playlist is.
+    """
+    query: Dict[str, Any] = {"playlist_id": playlist_id}
+    if after is not None:
+        query["position"] = {"$gt": after}
+    cursor = PlaylistTrack.get_motor_collection().find(
+        query,
+        {"_id": 0, "position": 1, "track": 1},
+        batch_size=TRACK_CURSOR_BATCH_SIZE
+    ).sort("position", 1).skip(skip)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    async for doc in cursor:
+        yield doc["position"], Track.model_validate(doc["track"])
+
+async def load_track_documents(playlist_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Load raw stored tracks (``Track`` layout) in playlist order, optionally only some fields"""
+    projection = {"_id": 0, "track": 1}
+    if fields:
+        projection = {"_id": 0, **{f"track.{name}": 1 for name in fields}}
+    cursor = PlaylistTrack.get_motor_collection().find({"playlist_id": playlist_id}, projection).sort("position", 1)
+    return [doc["track"] async for doc in cursor]
+
+async def count_tracks(playlist_id: str, with_features: Optional[bool] = None) -> int:
+    """Count stored tracks, optionally only those with (or without) audio features"""
+    query: Dict[str, Any] = {"playlist_id": playlist_id}
+    if with_features is True:
+        query["track.audio_features"] = {"$ne": None}
+    elif with_features is False:
+        query["track.audio_features"] = None
+    return await PlaylistTrack.get_motor_collection().count_documents(query)
+
+async def load_track_ids(playlist_id: str) -> List[str]:
+    """All track IDs stored for a playlist"""
+    cursor = PlaylistTrack.get_motor_collection().find({"playlist_id": playlist_id}, {"_id": 0, "track_id": 1})
+    return [doc["track_id"] async for doc in cursor]
+
+async def load_track_summaries(track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Name, artists and links of tracks by ID, from any playlist that stores them"""
+    cursor = PlaylistTrack.get_motor_collection().find(
+        {"track_id": {"$in": track_ids}},
+        {"_id": 0, "track_id": 1, "track.name": 1, "track.artists": 1, "track.preview_url": 1, "track.external_urls": 1}
+    )
+    summaries = {}
+    async for doc in cursor:
+        summaries.setdefault(doc["track_id"], doc["track"])
+    return summaries
+
+async def track_ids_without_features(playlist_id: str) -> List[str]:
+    """Track IDs in the playlist that still need audio features"""
+    cursor = PlaylistTrack.get_motor_collection().find(
+        {"playlist_id": playlist_id, "track.audio_features": None},
+        {"_id": 0, "track_id": 1}
+    )
+    return [doc["track_id"] async for doc in cursor]
+
+async def replace_tracks(playlist_id: str, tracks: List[Track]):
+    """
+    Store the playlist's full track list: positions are upserted in place
+    and any positions past the new end are removed, so readers never see
+    an empty playlist mid-write.
+    """
+    collection = PlaylistTrack.get_motor_collection()
+    operations = [
+        ReplaceOne(
+            {"playlist_id": playlist_id, "position": position},
+            _track_document(playlist_id, position, track),
+            upsert=True
+        )
+        for position, track in enumerate(tracks)
+    ]
+    operations.append(DeleteMany({"playlist_id": playlist_id, "position": {"$gte": len(tracks)}}))
+    await collection.bulk_write(operations, ordered=False)
+
+async def set_audio_features(playlist_id: str, features: Dict[str, Dict[str, Any]]) -> int:
+    """Attach audio features (keyed by track ID) to the playlist's tracks; returns tracks updated"""
+    if not features:
+        return 0
+    operations = [
+        UpdateMany(
+            {"playlist_id": playlist_id, "track_id": track_id},
+            {"$set": {"track.audio_features": feature}}
+        )
+        for track_id, feature in features.items()
+    ]
+    result = await PlaylistTrack.get_motor_collection().bulk_write(operations, ordered=False)
+    return result.modified_count
+
+async def delete_tracks(playlist_id: str):
+    """Remove all stored tracks of a playlist"""
+    await PlaylistTrack.get_motor_collection().delete_many({"playlist_id": playlist_id})
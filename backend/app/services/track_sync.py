@@ -0,0 +1,95 @@
+"""
+Track Sync Service
+snapshot_id-driven track refresh with a track-level diff
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from ..models.playlist import Playlist, Track
+from .spotify_service import spotify_oauth_service
+from .track_store import load_tracks, replace_tracks
+from .collection_version import bump_collection_version
+
+@dataclass
+class TrackDiff:
+    """Result of reconciling stored tracks with a fresh Spotify listing"""
+    tracks: List[Track] = field(default_factory=list)
+    added: int = 0
+    removed: int = 0
+    retained: int = 0
+
+def diff_tracks(existing: List[Track], fetched: List[Dict[str, Any]]) -> TrackDiff:
+    """
+    Build the new track list in Spotify order, reusing stored tracks (and
+    their audio features) for track IDs that are still in the playlist.
+    """
+    stored = {track.spotify_id: track for track in existing}
+    diff = TrackDiff()
+
+    for spotify_track in fetched:
+        track = stored.get(spotify_track["spotify_id"])
+        if track is not None:
+            diff.retained += 1
+        else:
+            track = Track(**spotify_track)
+            diff.added += 1
+        diff.tracks.append(track)
+
+    fetched_ids = {spotify_track["spotify_id"] for spotify_track in fetched}
+    diff.removed = len(stored.keys() - fetched_ids)
+    return diff
+
+async def refresh_playlist_tracks(playlist: Playlist, access_token: str) -> Optional[TrackDiff]:
+    """
+    Re-fetch a playlist's tracks and apply them as a diff. Returns None when
+    the playlist has no tracks; a failed or incomplete fetch raises.
+    """
+    fetched = await spotify_oauth_service.get_playlist_tracks(playlist.spotify_id, access_token)
+    if not fetched:
+        return None
+
+    diff = diff_tracks(await load_tracks(playlist.spotify_id), fetched)
+    await replace_tracks(playlist.spotify_id, diff.tracks)
+    # playlist_tracks is now authoritative; a stale embedded copy must not be migrated over it
+    playlist.tracks = None
+    playlist.audio_features_fetched = all(track.audio_features for track in diff.tracks)
+    # Records the snapshot_id loaded before the fetch; a listing sync that $set a newer one
+    # meanwhile keeps its value, so the playlist still reads as needing a refresh
+    playlist.mark_tracks_fetched()
+    await Playlist.get_motor_collection().update_one(
+        {"_id": playlist.id},
+        {
+            "$set": {
+                "tracks_fetched": True,
+                "tracks_snapshot_id": playlist.tracks_snapshot_id,
+                "last_fetched_at": playlist.last_fetched_at,
+                "audio_features_fetched": playlist.audio_features_fetched
+            },
+            "$unset": {"tracks": ""}
+        }
+    )
+    await bump_collection_version(playlist.user_id)
+
+    logger.info(
+        f"Refreshed tracks for playlist {playlist.spotify_id}: {diff.added} added, "
+        f"{diff.removed} removed, {diff.retained} retained"
+    )
+    return diff
+
+async def refresh_changed_playlist(spotify_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """
+    Job handler: diff the tracks of a playlist whose snapshot_id changed,
+    using a fresh access token of ``user_id`` (the playlist's user if not
+    given). Returns None when there is nothing to do (already current, or
+    the playlist is empty); fetch failures propagate so the job is retried.
+    """
+    playlist = await Playlist.find_one({"spotify_id": spotify_id})
+    if not playlist or not playlist.needs_refresh:
+        return None
+    access_token = await spotify_oauth_service.get_user_access_token(user_id or playlist.user_id)
+    diff = await refresh_playlist_tracks(playlist, access_token)
+    if diff is None:
+        return None
+    return {"added": diff.added, "removed": diff.removed, "retained": diff.retained}
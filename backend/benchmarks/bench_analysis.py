@@ -0,0 +1,113 @@
+"""
+Analysis Engine Benchmark
+Compares the vectorized analysis engine with the previous per-feature Python passes
+
+Run from backend/: python -m benchmarks.bench_analysis --tracks 100000
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from app.models.playlist import Track
+from app.services.analysis import FEATURE_COLUMNS, analyze_columns, build_track_columns
+
+def make_tracks(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Deterministic synthetic tracks in the stored Track layout"""
+    rng = random.Random(seed)
+    artists = [{"id": f"artist{i}", "name": f"Artist {i}"} for i in range(max(1, count // 20))]
+    tracks = []
+    for i in range(count):
+        tracks.append({
+            "spotify_id": f"track{i}",
+            "name": f"Track {i}",
+            "artists": rng.sample(artists, k=min(len(artists), rng.randint(1, 3))),
+            "album": {"id": f"album{i // 12}", "name": f"Album {i // 12}"},
+            "duration_ms": rng.randint(90_000, 400_000),
+            "popularity": rng.randint(0, 100),
+            "audio_features": {
+                "acousticness": rng.random(),
+                "danceability": rng.random(),
+                "energy": rng.random(),
+                "instrumentalness": rng.random(),
+                "liveness": rng.random(),
+                "loudness": rng.uniform(-60.0, 0.0),
+                "speechiness": rng.random(),
+                "valence": rng.random(),
+                "tempo": rng.uniform(60.0, 200.0),
+                "key": rng.randint(-1, 11),
+                "mode": rng.randint(0, 1),
+                "time_signature": rng.randint(3, 7),
+                "duration_ms": rng.randint(90_000, 400_000)
+            }
+        })
+    return tracks
+
+def legacy_analysis(tracks: List[Track]) -> Dict[str, Any]:
+    """The analysis as analyze_playlist_task computed it before the vectorized engine"""
+    with_features = [t for t in tracks if t.audio_features]
+    total = len(with_features)
+    result = {
+        f"avg_{name}": sum(getattr(t.audio_features, name) for t in with_features) / total
+        for name in FEATURE_COLUMNS
+    }
+    result["total_duration_ms"] = sum(t.duration_ms for t in tracks)
+    result["average_popularity"] = sum(t.popularity for t in tracks) / len(tracks)
+
+    keys = [t.audio_features.key for t in with_features]
+    modes = [t.audio_features.mode for t in with_features]
+    time_signatures = [t.audio_features.time_signature for t in with_features]
+    result["dominant_key"] = max(set(keys), key=keys.count)
+    result["dominant_mode"] = max(set(modes), key=modes.count)
+    result["dominant_time_signature"] = max(set(time_signatures), key=time_signatures.count)
+
+    artist_counts = {}
+    for track in tracks:
+        for artist in track.artists:
+            artist_counts[artist.name] = artist_counts.get(artist.name, 0) + 1
+    result["top_artists"] = [
+        {"name": artist, "track_count": count}
+        for artist, count in sorted(artist_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    ]
+    return result
+
+def timed(fn, *args, repeat: int = 3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = make_tracks(args.tracks)
+
+    # The legacy task validated every stored track into a Pydantic model first
+    models_seconds, models = timed(lambda: [Track(**doc) for doc in documents], repeat=args.repeat)
+    legacy_seconds, legacy = timed(legacy_analysis, models, repeat=args.repeat)
+    build_seconds, columns = timed(build_track_columns, documents, repeat=args.repeat)
+    engine_seconds, engine = timed(analyze_columns, columns, repeat=args.repeat)
+
+    for name in FEATURE_COLUMNS:
+        key = f"avg_{name}"
+        assert abs(legacy[key] - engine[key]) <= 1e-5 * max(1.0, abs(legacy[key])), key
+    for key in ("total_duration_ms", "dominant_key", "dominant_mode", "dominant_time_signature", "top_artists"):
+        assert legacy[key] == engine[key], key
+
+    vectorized_seconds = build_seconds + engine_seconds
+    print(f"tracks:                 {args.tracks}")
+    print(f"legacy model loading:   {models_seconds * 1000:9.1f} ms")
+    print(f"legacy python passes:   {legacy_seconds * 1000:9.1f} ms")
+    print(f"pack columns:           {build_seconds * 1000:9.1f} ms")
+    print(f"vectorized statistics:  {engine_seconds * 1000:9.1f} ms")
+    print(f"speedup (end to end):   {(models_seconds + legacy_seconds) / vectorized_seconds:9.1f}x")
+    print(f"speedup (statistics):   {legacy_seconds / engine_seconds:9.1f}x")
+
+if __name__ == "__main__":
+    main()
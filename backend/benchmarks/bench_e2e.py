@@ -0,0 +1,312 @@
+"""
+End-to-End Benchmark
+Drives the real FastAPI app in-process against the Spotify simulator and a local MongoDB
+
+Covers playlist listing (cold and cached), track fetch, audio-feature fetch,
+analysis and Auth0 token verification for each library size, and writes
+throughput, latency percentiles and peak RSS to JSON.
+
+Run from backend/ with MongoDB reachable at MONGODB_URL (a separate
+MONGODB_DATABASE, which must end in _bench, is used and emptied between sizes):
+    python -m benchmarks.bench_e2e --sizes 10x100,100x100,1000x100 --output e2e.json
+Diff two runs:
+    python -m benchmarks.bench_e2e --compare before.json after.json
+"""
+import os
+
+# The app reads its configuration at import time, so point it at the stand-ins first
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DATABASE", "spotify_analyzer_bench")
+os.environ.setdefault("SPOTIFY_API_BASE_URL", "http://spotify.simulator/v1")
+os.environ.setdefault("SPOTIFY_ACCOUNTS_BASE_URL", "http://spotify.simulator")
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "bench-client")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "bench-secret")
+os.environ.setdefault("SPOTIFY_RATE_LIMIT_PER_SECOND", "100000")
+os.environ.setdefault("SPOTIFY_RATE_LIMIT_BURST", "100000")
+os.environ.setdefault("SPOTIFY_USER_RATE_LIMIT_PER_SECOND", "100000")
+os.environ.setdefault("SPOTIFY_USER_RATE_LIMIT_BURST", "100000")
+os.environ.setdefault("AUTH0_DOMAIN", "bench.auth0.local")
+os.environ.setdefault("AUTH0_AUDIENCE", "https://bench.auth0.local/api/v2/")
+os.environ.setdefault("SIMILARITY_INDEX_DIR", "data/bench_similarity_index")
+# Scenarios call the job handlers directly, so queued jobs must not run concurrently
+os.environ.setdefault("JOB_WORKERS", "0")
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwk, jwt
+
+from app.main import app
+from app.api.playlists import analyze_playlist_task, fetch_audio_features_task
+from app.core.auth import AUTH0_AUDIENCE, AUTH0_DOMAIN, jwks_cache, verify_token
+from app.core.database import db
+from app.services.feature_cache import audio_features_cache
+from app.services.spotify_service import spotify_oauth_service
+from tools.spotify_simulator import SimulatorConfig, create_app as create_simulator
+
+Operation = Callable[[int], Awaitable[bool]]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+async def measure(
+    scenario: str,
+    size: Tuple[int, int],
+    operation: Operation,
+    count: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """Run ``operation(i)`` for i in range(count), at most ``concurrency`` at a time"""
+    latencies = np.zeros(count)
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await operation(i)
+            except Exception:
+                ok = False
+            latencies[i] = time.perf_counter() - started
+            errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(i) for i in range(count)))
+    seconds = time.perf_counter() - started
+    latencies_ms = latencies * 1000
+    result = {
+        "scenario": scenario,
+        "playlists": size[0],
+        "tracks_per_playlist": size[1],
+        "operations": count,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "throughput_per_second": round(count / seconds, 2) if seconds else None,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+    print(
+        f"{scenario:<18}{size[0]:>7}x{size[1]:<6}{count:>7}{errors:>7}{result['throughput_per_second']:>11}"
+        f"{result['p50_ms']:>11}{result['p99_ms']:>11}{result['peak_rss_mb']:>10}"
+    )
+    return result
+
+def check_bench_database(name: str):
+    # reset_state empties every collection, so never point it at a real database
+    if not name.endswith("_bench"):
+        raise SystemExit(f"Refusing to run against MONGODB_DATABASE={name!r}: the benchmark empties it, use a *_bench database")
+
+async def reset_state():
+    """Empty every collection (keeping indexes) and the in-process caches"""
+    check_bench_database(db.database.name)
+    for name in await db.database.list_collection_names():
+        await db.database[name].delete_many({})
+    audio_features_cache.lru.clear()
+    spotify_oauth_service.user_cache.clear()
+
+class JWKSResponder:
+    """Signs benchmark tokens and serves the matching JWKS in-process"""
+
+    def __init__(self):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        public_jwk = jwk.construct(public_pem, algorithm="RS256").to_dict()
+        self.jwks = {"keys": [{**public_jwk, "kid": "bench", "use": "sig", "alg": "RS256"}]}
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=self.jwks, headers={"Cache-Control": "max-age=3600"})
+
+    def token(self, subject: str) -> str:
+        claims = {
+            "sub": subject,
+            "email": f"{subject}@example.com",
+            "aud": AUTH0_AUDIENCE,
+            "iss": f"https://{AUTH0_DOMAIN}/",
+            "exp": int(time.time()) + 3600
+        }
+        return jwt.encode(claims, self.private_pem, algorithm="RS256", headers={"kid": "bench"})
+
+async def run_size(
+    client: httpx.AsyncClient,
+    simulator_config: SimulatorConfig,
+    jwks: JWKSResponder,
+    size: Tuple[int, int],
+    args: argparse.Namespace
+) -> List[Dict[str, Any]]:
+    playlists, tracks_per_playlist = size
+    # The simulator reads its config per request, so each size gets a fresh library
+    simulator_config.playlists = playlists
+    simulator_config.tracks_per_playlist = tracks_per_playlist
+    simulator_config.seed += 1
+    await reset_state()
+
+    # Tokens shaped sim.<user>.<anything> belong to that simulated user
+    token = f"sim.0.bench{simulator_config.seed}"
+    results = []
+
+    async def list_playlists(refresh: bool) -> bool:
+        response = await client.get(
+            "/api/playlists/oauth",
+            params={"access_token": token, "refresh": str(refresh).lower()}
+        )
+        return response.status_code == 200 and len(response.json()) == playlists
+
+    async def cold_listing(i: int) -> bool:
+        await reset_state()
+        return await list_playlists(True)
+
+    # Cold runs reset state, so they run one at a time
+    results.append(await measure("listing_cold", size, cold_listing, args.cold_repeat, 1))
+    results.append(await measure(
+        "listing_cached", size, lambda i: list_playlists(False), args.requests, args.concurrency
+    ))
+
+    listing = (await client.get("/api/playlists/oauth", params={"access_token": token})).json()
+    sample = [playlist["spotify_id"] for playlist in listing[:args.sample]]
+
+    async def fetch_tracks(i: int) -> bool:
+        response = await client.get(f"/api/playlists/{sample[i]}/tracks")
+        return response.status_code == 200 and bool(response.json()["tracks"])
+
+    async def read_tracks(i: int) -> bool:
+        response = await client.get(f"/api/playlists/{sample[i % len(sample)]}/tracks")
+        return response.status_code == 200
+
+    async def fetch_features(i: int) -> bool:
+        result = await fetch_audio_features_task(sample[i])
+        return bool(result and result["tracks_updated"])
+
+    async def analyze(i: int) -> bool:
+        return bool(await analyze_playlist_task(sample[i]))
+
+    tokens = [jwks.token(f"auth0|bench{i}") for i in range(16)]
+
+    async def verify(i: int) -> bool:
+        user = await verify_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens[i % len(tokens)]))
+        return user.user_id.startswith("auth0|")
+
+    results.append(await measure("track_fetch", size, fetch_tracks, len(sample), args.concurrency))
+    results.append(await measure("track_read_cached", size, read_tracks, args.requests, args.concurrency))
+    results.append(await measure("audio_features", size, fetch_features, len(sample), args.concurrency))
+    results.append(await measure("analysis", size, analyze, len(sample), args.concurrency))
+    results.append(await measure("token_verify", size, verify, args.requests, args.concurrency))
+    return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline_path: str, current_path: str):
+    """Print per-scenario ratios between two result files (>1.0 means current is slower)"""
+    def load(path: str) -> Dict[Tuple, Dict[str, Any]]:
+        with open(path) as f:
+            return {(r["scenario"], r["playlists"], r["tracks_per_playlist"]): r for r in json.load(f)["results"]}
+
+    baseline, current = load(baseline_path), load(current_path)
+    print(f"{'scenario':<18}{'size':>14}{'p50':>9}{'p99':>9}{'tput':>9}{'rss':>9}")
+    for key in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[key], current[key]
+
+        def ratio(field: str, inverse: bool = False) -> str:
+            if not before.get(field) or not after.get(field):
+                return "-"
+            value = before[field] / after[field] if inverse else after[field] / before[field]
+            return f"{value:.2f}x"
+
+        print(
+            f"{key[0]:<18}{f'{key[1]}x{key[2]}':>14}{ratio('p50_ms'):>9}{ratio('p99_ms'):>9}"
+            f"{ratio('throughput_per_second', inverse=True):>9}{ratio('peak_rss_mb'):>9}"
+        )
+
+def parse_sizes(text: str) -> List[Tuple[int, int]]:
+    sizes = []
+    for part in text.split(","):
+        playlists, tracks = part.lower().split("x")
+        sizes.append((int(playlists), int(tracks)))
+    return sizes
+
+async def main(args: argparse.Namespace):
+    check_bench_database(os.environ["MONGODB_DATABASE"])
+    simulator_config = SimulatorConfig(
+        latency_ms=args.spotify_latency_ms,
+        jitter_ms=args.spotify_jitter_ms,
+        error_rate=args.spotify_error_rate,
+        retry_after=0
+    )
+    jwks = JWKSResponder()
+    spotify_oauth_service.transport = httpx.ASGITransport(app=create_simulator(simulator_config))
+    jwks_cache.transport = httpx.MockTransport(jwks.handler)
+
+    results = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            print(f"{'scenario':<18}{'size':>14}{'ops':>7}{'errors':>7}{'ops/s':>11}{'p50 ms':>11}{'p99 ms':>11}{'rss MB':>10}")
+            for size in parse_sizes(args.sizes):
+                results.extend(await run_size(client, simulator_config, jwks, size, args))
+        await reset_state()
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args)
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10x100,100x100,1000x100", help="playlists x mean tracks per playlist")
+    parser.add_argument("--requests", type=int, default=200, help="operations for the cached and auth scenarios")
+    parser.add_argument("--cold-repeat", type=int, default=3)
+    parser.add_argument("--sample", type=int, default=20, help="playlists used for track, feature and analysis runs")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--spotify-latency-ms", type=float, default=0.0)
+    parser.add_argument("--spotify-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--spotify-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=f"benchmarks/results/e2e-{datetime.now():%Y%m%d-%H%M%S}.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        asyncio.run(main(args))
@@ -0,0 +1,110 @@
+"""
+Event Loop Latency Benchmark
+p50/p95/p99 latency of an unrelated endpoint while playlist analyses run:
+inline on the event loop, with only the statistics in the compute pool
+(columns packed on the loop), and with packing and statistics both pooled
+
+Run from backend/: python -m benchmarks.bench_loop_latency --tracks 50000 --analyses 16
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from app.main import app
+from app.services.analysis import analyze_columns, analyze_track_documents, build_track_columns
+from app.services.compute_pool import compute_pool
+from benchmarks.bench_analysis import make_tracks
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> List[float]:
+    """
+    Hit a cheap endpoint on a fixed schedule. Latency is measured from when
+    each request was due, not when it was sent, so time the event loop spent
+    blocked counts against the request instead of silently delaying it.
+    """
+    latencies = []
+    due = time.perf_counter()
+    while not stop.is_set():
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        response = await client.get("/api/test")
+        response.raise_for_status()
+        now = time.perf_counter()
+        latencies.append(now - due)
+        # Requests that fell behind are issued back to back, as a steady client would have
+        due += interval
+    return latencies
+
+# How each scenario analyzes one playlist's stored track documents
+MODES = ("inline", "pool_columns", "pool_documents")
+
+async def run_scenario(
+    tracks: List[Dict[str, Any]],
+    analyses: int,
+    concurrency: int,
+    mode: str,
+    interval: float
+) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze():
+        async with semaphore:
+            if mode == "pool_documents":
+                await compute_pool.run(analyze_track_documents, tracks)
+            elif mode == "pool_columns":
+                await compute_pool.run(analyze_columns, build_track_columns(tracks))
+            else:
+                analyze_columns(build_track_columns(tracks))
+                await asyncio.sleep(0)
+
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        prober = asyncio.create_task(probe(client, stop, interval))
+        start = time.perf_counter()
+        await asyncio.gather(*(analyze() for _ in range(analyses)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        latencies = np.array(await prober) * 1000
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "analyses_per_second": analyses / elapsed
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=50_000)
+    parser.add_argument("--analyses", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--probe-interval", type=float, default=0.005)
+    args = parser.parse_args()
+
+    tracks = make_tracks(args.tracks)
+    await compute_pool.start()
+    try:
+        results = {
+            mode: await run_scenario(tracks, args.analyses, args.concurrency, mode, args.probe_interval)
+            for mode in MODES
+        }
+    finally:
+        await compute_pool.close()
+
+    print(f"tracks per analysis: {args.tracks}, analyses: {args.analyses}, pool workers: {compute_pool.workers}")
+    print(f"{'mode':<16}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'analyses/s':>12}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<16}{result['requests']:>10}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+            f"{result['p99_ms']:>10.1f}{result['max_ms']:>10.1f}{result['analyses_per_second']:>12.1f}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Response Serialization Benchmark
+Compares FastAPI's default dict + jsonable_encoder path with ModelResponse
+and the streamed track body on a large track listing
+
+Run from backend/: python -m benchmarks.bench_serialization --tracks 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.playlists import json_track_body, list_page
+from app.core.responses import ModelResponse
+from app.models.playlist import Track
+from benchmarks.bench_analysis import make_tracks
+
+def legacy_response(tracks: List[Track], fetched_at: datetime) -> bytes:
+    """How get_playlist_tracks rendered a listing before: per-track dicts, then FastAPI's encoder"""
+    content = {
+        "playlist_id": "bench",
+        "tracks": [track.dict() for track in tracks],
+        "total_tracks": len(tracks),
+        "offset": 0,
+        "fetched_at": fetched_at
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+def model_response(tracks: List[Track], fetched_at: datetime) -> bytes:
+    """The same document rendered in one pass by pydantic-core"""
+    content = {
+        "playlist_id": "bench",
+        "tracks": tracks,
+        "total_tracks": len(tracks),
+        "offset": 0,
+        "fetched_at": fetched_at
+    }
+    return ModelResponse(content).body
+
+async def collect(body) -> bytes:
+    return b"".join([chunk async for chunk in body])
+
+def streamed_response(tracks: List[Track], fetched_at: datetime) -> bytes:
+    """The streamed body get_playlist_tracks now sends, joined back together"""
+    header = {"playlist_id": "bench", "total_tracks": len(tracks), "offset": 0, "after": None, "fetched_at": fetched_at}
+    return asyncio.run(collect(json_track_body(header, list_page(tracks, None, 0, None), None)))
+
+def timed(fn, *args, repeat: int = 5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tracks = [Track(**doc) for doc in make_tracks(args.tracks)]
+    fetched_at = datetime.now()
+
+    results: Dict[str, Any] = {}
+    for name, fn in (("legacy", legacy_response), ("model_response", model_response), ("streamed", streamed_response)):
+        results[name] = timed(fn, tracks, fetched_at, repeat=args.repeat)
+
+    # All three must describe the same document
+    legacy = json.loads(results["legacy"][1])
+    assert json.loads(results["model_response"][1]) == legacy
+    streamed = json.loads(results["streamed"][1])
+    assert streamed["tracks"] == legacy["tracks"]
+
+    legacy_seconds = results["legacy"][0]
+    print(f"tracks: {args.tracks}, body: {len(results['legacy'][1]) / 1e6:.1f} MB")
+    print(f"{'path':<16}{'ms':>10}{'speedup':>10}")
+    for name, (seconds, _) in results.items():
+        print(f"{name:<16}{seconds * 1000:>10.1f}{legacy_seconds / seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
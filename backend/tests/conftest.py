@@ -0,0 +1,22 @@
+"""
+Test Fixtures
+In-memory MongoDB for tests of the Mongo-backed services
+"""
+import asyncio
+
+import pytest
+from beanie import init_beanie
+
+from app.core.database import DOCUMENT_MODELS, db
+
+@pytest.fixture
+def mongo():
+    """Fresh mongomock database with every document model initialized"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    client = mongomock_motor.AsyncMongoMockClient()
+    db.client = client
+    db.database = client.get_database("spotify_analyzer_test")
+    asyncio.run(init_beanie(database=db.database, document_models=DOCUMENT_MODELS))
+    yield db.database
+    db.client = None
+    db.database = None
@@ -0,0 +1,100 @@
+"""
+Analysis Tests
+Merging and removing running statistics must match recomputing from the tracks
+"""
+import random
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+
+from app.models.playlist import RunningStats
+from app.services.analysis import (
+    FEATURE_COLUMNS,
+    build_track_columns,
+    compute_running_stats,
+    merge_running_stats,
+    remove_running_stats,
+    summarize_running_stats
+)
+
+def make_tracks(count: int, seed: int, prefix: str) -> List[Dict[str, Any]]:
+    """Stored-layout tracks; every fifth one has no audio features"""
+    rng = random.Random(seed)
+    artists = [{"id": f"artist{i}", "name": f"Artist {i}"} for i in range(8)]
+    tracks = []
+    for i in range(count):
+        features = None
+        if i % 5:
+            features = {name: rng.random() for name in FEATURE_COLUMNS}
+            features.update(loudness=rng.uniform(-60.0, 0.0), tempo=rng.uniform(60.0, 200.0))
+            features.update(key=rng.randint(-1, 11), mode=rng.randint(0, 1), time_signature=rng.randint(3, 7))
+        tracks.append({
+            "spotify_id": f"{prefix}{i}",
+            "artists": rng.sample(artists, k=rng.randint(1, 3)),
+            "duration_ms": rng.randint(90_000, 400_000),
+            "popularity": rng.randint(0, 100),
+            "audio_features": features
+        })
+    return tracks
+
+def stats_for(tracks: List[Dict[str, Any]]) -> RunningStats:
+    return compute_running_stats(build_track_columns(tracks))
+
+def assert_stats_equal(actual: RunningStats, expected: RunningStats):
+    assert actual.total_tracks == expected.total_tracks
+    assert actual.total_duration_ms == expected.total_duration_ms
+    assert actual.popularity_sum == pytest.approx(expected.popularity_sum)
+    for name in FEATURE_COLUMNS:
+        got, want = actual.features[name], expected.features[name]
+        assert got.count == want.count
+        assert got.sum == pytest.approx(want.sum, rel=1e-9)
+        assert got.m2 == pytest.approx(want.m2, rel=1e-6, abs=1e-6)
+    assert actual.key_histogram == expected.key_histogram
+    assert actual.mode_histogram == expected.mode_histogram
+    assert actual.time_signature_histogram == expected.time_signature_histogram
+    assert actual.artist_counts == expected.artist_counts
+
+@pytest.fixture
+def playlists():
+    return make_tracks(120, seed=1, prefix="a"), make_tracks(45, seed=2, prefix="b"), make_tracks(7, seed=3, prefix="c")
+
+def test_merge_equals_recompute(playlists):
+    a, b, c = playlists
+    merged = merge_running_stats(merge_running_stats(stats_for(a), stats_for(b)), stats_for(c))
+    assert_stats_equal(merged, stats_for(a + b + c))
+
+def test_merge_is_order_independent(playlists):
+    a, b, c = playlists
+    left = merge_running_stats(merge_running_stats(stats_for(a), stats_for(b)), stats_for(c))
+    right = merge_running_stats(stats_for(c), merge_running_stats(stats_for(b), stats_for(a)))
+    assert_stats_equal(left, right)
+
+def test_merge_then_remove_equals_recompute(playlists):
+    a, b, c = playlists
+    total = merge_running_stats(merge_running_stats(stats_for(a), stats_for(b)), stats_for(c))
+    assert_stats_equal(remove_running_stats(total, stats_for(b)), stats_for(a + c))
+
+def test_removing_everything_leaves_empty_stats(playlists):
+    a, b, _ = playlists
+    total = merge_running_stats(stats_for(a), stats_for(b))
+    remainder = remove_running_stats(remove_running_stats(total, stats_for(a)), stats_for(b))
+    assert remainder.total_tracks == 0
+    assert all(moments.count == 0 and moments.m2 == 0.0 for moments in remainder.features.values())
+    assert remainder.artist_counts == []
+    assert summarize_running_stats(remainder)["features"] == {}
+
+def test_merge_with_empty_stats_is_identity(playlists):
+    a, _, _ = playlists
+    assert_stats_equal(merge_running_stats(RunningStats(), stats_for(a)), stats_for(a))
+    assert_stats_equal(merge_running_stats(stats_for(a), RunningStats()), stats_for(a))
+
+def test_summary_matches_numpy_over_all_tracks(playlists):
+    a, b, c = playlists
+    merged = merge_running_stats(merge_running_stats(stats_for(a), stats_for(b)), stats_for(c))
+    summary = summarize_running_stats(merged)
+    features = build_track_columns(a + b + c).features.astype(np.float64)
+    assert summary["tracks_with_features"] == features.shape[0]
+    for column, name in enumerate(FEATURE_COLUMNS):
+        assert summary["features"][name]["mean"] == pytest.approx(features[:, column].mean(), rel=1e-9)
+        assert summary["features"][name]["variance"] == pytest.approx(features[:, column].var(), rel=1e-6)
@@ -0,0 +1,139 @@
+"""
+Auth Tests
+JWKS cache fetch collapsing, unknown-kid refetch limits and Cache-Control max-age handling
+"""
+import asyncio
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+
+from app.core.auth import JWKSCache
+
+def make_jwk(kid: str) -> Dict[str, Any]:
+    """Public RSA signing key in JWKS form"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return {**jwk.construct(public_pem, algorithm="RS256").to_dict(), "kid": kid, "use": "sig", "alg": "RS256"}
+
+@pytest.fixture(scope="module")
+def signing_keys() -> Dict[str, Dict[str, Any]]:
+    return {kid: make_jwk(kid) for kid in ("old", "new")}
+
+class JWKSEndpoint:
+    """In-process JWKS endpoint that counts requests and serves whatever keys it currently holds"""
+
+    def __init__(self, keys: List[Dict[str, Any]], cache_control: str = "max-age=3600", delay: float = 0.0):
+        self.keys = keys
+        self.cache_control = cache_control
+        self.delay = delay
+        self.requests = 0
+        self.fail = False
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            return httpx.Response(503)
+        headers = {"Cache-Control": self.cache_control} if self.cache_control else {}
+        return httpx.Response(200, json={"keys": self.keys}, headers=headers)
+
+def make_cache(endpoint: JWKSEndpoint, **overrides) -> JWKSCache:
+    cache = JWKSCache(**{"ttl": 600.0, "refresh_margin": 60.0, "min_refetch_interval": 30.0, **overrides})
+    cache.transport = httpx.MockTransport(endpoint.handler)
+    return cache
+
+def test_concurrent_lookups_share_one_fetch(signing_keys):
+    endpoint = JWKSEndpoint([signing_keys["old"]], delay=0.05)
+    cache = make_cache(endpoint)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(cache.get_key("old") for _ in range(20)))
+        finally:
+            await cache.close()
+
+    keys = asyncio.run(run())
+    assert all(key is not None for key in keys)
+    assert endpoint.requests == 1
+    assert cache.fetches == 1
+
+def test_unknown_kid_refetch_is_rate_limited(signing_keys):
+    endpoint = JWKSEndpoint([signing_keys["old"]])
+    cache = make_cache(endpoint)
+
+    async def run():
+        try:
+            await cache.get_key("old")
+            # Unknown kids right after a fetch must not hit the endpoint again
+            missing = [await cache.get_key("forged") for _ in range(5)]
+            return missing, endpoint.requests
+        finally:
+            await cache.close()
+
+    missing, requests = asyncio.run(run())
+    assert missing == [None] * 5
+    assert requests == 1
+
+def test_unknown_kid_refetches_rotated_key_once_interval_passed(signing_keys):
+    endpoint = JWKSEndpoint([signing_keys["old"]])
+    cache = make_cache(endpoint, min_refetch_interval=0.05)
+
+    async def run():
+        try:
+            await cache.get_key("old")
+            endpoint.keys = [signing_keys["old"], signing_keys["new"]]
+            before_interval = await cache.get_key("new")
+            await asyncio.sleep(0.06)
+            after_interval = await cache.get_key("new")
+            return before_interval, after_interval
+        finally:
+            await cache.close()
+
+    before_interval, after_interval = asyncio.run(run())
+    assert before_interval is None
+    assert after_interval is not None
+    assert endpoint.requests == 2
+
+@pytest.mark.parametrize("cache_control, expected_ttl", [
+    ("public, max-age=120", 120.0),
+    ("", 600.0),
+    ("max-age=1", 30.0)
+])
+def test_expiry_follows_max_age(signing_keys, cache_control, expected_ttl):
+    endpoint = JWKSEndpoint([signing_keys["old"]], cache_control=cache_control)
+    cache = make_cache(endpoint)
+
+    async def run():
+        try:
+            await cache.refresh()
+            return cache.get_stats()
+        finally:
+            await cache.close()
+
+    stats = asyncio.run(run())
+    assert expected_ttl - 1 < stats["expires_in_seconds"] <= expected_ttl
+
+def test_expired_keys_are_refetched_and_kept_when_fetch_fails(signing_keys):
+    endpoint = JWKSEndpoint([signing_keys["old"]], cache_control="max-age=0")
+    cache = make_cache(endpoint, min_refetch_interval=0.05)
+
+    async def run():
+        try:
+            await cache.get_key("old")
+            await asyncio.sleep(0.06)
+            endpoint.fail = True
+            return await cache.get_key("old")
+        finally:
+            await cache.close()
+
+    key = asyncio.run(run())
+    assert key is not None
+    assert endpoint.requests == 2
+    assert cache.fetch_errors == 1
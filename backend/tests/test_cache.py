@@ -0,0 +1,46 @@
+"""
+Cache Tests
+Eviction order and counters of the in-process LRU cache
+"""
+from app.core.cache import LRUCache
+
+def test_evicts_least_recently_used_when_full():
+    cache = LRUCache(maxsize=3)
+    cache.put_many({"a": 1, "b": 2, "c": 3})
+    cache.put("d", 4)
+    assert "a" not in cache
+    assert [key for key in ("b", "c", "d") if key in cache] == ["b", "c", "d"]
+    assert len(cache) == 3
+
+def test_get_refreshes_recency():
+    cache = LRUCache(maxsize=3)
+    cache.put_many({"a": 1, "b": 2, "c": 3})
+    assert cache.get("a") == 1
+    cache.put("d", 4)
+    assert "a" in cache
+    assert "b" not in cache
+
+def test_put_existing_key_updates_value_and_recency():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10
+    assert "b" not in cache
+
+def test_get_many_counts_hits_and_misses():
+    cache = LRUCache(maxsize=10)
+    cache.put_many({"a": 1, "b": None})
+    assert cache.get_many(["a", "b", "x"]) == {"a": 1, "b": None}
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_ratio"] == round(2 / 3, 4)
+
+def test_get_many_refreshes_recency_in_request_order():
+    cache = LRUCache(maxsize=3)
+    cache.put_many({"a": 1, "b": 2, "c": 3})
+    cache.get_many(["b", "a"])
+    cache.put("d", 4)
+    assert "c" not in cache
+    assert all(key in cache for key in ("a", "b", "d"))
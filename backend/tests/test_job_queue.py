@@ -0,0 +1,200 @@
+"""
+Job Queue Tests
+Idempotent enqueue, leases, retry backoff, release on cancel and lease renewal
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from loguru import logger
+
+from app.models.job import Job, JobStatus, JobType
+from app.services.job_queue import JobQueue
+from app.services.rate_limiter import SpotifyRateLimitError
+
+def make_queue(**overrides) -> JobQueue:
+    """A queue without workers; tests drive _claim and _run directly"""
+    queue = JobQueue()
+    queue.worker_id = "worker-a"
+    queue.retry_backoff = 0.0
+    queue.max_attempts = 3
+    for name, value in overrides.items():
+        setattr(queue, name, value)
+    return queue
+
+async def claim_and_run(queue: JobQueue) -> Job:
+    job = await queue._claim()
+    assert job is not None
+    await queue._run(job)
+    return await Job.get(job.id)
+
+def test_enqueue_dedupes_by_playlist_snapshot(mongo):
+    queue = make_queue()
+
+    async def run():
+        first = await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s1", payload={"user_id": "u1"})
+        again = await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s1")
+        new_snapshot = await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s2")
+        other_type = await queue.enqueue(JobType.FETCH_AUDIO_FEATURES, "p1", "s1")
+        return first, again, new_snapshot, other_type, await Job.find_all().count()
+
+    first, again, new_snapshot, other_type, count = asyncio.run(run())
+    assert again.id == first.id
+    assert new_snapshot.id != first.id
+    assert other_type.id != first.id
+    assert count == 3
+
+def test_finished_job_frees_its_key_and_drops_its_payload(mongo):
+    queue = make_queue()
+
+    async def handler(job):
+        return {"ok": True}
+
+    queue.register(JobType.ANALYZE_PLAYLIST, handler)
+
+    async def run():
+        first = await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s1", payload={"user_id": "u1"})
+        finished = await claim_and_run(queue)
+        raw = await Job.get_motor_collection().find_one({"_id": first.id})
+        second = await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s1")
+        return first, finished, raw, second
+
+    first, finished, raw, second = asyncio.run(run())
+    assert finished.status == JobStatus.COMPLETED
+    assert finished.result == {"ok": True}
+    assert not finished.active
+    assert "payload" not in raw and "idempotency_key" not in raw
+    assert second.id != first.id
+
+def test_failed_attempt_is_retried_then_completes(mongo):
+    queue = make_queue()
+    calls = []
+
+    async def handler(job):
+        calls.append(job.attempts)
+        if len(calls) == 1:
+            raise RuntimeError("Spotify hiccup")
+        return {"attempt": job.attempts}
+
+    queue.register(JobType.FETCH_AUDIO_FEATURES, handler)
+
+    async def run():
+        await queue.enqueue(JobType.FETCH_AUDIO_FEATURES, "p1", "s1")
+        retried = await claim_and_run(queue)
+        completed = await claim_and_run(queue)
+        return retried, completed
+
+    retried, completed = asyncio.run(run())
+    assert (retried.status, retried.active, retried.attempts) == (JobStatus.QUEUED, True, 1)
+    assert retried.last_error == "Spotify hiccup"
+    assert retried.locked_by is None
+    assert completed.status == JobStatus.COMPLETED
+    assert completed.result == {"attempt": 2}
+    assert calls == [1, 2]
+    assert (queue.retried_total, queue.completed_total) == (1, 1)
+
+def test_rate_limited_job_waits_for_retry_after(mongo):
+    queue = make_queue(retry_backoff=1000.0)
+
+    async def handler(job):
+        raise SpotifyRateLimitError(retry_after=30)
+
+    queue.register(JobType.FETCH_AUDIO_FEATURES, handler)
+
+    async def run():
+        await queue.enqueue(JobType.FETCH_AUDIO_FEATURES, "p1", "s1")
+        before = datetime.now()
+        job = await claim_and_run(queue)
+        return before, job, await queue._claim()
+
+    before, job, claimable = asyncio.run(run())
+    assert job.status == JobStatus.QUEUED
+    assert before + timedelta(seconds=29) <= job.run_after <= datetime.now() + timedelta(seconds=31)
+    assert claimable is None
+
+def test_job_fails_after_max_attempts(mongo):
+    queue = make_queue(max_attempts=2)
+
+    async def handler(job):
+        raise RuntimeError("broken playlist")
+
+    queue.register(JobType.ANALYZE_PLAYLIST, handler)
+
+    async def run():
+        await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s1")
+        await claim_and_run(queue)
+        return await claim_and_run(queue)
+
+    job = asyncio.run(run())
+    assert (job.status, job.active, job.attempts) == (JobStatus.FAILED, False, 2)
+    assert job.last_error == "broken playlist"
+    assert queue.failed_total == 1
+
+def test_expired_lease_is_claimed_and_live_lease_is_not(mongo):
+    queue = make_queue()
+
+    async def run():
+        live = await queue.enqueue(JobType.ANALYZE_PLAYLIST, "live", "s1")
+        expired = await queue.enqueue(JobType.ANALYZE_PLAYLIST, "expired", "s1")
+        collection = Job.get_motor_collection()
+        for job, locked_until in ((live, datetime.now() + timedelta(minutes=5)), (expired, datetime.now() - timedelta(seconds=1))):
+            await collection.update_one(
+                {"_id": job.id},
+                {"$set": {"status": JobStatus.RUNNING.value, "locked_by": "worker-b", "locked_until": locked_until, "attempts": 1}}
+            )
+        return await queue._claim(), await queue._claim()
+
+    claimed, nothing = asyncio.run(run())
+    assert claimed.playlist_id == "expired"
+    assert (claimed.locked_by, claimed.attempts) == ("worker-a", 2)
+    assert nothing is None
+
+def test_cancelled_job_is_released_without_charging_an_attempt(mongo):
+    queue = make_queue()
+
+    async def handler(job):
+        await asyncio.sleep(10)
+
+    queue.register(JobType.ANALYZE_PLAYLIST, handler)
+
+    async def run():
+        await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s1")
+        job = await queue._claim()
+        task = asyncio.create_task(queue._run(job))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await Job.get(job.id)
+
+    job = asyncio.run(run())
+    assert (job.status, job.active, job.attempts) == (JobStatus.QUEUED, True, 0)
+    assert job.locked_by is None
+
+def test_heartbeat_renews_lease_and_logs_when_it_is_lost(mongo):
+    queue = make_queue(lease_seconds=0.09)
+    errors = []
+    renewed_until = []
+    sink = logger.add(lambda message: errors.append(message.record["message"]), level="ERROR")
+
+    async def handler(job):
+        await asyncio.sleep(0.05)
+        renewed_until.append((await Job.get(job.id)).locked_until)
+        # Another worker takes the job over, so the next renewal must notice
+        await Job.get_motor_collection().update_one({"_id": job.id}, {"$set": {"locked_by": "worker-b"}})
+        await asyncio.sleep(0.05)
+
+    queue.register(JobType.ANALYZE_PLAYLIST, handler)
+
+    async def run():
+        await queue.enqueue(JobType.ANALYZE_PLAYLIST, "p1", "s1")
+        job = await queue._claim()
+        await queue._run(job)
+        return job
+
+    try:
+        job = asyncio.run(run())
+    finally:
+        logger.remove(sink)
+    assert renewed_until[0] > job.locked_until
+    assert any(f"Lost lease of analyze_playlist job {job.id}" in message for message in errors)
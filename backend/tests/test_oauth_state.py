@@ -0,0 +1,94 @@
+"""
+OAuth State Store Tests
+Single use and expiry of pending OAuth states in the memory and Mongo backends
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.playlist import OAuthState
+from app.services.oauth_state import MemoryOAuthStateStore, MongoOAuthStateStore, create_oauth_state_store
+
+DATA = {"user_id": "auth0|user1", "redirect": "/playlists"}
+
+@pytest.fixture(params=["memory", "mongo"])
+def store(request):
+    if request.param == "mongo":
+        request.getfixturevalue("mongo")
+        return MongoOAuthStateStore()
+    return MemoryOAuthStateStore()
+
+def test_state_is_consumed_exactly_once(store):
+    async def run():
+        await store.put("s1", DATA, ttl=60)
+        return await store.consume("s1"), await store.consume("s1")
+
+    first, second = asyncio.run(run())
+    assert first == DATA
+    assert second is None
+
+def test_unknown_state_is_rejected(store):
+    assert asyncio.run(store.consume("never-issued")) is None
+
+def test_expired_state_is_rejected(store):
+    async def run():
+        await store.put("s1", DATA, ttl=0.05)
+        await asyncio.sleep(0.1)
+        return await store.consume("s1")
+
+    assert asyncio.run(run()) is None
+
+def test_concurrent_consumes_hand_out_one_state(store):
+    async def run():
+        await store.put("s1", DATA, ttl=60)
+        return await asyncio.gather(*(store.consume("s1") for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert results.count(DATA) == 1
+    assert results.count(None) == 9
+
+def test_memory_store_expires_only_due_states():
+    store = MemoryOAuthStateStore()
+
+    async def run():
+        await store.put("short", DATA, ttl=0.05)
+        await store.put("long", DATA, ttl=60)
+        await asyncio.sleep(0.1)
+        # Any later call pops the due deadline without touching the live state
+        await store.put("other", DATA, ttl=60)
+        return store.get_stats(), await store.consume("long")
+
+    stats, long_lived = asyncio.run(run())
+    assert stats == {"backend": "memory", "pending": 2, "expired_total": 1}
+    assert long_lived == DATA
+
+def test_memory_store_re_put_replaces_the_deadline():
+    store = MemoryOAuthStateStore()
+
+    async def run():
+        await store.put("s1", {"attempt": 1}, ttl=0.05)
+        await store.put("s1", {"attempt": 2}, ttl=60)
+        await asyncio.sleep(0.1)
+        return await store.consume("s1")
+
+    assert asyncio.run(run()) == {"attempt": 2}
+    assert store.expired_total == 0
+
+def test_mongo_store_sets_a_utc_ttl_deadline(mongo):
+    store = MongoOAuthStateStore()
+
+    async def run():
+        await store.put("s1", DATA, ttl=600)
+        return await OAuthState.find_one(OAuthState.state == "s1")
+
+    before = datetime.utcnow()
+    stored = asyncio.run(run())
+    assert stored.data == DATA
+    # The TTL monitor compares against UTC
+    assert before + timedelta(seconds=599) <= stored.expires_at <= datetime.utcnow() + timedelta(seconds=600)
+
+def test_backend_is_selected_by_name():
+    assert isinstance(create_oauth_state_store("memory"), MemoryOAuthStateStore)
+    assert isinstance(create_oauth_state_store("mongo"), MongoOAuthStateStore)
+    assert isinstance(create_oauth_state_store("redis"), MongoOAuthStateStore)
@@ -0,0 +1,73 @@
+"""
+Pagination Tests
+Offset stepping, ordering and failure reporting of the concurrent page fan-out
+"""
+import asyncio
+from typing import Set
+
+import pytest
+
+from app.services.pagination import fetch_all_pages
+from app.services.rate_limiter import SpotifyRateLimitError
+
+def fake_endpoint(total: int, max_limit: int, failing: Set[int] = frozenset(), report_limit: bool = True):
+    """Fetcher over items 0..total-1 that clamps the page size like Spotify, failing at the given offsets"""
+    calls = []
+
+    async def fetch_page(offset: int):
+        calls.append(offset)
+        if offset in failing:
+            raise RuntimeError(f"page {offset} failed")
+        page = {"items": list(range(offset, min(offset + max_limit, total))), "total": total}
+        if report_limit:
+            page["limit"] = max_limit
+        return page
+
+    return fetch_page, calls
+
+def test_fetches_every_page_in_order():
+    fetch_page, calls = fake_endpoint(total=250, max_limit=100)
+    result = asyncio.run(fetch_all_pages(fetch_page, page_size=100))
+    assert result.items == list(range(250))
+    assert sorted(calls) == [0, 100, 200]
+    assert result.complete
+
+def test_steps_by_the_server_clamped_limit():
+    fetch_page, calls = fake_endpoint(total=120, max_limit=20)
+    result = asyncio.run(fetch_all_pages(fetch_page, page_size=100))
+    assert result.items == list(range(120))
+    assert sorted(calls) == list(range(0, 120, 20))
+    assert result.complete
+
+def test_steps_by_items_returned_when_limit_is_filtered_out():
+    fetch_page, calls = fake_endpoint(total=75, max_limit=25, report_limit=False)
+    result = asyncio.run(fetch_all_pages(fetch_page, page_size=50))
+    assert result.items == list(range(75))
+    assert sorted(calls) == [0, 25, 50]
+
+def test_failed_page_is_reported_and_incomplete():
+    fetch_page, calls = fake_endpoint(total=300, max_limit=100, failing={100})
+    result = asyncio.run(fetch_all_pages(fetch_page, page_size=100, retries=1))
+    assert result.failed_offsets == [100]
+    assert result.items == list(range(100)) + list(range(200, 300))
+    assert calls.count(100) == 2
+    assert not result.complete
+
+def test_short_listing_is_incomplete():
+    async def fetch_page(offset: int):
+        # Claims more items than it ever returns
+        return {"items": [offset] if offset == 0 else [], "total": 3, "limit": 1}
+
+    result = asyncio.run(fetch_all_pages(fetch_page, page_size=1))
+    assert not result.failed_offsets
+    assert not result.complete
+
+def test_rate_limit_propagates():
+    async def fetch_page(offset: int):
+        if offset:
+            raise SpotifyRateLimitError(retry_after=offset)
+        return {"items": [0], "total": 3, "limit": 1}
+
+    with pytest.raises(SpotifyRateLimitError) as error:
+        asyncio.run(fetch_all_pages(fetch_page, page_size=1))
+    assert error.value.retry_after == 2
@@ -0,0 +1,21 @@
+"""
+Playlist Endpoint Tests
+Error statuses of the playlist endpoints survive their catch-all handlers
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.playlists import delete_playlist, get_playlist_analysis, get_playlist_details, get_playlist_tracks
+
+@pytest.mark.parametrize("call", [
+    lambda: get_playlist_tracks("missing", offset=0, after=None, limit=None, accept=None, if_none_match=None),
+    lambda: get_playlist_analysis("missing", if_none_match=None),
+    lambda: get_playlist_details("missing", if_none_match=None),
+    lambda: delete_playlist("missing")
+])
+def test_unknown_playlist_is_404(mongo, call):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(call())
+    assert error.value.status_code == 404
@@ -0,0 +1,35 @@
+"""
+Playlist ETag Tests
+Tags computed from a loaded playlist match the ones revalidations compute from the version projection
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.api.playlists import analysis_etag, load_playlist_version, playlist_etag, playlist_version, tracks_etag
+from app.models.playlist import AnalysisStatus, Playlist, PlaylistAnalysis
+
+@pytest.mark.parametrize("analysis", [None, PlaylistAnalysis(status=AnalysisStatus.COMPLETED)])
+def test_loaded_playlist_and_projection_give_the_same_etags(mongo, analysis):
+    async def run():
+        await Playlist(
+            spotify_id="p1",
+            user_id="user1",
+            name="Mix",
+            track_count=1,
+            owner={"id": "owner"},
+            snapshot_id="s1",
+            tracks_fetched=True,
+            tracks_snapshot_id="s1",
+            last_fetched_at=datetime.now(),
+            last_analyzed_at=datetime.now() if analysis else None,
+            analysis=analysis
+        ).insert()
+        return await Playlist.find_one({"spotify_id": "p1"}), await load_playlist_version("p1")
+
+    playlist, projected = asyncio.run(run())
+    loaded = playlist_version(playlist)
+    assert playlist_etag("p1", loaded) == playlist_etag("p1", projected)
+    assert analysis_etag("p1", loaded) == analysis_etag("p1", projected)
+    assert tracks_etag("p1", loaded, 0, None, 50, "application/json") == tracks_etag("p1", projected, 0, None, 50, "application/json")
@@ -0,0 +1,96 @@
+"""
+Playlist Sync Tests
+Bulk upsert of playlist listings and the track diff that keeps audio features
+"""
+import asyncio
+from typing import Any, Dict
+
+from app.models.playlist import AudioFeatures, Playlist, Track
+from app.services.playlist_sync import sync_user_playlists
+from app.services.track_sync import diff_tracks
+
+FEATURES = AudioFeatures(
+    acousticness=0.1, danceability=0.8, energy=0.7, instrumentalness=0.0, liveness=0.2, loudness=-6.0,
+    speechiness=0.05, valence=0.6, tempo=120.0, key=5, mode=1, time_signature=4, duration_ms=200000
+)
+
+def spotify_playlist(spotify_id: str, snapshot_id: str = "s1", name: str = "Mix") -> Dict[str, Any]:
+    """A playlist as SpotifyOAuthService.get_user_playlists formats it"""
+    return {
+        "spotify_id": spotify_id,
+        "name": name,
+        "description": "",
+        "track_count": 10,
+        "public": True,
+        "collaborative": False,
+        "owner": {"id": "owner", "display_name": "Owner"},
+        "images": [],
+        "external_urls": {},
+        "snapshot_id": snapshot_id
+    }
+
+def spotify_track(spotify_id: str) -> Dict[str, Any]:
+    """A track as SpotifyOAuthService.get_playlist_tracks formats it"""
+    return {
+        "spotify_id": spotify_id,
+        "name": f"Track {spotify_id}",
+        "artists": [{"id": "a1", "name": "Artist"}],
+        "album": {"id": "al1", "name": "Album", "release_date": "2020-01-01"},
+        "duration_ms": 200000,
+        "popularity": 50
+    }
+
+def test_sync_inserts_updates_and_skips_unchanged(mongo):
+    async def run():
+        await sync_user_playlists("user1", [
+            spotify_playlist("same"),
+            spotify_playlist("renamed"),
+            spotify_playlist("new_snapshot"),
+            spotify_playlist("new_snapshot_unfetched")
+        ])
+        await Playlist.get_motor_collection().update_many(
+            {"spotify_id": "new_snapshot"}, {"$set": {"tracks_fetched": True}}
+        )
+        before = await Playlist.find_one({"spotify_id": "same"})
+        result = await sync_user_playlists("user1", [
+            spotify_playlist("same"),
+            spotify_playlist("renamed", name="Renamed"),
+            spotify_playlist("new_snapshot", snapshot_id="s2"),
+            spotify_playlist("new_snapshot_unfetched", snapshot_id="s2"),
+            spotify_playlist("added")
+        ])
+        stored = {playlist.spotify_id: playlist async for playlist in Playlist.find_all()}
+        return result, stored, before
+
+    result, stored, before = asyncio.run(run())
+    assert (result.inserted, result.updated, result.unchanged) == (1, 3, 1)
+    # Only a changed snapshot with previously fetched tracks needs a track diff
+    assert result.tracks_to_refresh == ["new_snapshot"]
+    assert result.spotify_ids == ["same", "renamed", "new_snapshot", "new_snapshot_unfetched", "added"]
+    assert stored["renamed"].name == "Renamed"
+    assert stored["new_snapshot"].snapshot_id == "s2"
+    assert stored["added"].user_id == "user1"
+    assert stored["same"].updated_at == before.updated_at
+    assert stored["renamed"].updated_at > before.updated_at
+
+def test_sync_of_empty_listing_writes_nothing(mongo):
+    result = asyncio.run(sync_user_playlists("user1", []))
+    assert (result.inserted, result.updated, result.unchanged) == (0, 0, 0)
+    assert asyncio.run(Playlist.find_all().count()) == 0
+
+def test_diff_keeps_features_of_retained_tracks_in_spotify_order():
+    kept = Track(**spotify_track("kept"), audio_features=FEATURES)
+    removed = Track(**spotify_track("removed"), audio_features=FEATURES)
+    diff = diff_tracks([removed, kept], [spotify_track("new"), spotify_track("kept")])
+
+    assert [track.spotify_id for track in diff.tracks] == ["new", "kept"]
+    assert diff.tracks[1] is kept
+    assert diff.tracks[1].audio_features == FEATURES
+    assert diff.tracks[0].audio_features is None
+    assert (diff.added, diff.removed, diff.retained) == (1, 1, 1)
+
+def test_diff_of_identical_listing_retains_everything():
+    existing = [Track(**spotify_track(spotify_id)) for spotify_id in ("a", "b", "c")]
+    diff = diff_tracks(existing, [spotify_track(spotify_id) for spotify_id in ("a", "b", "c")])
+    assert diff.tracks == existing
+    assert (diff.added, diff.removed, diff.retained) == (0, 0, 3)
@@ -0,0 +1,122 @@
+"""
+Rate Limiter Tests
+Token-bucket refill and 429 Retry-After handling of the Spotify request scheduler
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.metrics import SPOTIFY_SCHEDULER_QUEUE_DEPTH, SPOTIFY_SCHEDULER_WAIT
+from app.services.rate_limiter import RequestScheduler, SpotifyRateLimitError, TokenBucket
+
+def make_scheduler(**overrides) -> RequestScheduler:
+    options = {
+        "credential_rate": 1000.0,
+        "credential_burst": 1000.0,
+        "user_rate": 1000.0,
+        "user_burst": 1000.0,
+        "max_retries": 3,
+        "base_backoff": 0.001,
+        "max_backoff": 0.001
+    }
+    options.update(overrides)
+    return RequestScheduler(**options)
+
+def responses(*responses: httpx.Response):
+    """send() callable returning the given responses in order, counting calls"""
+    remaining = list(responses)
+    calls = []
+
+    async def send() -> httpx.Response:
+        calls.append(asyncio.get_running_loop().time())
+        return remaining.pop(0)
+
+    return send, calls
+
+def test_bucket_allows_burst_then_refills_at_rate():
+    bucket = TokenBucket(rate=2.0, capacity=3.0, now=0.0)
+    for _ in range(3):
+        assert bucket.time_until_available(0.0) == 0.0
+        bucket.consume(0.0)
+    assert bucket.time_until_available(0.0) == pytest.approx(0.5)
+    assert bucket.time_until_available(0.25) == pytest.approx(0.25)
+    assert bucket.time_until_available(0.5) == 0.0
+
+def test_bucket_refill_is_capped_at_capacity():
+    bucket = TokenBucket(rate=10.0, capacity=2.0, now=0.0)
+    bucket.consume(0.0)
+    bucket.consume(0.0)
+    bucket.time_until_available(100.0)
+    assert bucket.tokens == 2.0
+
+def test_parse_retry_after_defaults_to_one_second():
+    assert RequestScheduler._parse_retry_after(httpx.Response(429)) == 1.0
+    assert RequestScheduler._parse_retry_after(httpx.Response(429, headers={"Retry-After": "soon"})) == 1.0
+    assert RequestScheduler._parse_retry_after(httpx.Response(429, headers={"Retry-After": "-3"})) == 0.0
+    assert RequestScheduler._parse_retry_after(httpx.Response(429, headers={"Retry-After": "2.5"})) == 2.5
+
+def test_429_waits_for_retry_after_then_succeeds():
+    async def run():
+        scheduler = make_scheduler()
+        send, calls = responses(httpx.Response(429, headers={"Retry-After": "0.1"}), httpx.Response(200))
+        try:
+            response = await scheduler.execute("client", "user", send)
+        finally:
+            await scheduler.close()
+        return scheduler, response, calls
+
+    scheduler, response, calls = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.1
+    assert scheduler.get_stats()["throttled_total"] == 1
+    assert scheduler.get_stats()["retries_total"] == 1
+
+def test_429_pauses_other_users_on_the_same_credential():
+    async def run():
+        scheduler = make_scheduler()
+        throttled, _ = responses(httpx.Response(429, headers={"Retry-After": "0.2"}), httpx.Response(200))
+        other, other_calls = responses(httpx.Response(200))
+        try:
+            first = asyncio.create_task(scheduler.execute("client", "user-a", throttled))
+            await asyncio.sleep(0.02)
+            start = asyncio.get_running_loop().time()
+            await scheduler.execute("client", "user-b", other)
+            await first
+        finally:
+            await scheduler.close()
+        return other_calls[0] - start
+
+    assert asyncio.run(run()) >= 0.15
+
+def test_persistent_429_raises_rate_limit_error_with_retry_after():
+    async def run():
+        scheduler = make_scheduler(max_retries=1)
+        send, calls = responses(*(httpx.Response(429, headers={"Retry-After": "0.01"}) for _ in range(2)))
+        try:
+            with pytest.raises(SpotifyRateLimitError) as error:
+                await scheduler.execute("client", "user", send)
+        finally:
+            await scheduler.close()
+        return scheduler, error.value, calls
+
+    scheduler, error, calls = asyncio.run(run())
+    assert error.retry_after == 0.01
+    assert len(calls) == 2
+    assert scheduler.get_stats()["rate_limit_errors"] == 1
+
+def test_collect_metrics_exports_queue_and_wait_gauges():
+    async def run():
+        scheduler = make_scheduler()
+        send, _ = responses(httpx.Response(200))
+        await scheduler.execute("client", "user", send)
+        await scheduler.collect_metrics()
+        await scheduler.close()
+
+    asyncio.run(run())
+    assert SPOTIFY_SCHEDULER_QUEUE_DEPTH.samples() == ["spotify_scheduler_queue_depth 0"]
+    assert [line.split(" ")[0] for line in SPOTIFY_SCHEDULER_WAIT.samples()] == [
+        'spotify_scheduler_wait_seconds{stat="avg"}',
+        'spotify_scheduler_wait_seconds{stat="max"}'
+    ]
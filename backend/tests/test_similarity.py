@@ -0,0 +1,51 @@
+"""
+Similarity Index Tests
+Workers sharing one on-disk index: version swaps are picked up, builds are serialized
+"""
+import asyncio
+
+import numpy as np
+
+from app.services.analysis import FEATURE_COLUMNS
+from app.services.similarity import SimilarityIndex, SimilarityService, _exclusive_lock
+
+def make_index(count: int, seed: int) -> SimilarityIndex:
+    rng = np.random.default_rng(seed)
+    features = rng.random((count, len(FEATURE_COLUMNS)), dtype=np.float32)
+    return SimilarityIndex.build([f"track{i}" for i in range(count)], features)
+
+def make_service(tmp_path) -> SimilarityService:
+    service = SimilarityService()
+    service.index_dir = str(tmp_path / "similarity_index")
+    return service
+
+def test_worker_reloads_index_swapped_in_by_another(tmp_path):
+    worker = make_service(tmp_path)
+
+    async def run():
+        assert not await worker.reload_if_changed()
+        make_index(50, seed=1).save(worker.index_dir)
+        assert await worker.reload_if_changed()
+        assert len(worker.index) == 50
+        assert not await worker.reload_if_changed()
+        make_index(80, seed=2).save(worker.index_dir)
+        assert await worker.reload_if_changed()
+        return worker.index
+
+    index = asyncio.run(run())
+    assert len(index) == 80
+    assert index.position_of("track79") is not None
+
+def test_rebuild_skips_while_another_worker_holds_the_lock(tmp_path):
+    worker = make_service(tmp_path)
+    with _exclusive_lock(worker.lock_path) as acquired:
+        assert acquired
+        assert asyncio.run(worker.rebuild()) == 0
+    assert worker.index is None
+
+def test_startup_build_is_skipped_once_an_index_exists(tmp_path):
+    worker = make_service(tmp_path)
+    make_index(20, seed=3).save(worker.index_dir)
+    # Runs without a database: an existing index must be opened, not rebuilt
+    assert asyncio.run(worker.rebuild(only_if_missing=True)) == 0
+    assert len(worker.index) == 20
@@ -0,0 +1,53 @@
+"""
+Split Playlist Tracks Migration Tests
+Embedded tracks move to playlist_tracks and stay current for their snapshot
+"""
+import asyncio
+
+from app.migrations.split_playlist_tracks import split_playlist_tracks
+from app.models.playlist import Playlist
+from app.services.track_store import load_tracks
+
+def legacy_playlist(spotify_id: str, tracks: list) -> dict:
+    """A playlist document as stored before tracks were split out"""
+    return {
+        "spotify_id": spotify_id,
+        "user_id": "user1",
+        "name": "Mix",
+        "description": "",
+        "track_count": len(tracks),
+        "public": True,
+        "collaborative": False,
+        "owner": {"id": "owner", "display_name": None},
+        "images": [],
+        "external_urls": {},
+        "snapshot_id": "s1",
+        "tracks": tracks,
+        "tracks_fetched": bool(tracks)
+    }
+
+def test_migrated_playlists_keep_their_snapshot_current(mongo):
+    track = {
+        "spotify_id": "t1",
+        "name": "Track",
+        "artists": [{"id": "a1", "name": "Artist"}],
+        "album": {"id": "al1", "name": "Album"},
+        "duration_ms": 200000,
+        "popularity": 50
+    }
+
+    async def run():
+        collection = Playlist.get_motor_collection()
+        await collection.insert_many([legacy_playlist("p1", [track]), legacy_playlist("p2", [])])
+        migrated = await split_playlist_tracks()
+        playlists = {playlist.spotify_id: playlist async for playlist in Playlist.find_all()}
+        raw = await collection.find_one({"spotify_id": "p1"})
+        return migrated, playlists, raw, await load_tracks("p1")
+
+    migrated, playlists, raw, tracks = asyncio.run(run())
+    assert migrated == 2
+    assert "tracks" not in raw
+    assert [stored.spotify_id for stored in tracks] == ["t1"]
+    assert playlists["p1"].tracks_snapshot_id == "s1"
+    assert not playlists["p1"].needs_refresh
+    assert playlists["p2"].tracks_snapshot_id is None
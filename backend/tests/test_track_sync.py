@@ -0,0 +1,129 @@
+"""
+Track Sync Tests
+Refresh job outcomes: empty playlists finish, failed fetches raise for a retry
+"""
+import asyncio
+
+import pytest
+
+from app.models.playlist import Playlist, User
+from app.services import track_sync
+from app.services.playlist_sync import sync_user_playlists
+from app.services.pagination import IncompleteListingError
+from app.services.spotify_service import SpotifyAuthorizationError, spotify_oauth_service
+from app.services.track_store import load_tracks
+
+def spotify_track(spotify_id: str) -> dict:
+    return {
+        "spotify_id": spotify_id,
+        "name": f"Track {spotify_id}",
+        "artists": [{"id": "a1", "name": "Artist"}],
+        "album": {"id": "al1", "name": "Album"},
+        "duration_ms": 200000,
+        "popularity": 50
+    }
+
+@pytest.fixture
+def user_token(monkeypatch):
+    """Jobs resolve the user's token themselves; tests record which user they asked for"""
+    users = []
+
+    async def get_user_access_token(spotify_user_id):
+        users.append(spotify_user_id)
+        return "token"
+
+    monkeypatch.setattr(spotify_oauth_service, "get_user_access_token", get_user_access_token)
+    return users
+
+def stale_playlist() -> Playlist:
+    return Playlist(
+        spotify_id="p1",
+        user_id="user1",
+        name="Mix",
+        track_count=1,
+        owner={"id": "owner"},
+        snapshot_id="s2",
+        tracks_fetched=True,
+        tracks_snapshot_id="s1"
+    )
+
+def test_refresh_of_empty_playlist_returns_none(mongo, monkeypatch, user_token):
+    async def get_playlist_tracks(playlist_id, access_token):
+        return []
+
+    monkeypatch.setattr(spotify_oauth_service, "get_playlist_tracks", get_playlist_tracks)
+
+    async def run():
+        await stale_playlist().insert()
+        return await track_sync.refresh_changed_playlist("p1")
+
+    assert asyncio.run(run()) is None
+
+def test_refresh_failure_propagates_and_keeps_playlist_stale(mongo, monkeypatch, user_token):
+    async def get_playlist_tracks(playlist_id, access_token):
+        raise IncompleteListingError("got 100 of 200 items, failed offsets: [100]")
+
+    monkeypatch.setattr(spotify_oauth_service, "get_playlist_tracks", get_playlist_tracks)
+
+    async def run():
+        await stale_playlist().insert()
+        with pytest.raises(IncompleteListingError):
+            await track_sync.refresh_changed_playlist("p1")
+        return await Playlist.find_one({"spotify_id": "p1"}), await load_tracks("p1")
+
+    playlist, tracks = asyncio.run(run())
+    assert playlist.needs_refresh
+    assert tracks == []
+
+def test_refresh_keeps_snapshot_set_by_a_concurrent_sync(mongo, monkeypatch, user_token):
+    async def get_playlist_tracks(playlist_id, access_token):
+        # The user's listing is synced while the tracks are being fetched
+        await sync_user_playlists("user1", [{
+            "spotify_id": "p1",
+            "name": "Mix",
+            "track_count": 1,
+            "owner": {"id": "owner"},
+            "snapshot_id": "s3"
+        }])
+        return [spotify_track("t1")]
+
+    monkeypatch.setattr(spotify_oauth_service, "get_playlist_tracks", get_playlist_tracks)
+
+    async def run():
+        await stale_playlist().insert()
+        result = await track_sync.refresh_changed_playlist("p1")
+        return result, await Playlist.find_one({"spotify_id": "p1"})
+
+    result, playlist = asyncio.run(run())
+    assert result == {"added": 1, "removed": 0, "retained": 0}
+    assert user_token == ["user1"]
+    assert playlist.snapshot_id == "s3"
+    assert playlist.tracks_snapshot_id == "s2"
+    assert playlist.needs_refresh
+
+def test_user_token_is_minted_from_the_stored_refresh_token(mongo, monkeypatch):
+    refreshed = []
+
+    async def refresh_access_token(refresh_token):
+        refreshed.append(refresh_token)
+        return {"access_token": "fresh", "refresh_token": "rotated", "expires_in": 3600}
+
+    monkeypatch.setattr(spotify_oauth_service, "refresh_access_token", refresh_access_token)
+    monkeypatch.setattr(spotify_oauth_service, "user_tokens", type(spotify_oauth_service.user_tokens)(maxsize=10, ttl=3600))
+
+    async def run():
+        await User(auth0_id="spotify_u2", email="u2@example.com", spotify_id="u2", spotify_refresh_token="stored").insert()
+        tokens = [
+            await spotify_oauth_service.get_user_access_token("u2"),
+            await spotify_oauth_service.get_user_access_token("u2")
+        ]
+        return tokens, await User.find_one({"spotify_id": "u2"})
+
+    tokens, user = asyncio.run(run())
+    assert tokens == ["fresh", "fresh"]
+    assert refreshed == ["stored"]
+    assert user.spotify_refresh_token == "rotated"
+
+def test_user_token_without_refresh_token_raises(mongo):
+    with pytest.raises(SpotifyAuthorizationError):
+        asyncio.run(spotify_oauth_service.get_user_access_token("unknown"))
@@ -0,0 +1,346 @@
+"""
+API Load Generator
+Replays user journeys against a running deployment at stepped arrival rates
+
+Each virtual user runs one journey: login, OAuth callback, list playlists,
+fetch a playlist's tracks, fetch its audio features, analyze it, wait for the
+analysis job and read the result. Journeys arrive as a Poisson process at each
+stage's rate, with at most --max-users in flight. Every stage reports latency
+percentiles and error rates per step, and is flagged as saturated when the
+server stops keeping up (arrivals shed at the user cap, completed journeys
+falling behind the offered rate, p99 over the SLO, errors, or p50 growing
+against the first stage).
+
+Start the simulator and point one uvicorn worker at it, then run from backend/:
+    python -m tools.spotify_simulator --users 1000 --playlists 20
+    SPOTIFY_API_BASE_URL=http://localhost:8765/v1 SPOTIFY_ACCOUNTS_BASE_URL=http://localhost:8765 \\
+        uvicorn app.main:app --port 8000 --workers 1
+    python -m tools.loadgen --rates 1,2,4,8,16 --stage-seconds 30 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import numpy as np
+
+# Journey steps in the order they run; job_wait and analysis_wait time the
+# background work, the others are single API requests (polls count per request)
+STEPS = (
+    "login",
+    "authorize",
+    "callback",
+    "list_playlists",
+    "fetch_tracks",
+    "fetch_features",
+    "poll_job",
+    "job_wait",
+    "analyze",
+    "poll_analysis",
+    "analysis_wait",
+    "get_analysis",
+    "journey"
+)
+
+@dataclass
+class LoadConfig:
+    """Target, traffic shape and saturation thresholds"""
+    base_url: str = "http://127.0.0.1:8000"
+    rates: List[float] = field(default_factory=lambda: [1.0, 2.0, 4.0, 8.0])  # journeys per second
+    stage_seconds: float = 30.0
+    max_users: int = 200  # concurrent journeys; arrivals beyond this are shed
+    think_ms: float = 0.0  # pause between steps
+    track_page_size: int = 100
+    poll_interval: float = 0.25
+    poll_timeout: float = 60.0
+    request_timeout: float = 30.0
+    drain_seconds: float = 60.0  # grace for in-flight journeys at the end of a stage
+    slo_p99_ms: float = 2000.0  # per API step
+    max_error_rate: float = 0.01
+    min_throughput_ratio: float = 0.9  # completed / offered journeys
+    max_latency_growth: float = 3.0  # p50 of list_playlists against the first stage
+    seed: int = 42
+    keep_going: bool = False  # run every stage even after saturation
+
+class StepFailed(Exception):
+    """A step returned an error, so the rest of the journey is skipped"""
+
+class StageStats:
+    """Latencies and failures of one stage, keyed by step"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, int] = defaultdict(int)
+        self.started = 0
+        self.completed = 0
+        self.shed = 0
+        self.elapsed = 0.0
+
+    def record(self, step: str, seconds: float, ok: bool):
+        self.latencies[step].append(seconds * 1000)
+        if not ok:
+            self.errors[step] += 1
+
+    def step_summary(self, step: str) -> Dict[str, Any]:
+        latencies = np.asarray(self.latencies[step])
+        count = len(latencies)
+        summary = {"count": count, "errors": self.errors[step], "error_rate": round(self.errors[step] / count, 4) if count else 0.0}
+        if count:
+            summary.update({
+                "rps": round(count / self.elapsed, 2) if self.elapsed else 0.0,
+                "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                "p90_ms": round(float(np.percentile(latencies, 90)), 2),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+                "max_ms": round(float(latencies.max()), 2)
+            })
+        return summary
+
+class JourneyRunner:
+    """Runs user journeys over one shared connection pool"""
+
+    def __init__(self, config: LoadConfig, client: httpx.AsyncClient, rng: random.Random):
+        self.config = config
+        self.client = client
+        self.rng = rng
+
+    async def request(self, stats: StageStats, step: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            stats.record(step, time.perf_counter() - start, False)
+            stats.statuses[type(e).__name__] += 1
+            raise StepFailed(f"{step}: {type(e).__name__}")
+        ok = response.status_code < 400
+        stats.record(step, time.perf_counter() - start, ok)
+        stats.statuses[str(response.status_code)] += 1
+        if not ok:
+            raise StepFailed(f"{step}: HTTP {response.status_code}")
+        return response
+
+    async def think(self):
+        if self.config.think_ms:
+            await asyncio.sleep(self.config.think_ms / 1000)
+
+    async def poll(self, stats: StageStats, step: str, wait_step: str, url: str, done) -> Dict[str, Any]:
+        """Poll ``url`` until ``done(body)`` holds, timing the whole wait as ``wait_step``"""
+        start = time.perf_counter()
+        deadline = start + self.config.poll_timeout
+        while True:
+            body = (await self.request(stats, step, "GET", url)).json()
+            finished = done(body)
+            if finished is not None:
+                stats.record(wait_step, time.perf_counter() - start, finished)
+                if not finished:
+                    raise StepFailed(f"{wait_step}: job failed")
+                return body
+            if time.perf_counter() >= deadline:
+                stats.record(wait_step, time.perf_counter() - start, False)
+                raise StepFailed(f"{wait_step}: timed out")
+            await asyncio.sleep(self.config.poll_interval)
+
+    async def wait_for_job(
+        self,
+        stats: StageStats,
+        job_id: Optional[str],
+        poll_step: str = "poll_job",
+        wait_step: str = "job_wait"
+    ):
+        if not job_id:
+            return
+        await self.poll(
+            stats,
+            poll_step,
+            wait_step,
+            f"/api/jobs/{job_id}",
+            lambda body: True if body["status"] == "completed" else False if body["status"] == "failed" else None
+        )
+
+    async def journey(self, stats: StageStats):
+        # Login hands back the Spotify consent URL; the simulator redirects straight back with a code
+        login = (await self.request(stats, "login", "GET", "/api/auth/login")).json()
+        await self.think()
+        redirect = await self.request(stats, "authorize", "GET", login["auth_url"])
+        params = parse_qs(urlparse(redirect.headers.get("location", "")).query)
+        if "code" not in params:
+            raise StepFailed("authorize: no code in redirect")
+        callback = (await self.request(
+            stats, "callback", "GET", "/api/auth/callback",
+            params={"code": params["code"][0], "state": params.get("state", [login["state"]])[0]}
+        )).json()
+        access_token = callback["tokens"]["access_token"]
+        await self.think()
+
+        playlists = (await self.request(
+            stats, "list_playlists", "GET", "/api/playlists/oauth", params={"access_token": access_token}
+        )).json()
+        if not playlists:
+            return
+        playlist_id = self.rng.choice(playlists)["spotify_id"]
+        await self.think()
+
+        await self.request(
+            stats, "fetch_tracks", "GET", f"/api/playlists/{playlist_id}/tracks",
+            params={"limit": self.config.track_page_size}
+        )
+        await self.think()
+
+        features = (await self.request(stats, "fetch_features", "POST", f"/api/playlists/{playlist_id}/fetch-audio-features")).json()
+        await self.wait_for_job(stats, features.get("job_id"))
+        await self.think()
+
+        analysis = (await self.request(stats, "analyze", "POST", f"/api/playlists/{playlist_id}/analyze")).json()
+        await self.wait_for_job(stats, analysis["job_id"], "poll_analysis", "analysis_wait")
+        await self.request(stats, "get_analysis", "GET", f"/api/playlists/{playlist_id}/analysis")
+
+    async def run_journey(self, stats: StageStats):
+        start = time.perf_counter()
+        try:
+            await self.journey(stats)
+        except (StepFailed, KeyError, ValueError):
+            stats.record("journey", time.perf_counter() - start, False)
+        else:
+            stats.record("journey", time.perf_counter() - start, True)
+            stats.completed += 1
+
+async def run_stage(runner: JourneyRunner, rate: float) -> StageStats:
+    """Open-model arrivals at ``rate`` for the stage duration, then drain"""
+    config = runner.config
+    stats = StageStats(rate)
+    in_flight = set()
+    start = time.perf_counter()
+    next_arrival = start
+    end = start + config.stage_seconds
+
+    while True:
+        next_arrival += runner.rng.expovariate(rate)
+        if next_arrival >= end:
+            break
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        if len(in_flight) >= config.max_users:
+            stats.shed += 1
+            continue
+        stats.started += 1
+        task = asyncio.create_task(runner.run_journey(stats))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    await asyncio.sleep(max(0.0, end - time.perf_counter()))
+    if in_flight:
+        _, pending = await asyncio.wait(set(in_flight), timeout=config.drain_seconds)
+        for task in pending:
+            task.cancel()
+        stats.shed += len(pending)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+def saturation_reasons(config: LoadConfig, stats: StageStats, baseline: Optional[StageStats]) -> List[str]:
+    reasons = []
+    offered = stats.started + stats.shed
+    if stats.shed:
+        reasons.append(f"{stats.shed} of {offered} journeys shed at the user cap or drain timeout")
+    if offered and stats.completed / offered < config.min_throughput_ratio:
+        reasons.append(f"completed {stats.completed} of {offered} offered journeys")
+    for step in STEPS:
+        if step in ("job_wait", "analysis_wait", "journey") or not stats.latencies[step]:
+            continue
+        summary = stats.step_summary(step)
+        if summary["error_rate"] > config.max_error_rate:
+            reasons.append(f"{step} error rate {summary['error_rate']:.1%}")
+        if summary["p99_ms"] > config.slo_p99_ms:
+            reasons.append(f"{step} p99 {summary['p99_ms']:.0f} ms over the {config.slo_p99_ms:.0f} ms SLO")
+    if baseline is not None and baseline.latencies["list_playlists"] and stats.latencies["list_playlists"]:
+        base_p50 = baseline.step_summary("list_playlists")["p50_ms"]
+        p50 = stats.step_summary("list_playlists")["p50_ms"]
+        if base_p50 and p50 / base_p50 > config.max_latency_growth:
+            reasons.append(f"list_playlists p50 grew {p50 / base_p50:.1f}x over the first stage")
+    return reasons
+
+def stage_report(config: LoadConfig, stats: StageStats, baseline: Optional[StageStats]) -> Dict[str, Any]:
+    reasons = saturation_reasons(config, stats, baseline)
+    return {
+        "rate": stats.rate,
+        "elapsed_s": round(stats.elapsed, 2),
+        "journeys_started": stats.started,
+        "journeys_completed": stats.completed,
+        "journeys_shed": stats.shed,
+        "journeys_per_second": round(stats.completed / stats.elapsed, 3) if stats.elapsed else 0.0,
+        "saturated": bool(reasons),
+        "saturation_reasons": reasons,
+        "statuses": dict(stats.statuses),
+        "steps": {step: stats.step_summary(step) for step in STEPS if stats.latencies[step]}
+    }
+
+def print_stage(report: Dict[str, Any]):
+    print(
+        f"\nrate {report['rate']:g}/s: {report['journeys_completed']}/{report['journeys_started']} journeys completed, "
+        f"{report['journeys_shed']} shed, {report['journeys_per_second']:.2f} journeys/s"
+    )
+    print(f"  {'step':<16}{'count':>8}{'err%':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, summary in report["steps"].items():
+        print(
+            f"  {step:<16}{summary['count']:>8}{summary['error_rate'] * 100:>8.1f}"
+            f"{summary['p50_ms']:>10.1f}{summary['p90_ms']:>10.1f}{summary['p99_ms']:>10.1f}{summary['max_ms']:>10.1f}"
+        )
+    for reason in report["saturation_reasons"]:
+        print(f"  saturated: {reason}")
+
+async def run(config: LoadConfig) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=config.max_users, max_keepalive_connections=config.max_users)
+    async with httpx.AsyncClient(base_url=config.base_url, timeout=config.request_timeout, limits=limits) as client:
+        runner = JourneyRunner(config, client, random.Random(config.seed))
+        stages = []
+        baseline = None
+        for rate in config.rates:
+            stats = await run_stage(runner, rate)
+            report = stage_report(config, stats, baseline)
+            print_stage(report)
+            stages.append(report)
+            baseline = baseline or stats
+            if report["saturated"] and not config.keep_going:
+                break
+
+    sustained = [stage["rate"] for stage in stages if not stage["saturated"]]
+    return {
+        "meta": {"started_at": datetime.now().isoformat(), "config": config.__dict__},
+        "max_sustained_rate": max(sustained) if sustained else None,
+        "stages": stages
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = LoadConfig()
+    for name, value in defaults.__dict__.items():
+        option = f"--{name.replace('_', '-')}"
+        if name == "rates":
+            parser.add_argument(option, default=",".join(f"{rate:g}" for rate in value), help="comma-separated journeys per second, one stage each")
+        elif isinstance(value, bool):
+            parser.add_argument(option, action="store_true")
+        else:
+            parser.add_argument(option, type=type(value), default=value)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    values = {name: getattr(args, name) for name in defaults.__dict__}
+    values["rates"] = [float(rate) for rate in args.rates.split(",") if rate]
+    config = LoadConfig(**values)
+
+    result = asyncio.run(run(config))
+    rate = result["max_sustained_rate"]
+    print(f"\nmax sustained rate: {f'{rate:g} journeys/s' if rate is not None else 'none (first stage saturated)'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
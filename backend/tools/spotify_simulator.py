@@ -0,0 +1,414 @@
+"""
+Spotify Web API Simulator
+Deterministic local stand-in for the Spotify API and accounts service
+
+Serves /v1/me, /v1/me/playlists, /v1/playlists/{id}/tracks (and /items),
+/v1/audio-features, /api/token and /authorize for synthetic libraries of any
+size. Nothing is stored: every user, playlist, track and feature vector is
+derived from the seed, so a 10k-playlist, 1M-track library costs no memory.
+
+Run from backend/:
+    python -m tools.spotify_simulator --port 8765 --playlists 10000 --tracks-per-playlist 100
+and point the API at it:
+    SPOTIFY_API_BASE_URL=http://localhost:8765/v1 SPOTIFY_ACCOUNTS_BASE_URL=http://localhost:8765
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import secrets
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, Form, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+@dataclass
+class SimulatorConfig:
+    """Shape of the synthetic world and how badly the simulated API behaves"""
+    seed: int = 42
+    users: int = 1
+    playlists: int = 50  # per user
+    tracks_per_playlist: int = 100  # mean; actual counts vary +-50%
+    catalog_size: int = 5_000_000  # distinct tracks playlists draw from
+    artists: int = 200_000
+    churn_percent: float = 10.0  # share of positions that change when snapshots are bumped
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0  # probability of an injected 429
+    retry_after: int = 1  # seconds, sent with injected 429s
+    rate_limit: int = 0  # requests per rolling second before real 429s; 0 disables
+    playlist_page_size: int = 50  # max limit for /me/playlists
+    track_page_size: int = 100  # max limit for playlist items
+    audio_features_batch: int = 100  # max ids per /audio-features call
+    token_expires_in: int = 3600
+
+def _encode(number: int, width: int) -> str:
+    digits = []
+    while number:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62[remainder])
+    return "".join(reversed(digits)).rjust(width, "0")
+
+def _decode(text: str) -> int:
+    number = 0
+    for char in text:
+        number = number * 62 + BASE62.index(char)
+    return number
+
+def _hash(*parts: Any) -> int:
+    digest = hashlib.blake2b(":".join(str(part) for part in parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+class SyntheticLibrary:
+    """
+    Pure functions from IDs to Spotify objects. IDs are 22 base62 characters
+    like Spotify's, with a type prefix and the generating numbers encoded,
+    so any ID can be turned back into its object.
+    """
+
+    def __init__(self, config: SimulatorConfig):
+        self.config = config
+        self.epoch = 0  # bumped to change every snapshot_id and churn some tracks
+
+    # IDs
+    def user_id(self, user_no: int) -> str:
+        return f"simuser{user_no}"
+
+    def playlist_id(self, user_no: int, index: int) -> str:
+        return "p" + _encode(user_no, 6) + _encode(index, 15)
+
+    def parse_playlist_id(self, playlist_id: str) -> Optional[Tuple[int, int]]:
+        try:
+            if len(playlist_id) != 22 or playlist_id[0] != "p":
+                return None
+            user_no, index = _decode(playlist_id[1:7]), _decode(playlist_id[7:])
+        except ValueError:
+            return None
+        if user_no >= self.config.users or index >= self.config.playlists:
+            return None
+        return user_no, index
+
+    def track_id(self, track_no: int) -> str:
+        return "t" + _encode(track_no, 21)
+
+    def parse_track_id(self, track_id: str) -> Optional[int]:
+        try:
+            if len(track_id) != 22 or track_id[0] != "t":
+                return None
+            track_no = _decode(track_id[1:])
+        except ValueError:
+            return None
+        return track_no if track_no < self.config.catalog_size else None
+
+    # Objects
+    def user(self, user_no: int) -> Dict[str, Any]:
+        user_id = self.user_id(user_no)
+        return {
+            "id": user_id,
+            "display_name": f"Simulated User {user_no}",
+            "email": f"{user_id}@example.com",
+            "country": "US",
+            "product": "premium",
+            "images": [],
+            "external_urls": {"spotify": f"https://open.spotify.com/user/{user_id}"},
+            "type": "user"
+        }
+
+    def playlist_track_count(self, user_no: int, index: int) -> int:
+        mean = self.config.tracks_per_playlist
+        rng = random.Random(_hash(self.config.seed, "count", user_no, index))
+        return rng.randint(max(1, mean // 2), max(1, mean + mean // 2))
+
+    def playlist(self, user_no: int, index: int) -> Dict[str, Any]:
+        playlist_id = self.playlist_id(user_no, index)
+        return {
+            "id": playlist_id,
+            "name": f"Simulated Playlist {index}",
+            "description": f"Synthetic playlist {index} of {self.user_id(user_no)}",
+            "public": index % 3 != 0,
+            "collaborative": index % 17 == 0,
+            "owner": {"id": self.user_id(user_no), "display_name": f"Simulated User {user_no}"},
+            "images": [{"url": f"https://i.scdn.co/image/{playlist_id}", "height": 640, "width": 640}],
+            "external_urls": {"spotify": f"https://open.spotify.com/playlist/{playlist_id}"},
+            "snapshot_id": f"{playlist_id}-{self.epoch}",
+            "tracks": {"total": self.playlist_track_count(user_no, index)},
+            "type": "playlist"
+        }
+
+    def track_at(self, user_no: int, index: int, position: int) -> int:
+        """Catalog number of the track at a playlist position"""
+        key = _hash(self.config.seed, "slot", user_no, index, position)
+        if self.epoch and key % 10_000 < self.config.churn_percent * 100:
+            key = _hash(key, self.epoch)
+        return key % self.config.catalog_size
+
+    def track(self, track_no: int) -> Dict[str, Any]:
+        rng = random.Random(_hash(self.config.seed, "track", track_no))
+        track_id = self.track_id(track_no)
+        artist_nos = [rng.randrange(self.config.artists) for _ in range(1 if rng.random() < 0.8 else 2)]
+        album_no = rng.randrange(self.config.catalog_size // 10 or 1)
+        return {
+            "id": track_id,
+            "name": f"Track {track_no}",
+            "type": "track",
+            "is_local": False,
+            "artists": [{"id": "a" + _encode(no, 21), "name": f"Artist {no}"} for no in artist_nos],
+            "album": {
+                "id": "b" + _encode(album_no, 21),
+                "name": f"Album {album_no}",
+                "release_date": f"{rng.randint(1960, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            },
+            "duration_ms": rng.randint(90_000, 400_000),
+            "popularity": rng.randint(0, 100),
+            "preview_url": None,
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"}
+        }
+
+    def audio_features(self, track_no: int) -> Dict[str, Any]:
+        rng = random.Random(_hash(self.config.seed, "features", track_no))
+        track_id = self.track_id(track_no)
+        return {
+            "id": track_id,
+            "acousticness": rng.random(),
+            "danceability": rng.random(),
+            "energy": rng.random(),
+            "instrumentalness": rng.random(),
+            "liveness": rng.random(),
+            "loudness": rng.uniform(-60.0, 0.0),
+            "speechiness": rng.random(),
+            "valence": rng.random(),
+            "tempo": rng.uniform(60.0, 200.0),
+            "key": rng.randint(-1, 11),
+            "mode": rng.randint(0, 1),
+            "time_signature": rng.randint(3, 7),
+            "duration_ms": self.track(track_no)["duration_ms"],
+            "type": "audio_features",
+            "uri": f"spotify:track:{track_id}"
+        }
+
+@dataclass
+class SimulatorStats:
+    requests: Dict[str, int] = field(default_factory=dict)
+    injected_429: int = 0
+    rate_limited_429: int = 0
+
+class FaultInjection:
+    """
+    Pure ASGI middleware adding latency, jitter and 429s to /v1 and /api
+    calls. The /authorize redirect and ``/_sim`` control endpoints are
+    never delayed or limited.
+    """
+
+    def __init__(self, app, config: SimulatorConfig, stats: SimulatorStats):
+        self.app = app
+        self.config = config
+        self.stats = stats
+        self.rng = random.Random(config.seed)
+        self.window: deque = deque()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(("/v1/", "/api/")):
+            await self.app(scope, receive, send)
+            return
+
+        config = self.config
+        self.stats.requests[scope["path"]] = self.stats.requests.get(scope["path"], 0) + 1
+
+        if config.latency_ms or config.jitter_ms:
+            delay = config.latency_ms + self.rng.uniform(-config.jitter_ms, config.jitter_ms)
+            await asyncio.sleep(max(0.0, delay) / 1000)
+
+        retry_after = None
+        if config.rate_limit:
+            now = time.monotonic()
+            while self.window and self.window[0] <= now - 1.0:
+                self.window.popleft()
+            if len(self.window) >= config.rate_limit:
+                retry_after = max(1, math.ceil(self.window[0] + 1.0 - now))
+                self.stats.rate_limited_429 += 1
+            else:
+                self.window.append(now)
+        if retry_after is None and config.error_rate and self.rng.random() < config.error_rate:
+            retry_after = config.retry_after
+            self.stats.injected_429 += 1
+
+        if retry_after is not None:
+            response = JSONResponse(
+                {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+def create_app(config: Optional[SimulatorConfig] = None) -> FastAPI:
+    """Build the simulator; also usable in-process through httpx.ASGITransport"""
+    config = config or SimulatorConfig()
+    library = SyntheticLibrary(config)
+    stats = SimulatorStats()
+    app = FastAPI(title="Spotify Web API Simulator", docs_url=None, redoc_url=None)
+    app.state.library = library
+    app.state.stats = stats
+    login_counter = [0]
+
+    def user_for(authorization: Optional[str]) -> int:
+        if not authorization or not authorization.startswith("Bearer ") or len(authorization) <= 7:
+            raise HTTPException(status_code=401, detail="No token provided")
+        token = authorization[7:]
+        # Tokens issued here carry their user; anything else maps to a stable user
+        parts = token.split(".")
+        if len(parts) == 3 and parts[0] == "sim" and parts[1].isdigit():
+            return int(parts[1]) % config.users
+        return _hash(token) % config.users
+
+    def page(request: Request, items: List[Any], total: int, limit: int, offset: int) -> Dict[str, Any]:
+        def link(at: int) -> str:
+            return f"{str(request.url).split('?')[0]}?{urlencode({'offset': at, 'limit': limit})}"
+        return {
+            "href": link(offset),
+            "items": items,
+            "limit": limit,
+            "offset": offset,
+            "total": total,
+            "next": link(offset + limit) if offset + limit < total else None,
+            "previous": link(max(0, offset - limit)) if offset else None
+        }
+
+    @app.get("/v1/me")
+    async def me(authorization: Optional[str] = Header(None)):
+        return library.user(user_for(authorization))
+
+    @app.get("/v1/me/playlists")
+    async def my_playlists(
+        request: Request,
+        limit: int = Query(20, ge=1),
+        offset: int = Query(0, ge=0),
+        authorization: Optional[str] = Header(None)
+    ):
+        user_no = user_for(authorization)
+        limit = min(limit, config.playlist_page_size)
+        indexes = range(offset, min(offset + limit, config.playlists))
+        return page(request, [library.playlist(user_no, index) for index in indexes], config.playlists, limit, offset)
+
+    @app.get("/v1/playlists/{playlist_id}")
+    async def get_playlist(playlist_id: str, authorization: Optional[str] = Header(None)):
+        user_for(authorization)
+        parsed = library.parse_playlist_id(playlist_id)
+        if parsed is None:
+            raise HTTPException(status_code=404, detail="Not found.")
+        return library.playlist(*parsed)
+
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    @app.get("/v1/playlists/{playlist_id}/items")
+    async def playlist_items(
+        request: Request,
+        playlist_id: str,
+        limit: int = Query(100, ge=1),
+        offset: int = Query(0, ge=0),
+        authorization: Optional[str] = Header(None)
+    ):
+        user_for(authorization)
+        parsed = library.parse_playlist_id(playlist_id)
+        if parsed is None:
+            raise HTTPException(status_code=404, detail="Not found.")
+        user_no, index = parsed
+        total = library.playlist_track_count(user_no, index)
+        limit = min(limit, config.track_page_size)
+        items = [
+            {
+                "added_at": "2024-01-01T00:00:00Z",
+                "is_local": False,
+                "track": library.track(library.track_at(user_no, index, position))
+            }
+            for position in range(offset, min(offset + limit, total))
+        ]
+        return page(request, items, total, limit, offset)
+
+    @app.get("/v1/audio-features")
+    async def audio_features(ids: str = Query(...), authorization: Optional[str] = Header(None)):
+        user_for(authorization)
+        track_ids = [track_id for track_id in ids.split(",") if track_id]
+        if len(track_ids) > config.audio_features_batch:
+            raise HTTPException(status_code=400, detail="Too many ids requested")
+        features = []
+        for track_id in track_ids:
+            track_no = library.parse_track_id(track_id)
+            features.append(library.audio_features(track_no) if track_no is not None else None)
+        return {"audio_features": features}
+
+    @app.get("/authorize")
+    async def authorize(redirect_uri: str, state: Optional[str] = None):
+        """Log in without a consent screen; successive logins rotate through the simulated users"""
+        user_no = login_counter[0] % config.users
+        login_counter[0] += 1
+        params = {"code": f"simcode.{user_no}.{secrets.token_hex(8)}"}
+        if state:
+            params["state"] = state
+        return RedirectResponse(f"{redirect_uri}?{urlencode(params)}")
+
+    @app.post("/api/token")
+    async def token(
+        grant_type: str = Form(...),
+        code: Optional[str] = Form(None),
+        refresh_token: Optional[str] = Form(None)
+    ):
+        grant = code if grant_type == "authorization_code" else refresh_token if grant_type == "refresh_token" else None
+        if not grant:
+            return JSONResponse({"error": "invalid_grant"}, status_code=400)
+        parts = grant.split(".")
+        user_no = int(parts[1]) % config.users if len(parts) == 3 and parts[1].isdigit() else _hash(grant) % config.users
+        body = {
+            "access_token": f"sim.{user_no}.{secrets.token_hex(16)}",
+            "token_type": "Bearer",
+            "expires_in": config.token_expires_in,
+            "scope": "playlist-read-private playlist-read-collaborative user-read-private user-read-email"
+        }
+        if grant_type == "authorization_code":
+            body["refresh_token"] = f"simrefresh.{user_no}.{secrets.token_hex(16)}"
+        return body
+
+    @app.get("/_sim/stats")
+    async def simulator_stats():
+        return {
+            "requests": stats.requests,
+            "requests_total": sum(stats.requests.values()),
+            "injected_429": stats.injected_429,
+            "rate_limited_429": stats.rate_limited_429,
+            "epoch": library.epoch,
+            "config": config.__dict__
+        }
+
+    @app.post("/_sim/snapshots")
+    async def bump_snapshots():
+        """Change every playlist's snapshot_id and churn_percent of its tracks"""
+        library.epoch += 1
+        return {"epoch": library.epoch}
+
+    app.add_middleware(FaultInjection, config=config, stats=stats)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    defaults = SimulatorConfig()
+    for name, value in defaults.__dict__.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = SimulatorConfig(**{name: getattr(args, name) for name in defaults.__dict__})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()